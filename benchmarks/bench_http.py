@@ -0,0 +1,129 @@
+"""
+Load test for the multi-user HTTP service.
+
+Starts the service in-process on a free port in a temporary directory (or
+targets a running one with --url) and runs concurrent keep-alive clients
+issuing a mix of adds, summaries, budget reads and page listings across
+many users. Reports throughput and p50/p99 latency per route. Correctness
+of the routes is covered by tests/test_http_server.py.
+
+    python benchmarks/bench_http.py --users 200 --clients 32 --requests 5000 --max-users 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from main import close_service, open_service  # noqa: E402
+from src.models.expense import ExpenseCategory  # noqa: E402
+from src.services.user_service_cache import UserServiceCache  # noqa: E402
+from src.views.http_client import HTTPClient  # noqa: E402
+from src.views.http_server import BudgetHTTPServer  # noqa: E402
+
+CATEGORIES = [category.value for category in ExpenseCategory]
+
+
+def random_expense(rng: random.Random):
+    return {
+        'date': (date(2025, 1, 1) + timedelta(days=rng.randrange(180))).isoformat(),
+        'category': rng.choice(CATEGORIES),
+        'amount': f'{rng.uniform(1, 200):.2f}',
+        'description': rng.choice(['Lunch', 'Uber ride', 'Groceries', 'Cinema', 'Rent share']),
+    }
+
+
+async def run_load(host: str, port: int, users: int, clients: int, requests: int, seed: int):
+    latencies = {}
+    errors = 0
+    remaining = [requests]
+
+    async def worker(index: int):
+        nonlocal errors
+        rng = random.Random(seed + index)
+        client = HTTPClient(host, port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                user = f'user{rng.randrange(users)}'
+                roll = rng.random()
+                if roll < 0.6:
+                    route, call = 'add', ('POST', f'/users/{user}/expenses', random_expense(rng))
+                elif roll < 0.8:
+                    route, call = 'summary', ('GET', f'/users/{user}/summary', None)
+                elif roll < 0.9:
+                    route, call = 'budget', ('GET', f'/users/{user}/budget', None)
+                else:
+                    route, call = 'list', ('GET', f'/users/{user}/expenses?sort=amount&desc=1', None)
+                started = time.perf_counter()
+                status, _ = await client.request(*call)
+                latencies.setdefault(route, []).append(time.perf_counter() - started)
+                if status >= 400:
+                    errors += 1
+        finally:
+            await client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    everything = [value for values in latencies.values() for value in values]
+    print(f'{len(everything)} requests in {elapsed:.2f} s: {len(everything) / elapsed:.0f} req/s, '
+          f'{errors} errors')
+    for route, values in sorted(latencies.items()) + [('all', everything)]:
+        values.sort()
+        p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+        print(f'  {route:<8} n={len(values):<6} p50 {statistics.median(values) * 1000:7.2f} ms'
+              f'  p99 {p99 * 1000:7.2f} ms')
+    return errors
+
+
+async def main_async(args) -> int:
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        workdir = tempfile.mkdtemp(prefix='bench-http-')
+        os.chdir(workdir)
+        cache = UserServiceCache(
+            lambda user_id: open_service('json', data_dir=os.path.join('data', 'users', user_id)),
+            close_service,
+            max_users=args.max_users
+        )
+        server = BudgetHTTPServer(cache, '127.0.0.1', 0, io_workers=args.io_workers)
+        host, port = '127.0.0.1', await server.start()
+        print(f'Serving from {workdir} on port {port}')
+    try:
+        errors = await run_load(host, port, args.users, args.clients, args.requests, args.seed)
+        if server is not None:
+            print(f'cache: {server.cache.stats()}')
+        return 1 if errors else 0
+    finally:
+        if server is not None:
+            await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Target a running service instead, e.g. http://127.0.0.1:8080')
+    parser.add_argument('--users', type=int, default=100, help='Distinct users to spread requests over')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent keep-alive connections')
+    parser.add_argument('--requests', type=int, default=2000, help='Total requests to send')
+    parser.add_argument('--max-users', type=int, default=64, help='Users kept loaded by the in-process server')
+    parser.add_argument('--io-workers', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Startup-time benchmark for the headless CLI.
+
+Runs `python main.py summary` in fresh interpreters, reports the median wall
+time and checks that none of the heavy GUI/plotting modules were imported.
+The runs use a temporary copy of data/, so loading it (which may migrate
+old files) never touches the working tree.
+
+    python benchmarks/bench_startup.py --runs 10 --max-ms 300
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a headless summary must not pull in
+HEAVY_MODULES = ['PySimpleGUI', 'matplotlib', 'pandas', 'numpy', 'tkinter']
+
+IMPORT_CHECK = (
+    'import sys, main; main.main(["summary"]); '
+    f'print("HEAVY:" + ",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+)
+
+
+def time_command(command, runs, workdir):
+    """Return wall-clock times in milliseconds for running command in fresh processes"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def heavy_modules_loaded(workdir):
+    """Return the heavy modules imported while running the summary command"""
+    result = subprocess.run(
+        [sys.executable, '-c', IMPORT_CHECK],
+        cwd=workdir, check=True, capture_output=True, text=True,
+        env=dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    )
+    marker = [line for line in result.stdout.splitlines() if line.startswith('HEAVY:')][-1]
+    return [name for name in marker[len('HEAVY:'):].split(',') if name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='Number of cold starts to time')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='Fail if the median startup time exceeds this many milliseconds')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-startup-') as workdir:
+        data_dir = os.path.join(PROJECT_ROOT, 'data')
+        if os.path.isdir(data_dir):
+            shutil.copytree(data_dir, os.path.join(workdir, 'data'))
+        baseline = time_command([sys.executable, '-c', 'pass'], args.runs, workdir)
+        summary = time_command(
+            [sys.executable, os.path.join(PROJECT_ROOT, 'main.py'), 'summary'], args.runs, workdir
+        )
+        heavy = heavy_modules_loaded(workdir)
+
+    median = statistics.median(summary)
+    print(f'interpreter startup: {statistics.median(baseline):.1f} ms (median of {args.runs})')
+    print(f'main.py summary:     {median:.1f} ms (median of {args.runs})')
+    print(f'heavy modules loaded: {", ".join(heavy) if heavy else "none"}')
+
+    failed = bool(heavy)
+    if args.max_ms is not None and median > args.max_ms:
+        print(f'FAIL: median startup {median:.1f} ms exceeds {args.max_ms:.1f} ms')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Seeded synthetic expense data for benchmarks.
+
+    python benchmarks/generate_data.py 100000 --output /tmp/expenses.json --seed 42
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+from typing import Dict, Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.expense import ExpenseCategory  # noqa: E402
+
+# Relative frequency, lognormal (mu, sigma) of the amount and sample descriptions per category
+CATEGORY_PROFILES = {
+    ExpenseCategory.FOOD: (0.40, 2.8, 0.6, ['Groceries', 'Lunch', 'Coffee', 'Dinner out', 'Bakery']),
+    ExpenseCategory.TRANSPORTATION: (0.20, 2.5, 0.8, ['Uber ride', 'Bus pass', 'Fuel', 'Parking', 'Train ticket']),
+    ExpenseCategory.ENTERTAINMENT: (0.15, 3.0, 0.7, ['Cinema', 'Concert', 'Streaming', 'Books', 'Games']),
+    ExpenseCategory.UTILITIES: (0.10, 4.2, 0.4, ['Electricity', 'Water', 'Internet', 'Phone', 'Gas bill']),
+    ExpenseCategory.MISCELLANEOUS: (0.15, 3.2, 1.0, ['Gift', 'Pharmacy', 'Haircut', 'Hardware', 'Donation']),
+}
+
+
+def generate_expenses(count: int, seed: int = 42, years: int = 5,
+                      end: date = date(2025, 12, 31)) -> Iterator[Dict]:
+    """Yield count expense dicts spread over the given number of years, deterministically for a seed"""
+    rng = random.Random(seed)
+    categories = list(CATEGORY_PROFILES)
+    weights = [CATEGORY_PROFILES[category][0] for category in categories]
+    first_day = (end - timedelta(days=365 * years)).toordinal()
+    span = end.toordinal() - first_day + 1
+
+    for index in range(count):
+        category = rng.choices(categories, weights)[0]
+        _, mu, sigma, descriptions = CATEGORY_PROFILES[category]
+        yield {
+            'id': f'bench-{seed}-{index}',
+            'date': date.fromordinal(first_day + rng.randrange(span)).isoformat(),
+            'category': category.value,
+            'amount': round(max(0.01, rng.lognormvariate(mu, sigma)), 2),
+            'description': rng.choice(descriptions)
+        }
+
+
+def write_dataset(path: str, count: int, seed: int = 42, years: int = 5):
+    """Write a dataset in the JSONPersistence format"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('[\n')
+        for index, expense in enumerate(generate_expenses(count, seed, years)):
+            if index:
+                f.write(',\n')
+            f.write(json.dumps(expense))
+        f.write('\n]')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic expenses.json')
+    parser.add_argument('count', type=int, help='Number of expenses')
+    parser.add_argument('--output', default='benchmarks/data/expenses.json', help='Output file')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--years', type=int, default=5, help='Length of the date range in years')
+    args = parser.parse_args()
+    write_dataset(args.output, args.count, args.seed, args.years)
+    print(f'Wrote {args.count} expenses to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmarks for the service, persistence and export hot paths.
+
+Generates seeded datasets, times each operation and records its peak
+traced memory, then writes machine-readable results:
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000 --output bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json --output bench-new.json
+
+Sizes up to 10**7 are supported but need several GB of RAM and minutes per step.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.generate_data import write_dataset  # noqa: E402
+from src.models.expense import Expense, ExpenseCategory  # noqa: E402
+from src.services.data_persistence import JSONPersistence, JournaledJSONPersistence  # noqa: E402
+from src.services.expense_service import ExpenseService  # noqa: E402
+from src.utils.data_export import DataExporter  # noqa: E402
+
+
+def measure(func, repeat: int = 1):
+    """
+    Run func repeat times untraced, then once under tracemalloc
+
+    Returns (best seconds, peak traced bytes, last result). Timing runs are
+    kept separate from the traced run because tracing slows allocation down.
+    """
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def chart_available() -> bool:
+    try:
+        import matplotlib  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def run_size(size: int, seed: int, workdir: str, repeat: int):
+    """Benchmark every operation against one dataset size"""
+    expenses_file = os.path.join(workdir, 'data', 'expenses.json')
+    budget_file = os.path.join(workdir, 'data', 'budget_config.json')
+    write_dataset(expenses_file, size, seed)
+    with open(budget_file, 'w') as f:
+        json.dump({category.value: 1000.0 for category in ExpenseCategory}, f)
+
+    results = []
+
+    def record(operation, func, op_repeat=repeat):
+        seconds, peak, result = measure(func, op_repeat)
+        results.append({
+            'size': size,
+            'operation': operation,
+            'seconds': seconds,
+            'peak_bytes': peak,
+        })
+        print(f'{size:>10} {operation:<28} {seconds * 1000:>10.2f} ms {peak / 2**20:>9.1f} MiB')
+        return result
+
+    service = record(
+        'cold_load',
+        lambda: ExpenseService(JSONPersistence(expenses_file, budget_file)),
+        op_repeat=1
+    )
+
+    def new_expense():
+        # A fresh Expense (and id) per call, so every repeat is a real insert
+        return Expense(date(2025, 6, 1), ExpenseCategory.FOOD, 12.5, 'Benchmark lunch')
+
+    # add_expense with the full-rewrite JSON backend rewrites the whole file
+    record('add_expense_json', lambda: service.add_expense(new_expense()), op_repeat=1)
+
+    journaled = ExpenseService(JournaledJSONPersistence(
+        expenses_file, budget_file, journal_file=os.path.join(workdir, 'data', 'bench.journal')
+    ))
+    record('add_expense_journaled', lambda: journaled.add_expense(new_expense()))
+
+    record('get_expenses_by_category', service.get_expenses_by_category)
+    record('check_budget_limits', service.check_budget_limits)
+    totals = service.get_expenses_by_category()
+    record('export_expenses_csv', lambda: DataExporter.export_expenses_to_csv(service.expenses), op_repeat=1)
+    record(
+        'export_expenses_dataset',
+        lambda: DataExporter.export_expenses_columnar(service.expenses),
+        op_repeat=1
+    )
+    record('export_budget_csv', lambda: DataExporter.export_budget_to_csv(service.budget, totals))
+    if chart_available():
+        record('generate_chart', lambda: DataExporter.generate_expense_pie_chart(totals), op_repeat=1)
+    if numpy_available():
+        from src.utils.analytics import AnalyticsEngine
+
+        analytics = record('analytics_build', lambda: AnalyticsEngine(service.expenses))
+        record('analytics_category_by_month', analytics.category_by_month)
+        record('analytics_percentiles', analytics.percentiles)
+        record('analytics_rolling_average', analytics.rolling_average)
+    return results
+
+
+def compare(baseline_path: str, results, threshold: float) -> int:
+    """Print time ratios against a previous run and count regressions beyond threshold"""
+    with open(baseline_path) as f:
+        baseline = {
+            (row['size'], row['operation']): row for row in json.load(f)['results']
+        }
+    regressions = 0
+    print(f'\nComparison with {baseline_path} (ratio = new / old):')
+    for row in results:
+        old = baseline.get((row['size'], row['operation']))
+        if not old or not old['seconds']:
+            continue
+        ratio = row['seconds'] / old['seconds']
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{row['size']:>10} {row['operation']:<28} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the BudgetApp performance benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Dataset sizes to benchmark (up to 10**7)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions of cheap operations (best is kept)')
+    parser.add_argument('--output', default='benchmarks/results.json', help='Where to write JSON results')
+    parser.add_argument('--compare', help='Previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Slowdown ratio reported as a regression when comparing')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    results = []
+    previous_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='budget-bench-')
+    try:
+        # Exports write into ./reports, so run inside the scratch directory
+        os.chdir(workdir)
+        for size in args.sizes:
+            results.extend(run_size(size, args.seed, workdir, args.repeat))
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'sizes': args.sizes,
+        },
+        'results': results,
+    }
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f'\nResults written to {output}')
+
+    if baseline:
+        return 1 if compare(baseline, results, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,337 @@
+import argparse
+import os
+import sys
+
 from src.services.expense_service import ExpenseService
-from src.services.data_persistence import JSONPersistence
+from src.services.data_persistence import (
+    JournaledJSONPersistence, NDJSONPersistence, WriteBehindPersistence
+)
 from src.viewmodels.budget_viewmodel import BudgetViewModel
-from src.views.main_window import MainWindow
+from src.utils import instrumentation
+
+def create_persistence(backend: str, shard_period: str = 'month', data_dir: str = 'data'):
+    """Create the persistence backend selected on the command line, storing files in data_dir"""
+    budget_file = os.path.join(data_dir, 'budget_config.json')
+    if backend == 'sqlite':
+        from src.services.sqlite_persistence import SQLitePersistence
+        return SQLitePersistence(os.path.join(data_dir, 'budget.db'))
+    if backend == 'binary':
+        from src.services.binary_persistence import BinarySnapshotPersistence
+        return BinarySnapshotPersistence(os.path.join(data_dir, 'expenses.bin'), budget_file)
+    if backend == 'sharded':
+        from src.services.sharded_persistence import ShardedJSONPersistence
+        return ShardedJSONPersistence(
+            os.path.join(data_dir, 'expenses'), budget_file, granularity=shard_period
+        )
+    if backend == 'ndjson':
+        return NDJSONPersistence(os.path.join(data_dir, 'expenses.ndjson'), budget_file)
+    return JournaledJSONPersistence(os.path.join(data_dir, 'expenses.json'), budget_file)
+
+def open_service(backend: str, shard_period: str = 'month', data_dir: str = 'data') -> ExpenseService:
+    """Create an ExpenseService over data_dir, with writes coalesced by a write-behind layer"""
+    persistence = WriteBehindPersistence(create_persistence(backend, shard_period, data_dir))
+    return ExpenseService(persistence, os.path.join(data_dir, f'search_index_{backend}.json'))
+
+def close_service(expense_service: ExpenseService):
+    """Write out coalesced changes, then fold the journal back into the snapshot"""
+    expense_service.save_search_index()
+    persistence = expense_service.persistence
+    persistence.close()
+    storage = persistence.persistence
+    if isinstance(storage, JournaledJSONPersistence):
+        storage.compact()
+    if hasattr(storage, 'close'):
+        storage.close()
+
+def build_parser():
+    """Build the command line parser; running without a command opens the GUI"""
+    parser = argparse.ArgumentParser(description='Personal Budget Tracker')
+    parser.add_argument(
+        '--backend', choices=['json', 'ndjson', 'binary', 'sharded', 'sqlite'], default='json',
+        help='Storage backend for expenses and budget limits'
+    )
+    parser.add_argument(
+        '--shard-period', choices=['day', 'week', 'month', 'year'], default='month',
+        help='Period covered by each file of a new sharded store (default: month)'
+    )
+    parser.add_argument(
+        '--instrument', action='store_true',
+        help='Record call counts and latencies of persistence, service and export operations'
+    )
+    parser.add_argument(
+        '--stats-out', metavar='FILE',
+        help='Write recorded statistics to FILE as JSON on exit (implies --instrument)'
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='Profile the command with cProfile and tracemalloc and print the results'
+    )
+    commands = parser.add_subparsers(dest='command')
+    
+    commands.add_parser('gui', help='Open the graphical interface (default)')
+    
+    summary = commands.add_parser('summary', help='Print expenses by category')
+    summary.add_argument('--from', dest='start', default='', help='First date (YYYY-MM-DD)')
+    summary.add_argument('--to', dest='end', default='', help='Last date (YYYY-MM-DD)')
+    
+    add = commands.add_parser('add', help='Add an expense')
+    add.add_argument('date', help='Expense date (YYYY-MM-DD)')
+    add.add_argument('category', help='Expense category, e.g. Food')
+    add.add_argument('amount', help='Expense amount')
+    add.add_argument('description', nargs='?', default='', help='Optional description')
+    
+    edit = commands.add_parser('edit', help='Replace an expense, identified by id')
+    edit.add_argument('id', help='Expense id, as printed by add')
+    edit.add_argument('date', help='Expense date (YYYY-MM-DD)')
+    edit.add_argument('category', help='Expense category, e.g. Food')
+    edit.add_argument('amount', help='Expense amount')
+    edit.add_argument('description', nargs='?', default='', help='Optional description')
+    
+    delete = commands.add_parser('delete', help='Delete an expense, identified by id')
+    delete.add_argument('id', help='Expense id, as printed by add')
+    
+    import_cmd = commands.add_parser('import', help='Import expenses from a CSV or JSON file')
+    import_cmd.add_argument('file', help='CSV or JSON file to import')
+    
+    search = commands.add_parser('search', help='Search expense descriptions')
+    search.add_argument('query', help='Words to find; each matches as a word prefix')
+    search.add_argument('--category', default='', help='Only this category, e.g. Food')
+    search.add_argument('--from', dest='start', default='', help='First date (YYYY-MM-DD)')
+    search.add_argument('--to', dest='end', default='', help='Last date (YYYY-MM-DD)')
+    search.add_argument('--limit', type=int, default=50, help='Number of results to print')
+    search.add_argument('--export', metavar='FILE', help='Write every match to FILE as CSV')
+    
+    list_cmd = commands.add_parser('list', help='Print one page of expenses, sorted and filtered')
+    list_cmd.add_argument('--sort', choices=['date', 'category', 'amount'], default='date')
+    list_cmd.add_argument('--desc', action='store_true', help='Sort in descending order')
+    list_cmd.add_argument('--page', type=int, default=1, help='Page number, from 1')
+    list_cmd.add_argument('--page-size', type=int, default=50)
+    list_cmd.add_argument('--category', default='', help='Only this category, e.g. Food')
+    list_cmd.add_argument('--from', dest='start', default='', help='First date (YYYY-MM-DD)')
+    list_cmd.add_argument('--to', dest='end', default='', help='Last date (YYYY-MM-DD)')
+    list_cmd.add_argument('--min', dest='min_amount', default='', help='Smallest amount')
+    list_cmd.add_argument('--max', dest='max_amount', default='', help='Largest amount')
+    
+    report = commands.add_parser('report', help='Generate CSV reports and the category chart')
+    report.add_argument('--from', dest='start', default='', help='First date (YYYY-MM-DD)')
+    report.add_argument('--to', dest='end', default='', help='Last date (YYYY-MM-DD)')
+    
+    dataset = commands.add_parser(
+        'export-dataset', help='Export expenses as a month-partitioned columnar dataset under reports/'
+    )
+    dataset.add_argument(
+        '--format', dest='fmt', choices=['auto', 'parquet', 'feather', 'ndjson'], default='auto',
+        help='auto picks parquet when pyarrow is installed, else ndjson'
+    )
+    dataset.add_argument('--row-group-size', type=int, default=10000)
+    dataset.add_argument('--from', dest='start', default='', help='First date (YYYY-MM-DD)')
+    dataset.add_argument('--to', dest='end', default='', help='Last date (YYYY-MM-DD)')
+    
+    analytics = commands.add_parser(
+        'analytics', help='Print monthly totals, percentiles and the largest expenses'
+    )
+    analytics.add_argument('--from', dest='start', default='', help='First date (YYYY-MM-DD)')
+    analytics.add_argument('--to', dest='end', default='', help='Last date (YYYY-MM-DD)')
+    analytics.add_argument('--top', type=int, default=5, help='Number of largest expenses to list')
+    analytics.add_argument(
+        '--charts', action='store_true', help='Also write the monthly and trend charts'
+    )
+    
+    history = commands.add_parser('budget-history', help='Print budget adherence per period')
+    history.add_argument('--count', type=int, default=24, help='Number of periods to show')
+    
+    recurring = commands.add_parser('recurring', help='Manage recurring expenses, e.g. rent')
+    recurring_commands = recurring.add_subparsers(dest='recurring_command', required=True)
+    recurring_commands.add_parser('list', help='Print the recurring expenses')
+    recurring_add = recurring_commands.add_parser('add', help='Add a recurring expense')
+    recurring_add.add_argument('category', help='Expense category, e.g. Utilities')
+    recurring_add.add_argument('amount', help='Amount of each occurrence')
+    recurring_add.add_argument('description', nargs='?', default='', help='Optional description')
+    recurring_add.add_argument('--from', dest='start', required=True, help='First date (YYYY-MM-DD)')
+    recurring_add.add_argument('--to', dest='end', default='', help='Last date (YYYY-MM-DD)')
+    recurring_add.add_argument(
+        '--frequency', choices=['monthly', 'weekly'], default='monthly', help='How often it recurs'
+    )
+    recurring_add.add_argument(
+        '--day', default='', help='Day of the month for monthly expenses (default: day of --from)'
+    )
+    recurring_remove = recurring_commands.add_parser('remove', help='Remove a recurring expense')
+    recurring_remove.add_argument('id', help='Recurring expense id, as printed by add')
+    
+    convert = commands.add_parser(
+        'convert', help='Convert an expenses snapshot between JSON and the binary (.bin) format'
+    )
+    convert.add_argument('source', help='Snapshot to read, e.g. data/expenses.json')
+    convert.add_argument('target', help='Snapshot to write, e.g. data/expenses.bin')
+    
+    serve = commands.add_parser(
+        'serve', help='Serve the budget operations over HTTP/JSON for many users'
+    )
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument(
+        '--users-dir', default='data/users', help="Each user's data goes to USERS_DIR/<user id>"
+    )
+    serve.add_argument('--max-users', type=int, default=64, help='Users kept loaded at once')
+    serve.add_argument(
+        '--idle-timeout', type=float, default=600.0,
+        help='Seconds after which an idle user is flushed and unloaded'
+    )
+    
+    return parser
+
+def convert_snapshot(source: str, target: str) -> int:
+    """Convert an expenses snapshot between JSON and binary, chosen by the .bin extension"""
+    from src.services.binary_persistence import binary_to_json, json_to_binary
+    
+    if target.endswith('.bin') and not source.endswith('.bin'):
+        count = json_to_binary(source, target)
+    elif source.endswith('.bin') and not target.endswith('.bin'):
+        count = binary_to_json(source, target)
+    else:
+        print('Error: exactly one of the files must be a .bin snapshot', file=sys.stderr)
+        return 1
+    print(f'Converted {count} expenses from {source} to {target}')
+    return 0
+
+def run_command(view_model: BudgetViewModel, args) -> int:
+    """Run a headless command and return the process exit code"""
+    if args.command == 'summary':
+        print(view_model.get_expenses_summary(args.start, args.end))
+    elif args.command == 'add':
+        success, message = view_model.add_expense(
+            args.date, args.category, args.amount, args.description
+        )
+        print(message)
+        return 0 if success else 1
+    elif args.command == 'edit':
+        success, message = view_model.update_expense(
+            args.id, args.date, args.category, args.amount, args.description
+        )
+        print(message)
+        return 0 if success else 1
+    elif args.command == 'delete':
+        success, message = view_model.delete_expense(args.id)
+        print(message)
+        return 0 if success else 1
+    elif args.command == 'import':
+        success, message = view_model.import_expenses(args.file)
+        print(message)
+        return 0 if success else 1
+    elif args.command == 'search':
+        rows, message = view_model.search_expenses(
+            args.query, args.category, args.start, args.end, args.limit
+        )
+        for row in rows:
+            print('  '.join(row))
+        print(message)
+        if args.export:
+            print(view_model.export_search_results(
+                args.query, args.category, args.start, args.end, args.export
+            ))
+    elif args.command == 'list':
+        rows, _, message = view_model.get_expense_page(
+            args.page - 1, args.page_size, args.sort, args.desc, args.category,
+            args.start, args.end, args.min_amount, args.max_amount
+        )
+        for row in rows:
+            print('  '.join(row))
+        print(message)
+    elif args.command == 'report':
+        print(view_model.generate_comprehensive_report(args.start, args.end))
+    elif args.command == 'export-dataset':
+        print(view_model.export_expense_dataset(args.fmt, args.start, args.end, args.row_group_size))
+    elif args.command == 'analytics':
+        print(view_model.get_analytics_summary(args.start, args.end, args.top), end='')
+        if args.charts:
+            print(f'Monthly chart: {view_model.generate_monthly_chart(args.start, args.end)}')
+            print(f'Trend chart: {view_model.generate_trend_chart(args.start, args.end)}')
+    elif args.command == 'budget-history':
+        print(view_model.get_budget_history(args.count), end='')
+    elif args.command == 'recurring':
+        if args.recurring_command == 'list':
+            print(view_model.describe_recurring_expenses(), end='')
+            return 0
+        if args.recurring_command == 'add':
+            success, message = view_model.add_recurring_expense(
+                args.category, args.amount, args.start, args.description,
+                args.frequency, args.day, args.end
+            )
+        else:
+            success, message = view_model.remove_recurring_expense(args.id)
+        print(message)
+        return 0 if success else 1
+    return 0
+
+def serve(args) -> int:
+    """Run the multi-user HTTP service until interrupted"""
+    import asyncio
+    from src.services.user_service_cache import UserServiceCache
+    from src.views.http_server import BudgetHTTPServer
+    
+    cache = UserServiceCache(
+        lambda user_id: open_service(
+            args.backend, args.shard_period, os.path.join(args.users_dir, user_id)
+        ),
+        close_service,
+        max_users=args.max_users,
+        idle_timeout=args.idle_timeout
+    )
+    server = BudgetHTTPServer(cache, args.host, args.port)
+    
+    async def run():
+        port = await server.start()
+        print(f'Serving on http://{args.host}:{port}', file=sys.stderr)
+        await server.serve_forever()
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'convert':
+        return convert_snapshot(args.source, args.target)
+    if args.instrument or args.stats_out:
+        instrumentation.enable()
+    if args.command == 'serve':
+        try:
+            return serve(args)
+        finally:
+            if args.stats_out:
+                instrumentation.dump_json(args.stats_out)
 
-def main():
     # Initialize dependencies
-    persistence = JSONPersistence()
-    expense_service = ExpenseService(persistence)
+    expense_service = open_service(args.backend, args.shard_period)
     view_model = BudgetViewModel(expense_service)
-    main_window = MainWindow(view_model)
     
-    # Run the application
-    main_window.run()
+    try:
+        if args.command in (None, 'gui'):
+            # Imported here so headless commands never load PySimpleGUI
+            from src.views.main_window import MainWindow
+            
+            # Run the application
+            MainWindow(view_model).run()
+            return 0
+        view_model.subscribe_alerts(
+            lambda alert: print(f'Budget alert: {alert.message}', file=sys.stderr)
+        )
+        if not args.profile:
+            return run_command(view_model, args)
+        with instrumentation.profile_operation() as profile:
+            exit_code = run_command(view_model, args)
+        print(profile.profile_text(), file=sys.stderr)
+        print(f'Peak traced memory: {profile.peak_memory_bytes / 2**20:.1f} MiB', file=sys.stderr)
+        return exit_code
+    except ValueError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    finally:
+        close_service(expense_service)
+        if args.stats_out:
+            instrumentation.dump_json(args.stats_out)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -1,10 +1,23 @@
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, List
 from .expense import ExpenseCategory
+from .recurring_expense import RecurringExpense
+
+# Budget period -> rollup granularity its limits apply to
+BUDGET_PERIODS = {
+    'all': None,
+    'monthly': 'month',
+    'weekly': 'week',
+}
 
 @dataclass
 class Budget:
     limits: Dict[ExpenseCategory, float] = field(default_factory=dict)
+    # 'all' compares limits against all-time totals; 'monthly' and 'weekly'
+    # apply every limit to each month or week separately
+    period: str = 'all'
+    # Recurring expense rules, stored with the limits
+    recurring: List[RecurringExpense] = field(default_factory=list)
     
     def set_limit(self, category: ExpenseCategory, amount: float):
         """Set budget limit for a specific category"""
@@ -14,17 +27,36 @@ class Budget:
         """Get budget limit for a specific category"""
         return self.limits.get(category, 0.0)
     
+    @property
+    def granularity(self):
+        """Rollup granularity of the budget period, or None for all-time limits"""
+        return BUDGET_PERIODS[self.period]
+    
     def to_dict(self):
         """Convert budget to dictionary for serialization"""
-        return {
+        limits = {
             category.value: limit 
             for category, limit in self.limits.items()
         }
+        # All-time budgets without recurring expenses keep the original flat format
+        if self.period == 'all' and not self.recurring:
+            return limits
+        data = {'period': self.period, 'limits': limits}
+        if self.recurring:
+            data['recurring'] = [rule.to_dict() for rule in self.recurring]
+        return data
     
     @classmethod
     def from_dict(cls, data: dict):
         """Create Budget from dictionary"""
         budget = cls()
+        if isinstance(data.get('limits'), dict):
+            period = data.get('period', 'all')
+            if period not in BUDGET_PERIODS:
+                raise ValueError(f"Unknown budget period '{period}'")
+            budget.period = period
+            budget.recurring = [RecurringExpense.from_dict(rule) for rule in data.get('recurring', [])]
+            data = data['limits']
         for category_str, limit in data.items():
             category = ExpenseCategory(category_str)
             budget.set_limit(category, float(limit))
@@ -1,3 +1,4 @@
+import uuid
 from dataclasses import dataclass, field
 from datetime import date
 from enum import Enum, auto
@@ -10,13 +11,17 @@ class ExpenseCategory(Enum):
     UTILITIES = "Utilities"
     MISCELLANEOUS = "Miscellaneous"
 
-@dataclass
+def new_expense_id() -> str:
+    """Generate a collision-free expense id"""
+    return uuid.uuid4().hex
+
+@dataclass(slots=True)
 class Expense:
     date: date
     category: ExpenseCategory
     amount: float
     description: str = ''
-    id: Optional[str] = field(default_factory=lambda: str(hash(date.today())))
+    id: Optional[str] = field(default_factory=new_expense_id)
 
     def to_dict(self):
         """Convert expense to dictionary for serialization"""
@@ -0,0 +1,388 @@
+import sys
+from array import array
+from itertools import count
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .expense import Expense, ExpenseCategory, new_expense_id
+
+# Small integer codes for categories, in declaration order
+CATEGORIES: List[ExpenseCategory] = list(ExpenseCategory)
+CATEGORY_CODES: Dict[ExpenseCategory, int] = {
+    category: code for code, category in enumerate(CATEGORIES)
+}
+
+
+# Layout generations: a store takes a new one whenever its rows are renumbered
+_GENERATIONS = count()
+
+
+def month_key(value: date) -> int:
+    """Index months as year * 12 + month - 1 so consecutive months are consecutive ints"""
+    return value.year * 12 + value.month - 1
+
+
+# Largest magnitude in cents the int64 amount column can hold
+MAX_CENTS = 2 ** 63 - 1
+
+
+def to_cents(amount: float) -> int:
+    """Convert an amount to integer cents; raises ValueError if it isn't finite or doesn't fit in 64 bits"""
+    try:
+        cents = int(round(amount * 100))
+    except (OverflowError, ValueError):
+        raise ValueError(f"Invalid amount {amount}") from None
+    if not -MAX_CENTS <= cents <= MAX_CENTS:
+        raise ValueError(f"Amount {amount} is too large")
+    return cents
+
+
+class ExpenseStore:
+    """
+    Columnar in-memory storage for expenses.
+
+    Rows are kept in parallel arrays (date ordinals, category codes, amounts
+    in integer cents, interned descriptions and ids) instead of one object per
+    row. Expense objects are only created when a row is accessed. Row indices
+    are also bucketed by month so date-window queries only visit the rows in
+    the window, and indexed by id for O(1) lookup, update and delete.
+
+    Deleted rows are tombstoned: their amount is zeroed and they are dropped
+    from the date and id indexes, so sums and window queries skip them at no
+    cost. Operations that walk every row compact the columns first.
+    """
+
+    def __init__(self, expenses: Iterable[Expense] = ()):
+        self.date_ordinals = array('l')
+        self.category_codes = array('B')
+        self.amount_cents = array('q')
+        self.descriptions: List[str] = []
+        self.ids: List[Optional[str]] = []
+        # Date index: month key -> row indices, plus the sorted month keys
+        self._month_rows: Dict[int, array] = {}
+        self._months: List[int] = []
+        # Id index: expense id -> row, plus rows whose id is missing or already taken
+        self._id_rows: Dict[str, int] = {}
+        self._unkeyed: List[int] = []
+        self._deleted: Set[int] = set()
+        # Changes when compaction or clear() renumbers rows, so row-based indexes can tell
+        self.generation = next(_GENERATIONS)
+        for expense in expenses:
+            self.append(expense)
+
+    def __len__(self) -> int:
+        return len(self.amount_cents) - len(self._deleted)
+
+    def __iter__(self) -> Iterator[Expense]:
+        self.compact()
+        for index in range(len(self)):
+            yield self._view(index)
+
+    def __getitem__(self, index):
+        self.compact()
+        if isinstance(index, slice):
+            return [self._view(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('expense index out of range')
+        return self._view(index)
+
+    def _view(self, index: int) -> Expense:
+        return Expense(
+            date=date.fromordinal(self.date_ordinals[index]),
+            category=CATEGORIES[self.category_codes[index]],
+            amount=self.amount_cents[index] / 100,
+            description=self.descriptions[index],
+            id=self.ids[index]
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'ExpenseStore':
+        """
+        Build a store from serialized expense dicts, e.g. a persistence stream
+        
+        Each record is consumed and dropped as it is read. Date strings and
+        category values are parsed once and cached, since many rows share them.
+        """
+        store = cls()
+        dates: Dict[str, Tuple[int, int]] = {}
+        codes = {category.value: code for category, code in CATEGORY_CODES.items()}
+        for record in records:
+            iso = record['date']
+            parsed = dates.get(iso)
+            if parsed is None:
+                value = date.fromisoformat(iso)
+                parsed = dates[iso] = (value.toordinal(), month_key(value))
+            code = codes.get(record['category'])
+            if code is None:
+                raise ValueError(f"'{record['category']}' is not a valid ExpenseCategory")
+            store._append_row(
+                parsed[0], parsed[1], code, to_cents(float(record['amount'])),
+                record.get('description', ''), record.get('id')
+            )
+        return store
+
+    def _append_row(self, ordinal: int, key: int, code: int, cents: int,
+                    description: str, expense_id: Optional[str]):
+        # Interned before any column changes, so a non-str description raises cleanly
+        description = sys.intern(description)
+        rows = self._month_rows.get(key)
+        if rows is None:
+            rows = self._month_rows[key] = array('l')
+            insort(self._months, key)
+        row = len(self.amount_cents)
+        rows.append(row)
+        if expense_id is None or expense_id in self._id_rows:
+            self._unkeyed.append(row)
+        else:
+            self._id_rows[expense_id] = row
+        self.date_ordinals.append(ordinal)
+        self.category_codes.append(code)
+        self.amount_cents.append(cents)
+        self.descriptions.append(description)
+        self.ids.append(expense_id)
+
+    def append_values(self, expense_date: date, category: ExpenseCategory, amount: float,
+                      description: str = '', expense_id: Optional[str] = None):
+        """Append a row from its field values without building an Expense"""
+        self._append_row(
+            expense_date.toordinal(), month_key(expense_date), CATEGORY_CODES[category],
+            to_cents(amount), description, expense_id
+        )
+
+    def append(self, expense: Expense):
+        """Append an expense"""
+        self.append_values(
+            expense.date, expense.category, expense.amount, expense.description, expense.id
+        )
+
+    def extend(self, expenses: Iterable[Expense]):
+        """
+        Append several expenses
+        
+        Every row is converted before the first is appended, so an invalid
+        amount, category or description raises without appending any of them.
+        """
+        rows = []
+        for expense in expenses:
+            code = CATEGORY_CODES.get(expense.category)
+            if code is None:
+                raise ValueError(f"'{expense.category}' is not a valid ExpenseCategory")
+            rows.append((
+                expense.date.toordinal(), month_key(expense.date), code,
+                to_cents(expense.amount), sys.intern(expense.description), expense.id
+            ))
+        for row in rows:
+            self._append_row(*row)
+
+    def clear(self):
+        """Remove all rows"""
+        self.__init__()
+
+    def ensure_unique_ids(self) -> int:
+        """
+        Give a fresh id to every row whose id is missing or already used by an
+        earlier row (older data files reused one id for a whole day)
+        
+        Returns:
+            int: Number of rows that got a new id
+        """
+        count = 0
+        for row in self._unkeyed:
+            if row in self._deleted:
+                continue
+            expense_id = new_expense_id()
+            self.ids[row] = expense_id
+            self._id_rows[expense_id] = row
+            count += 1
+        self._unkeyed = []
+        return count
+
+    def live_rows(self) -> Iterable[int]:
+        """Return the row numbers that aren't tombstoned, without compacting"""
+        if not self._deleted:
+            return range(len(self.amount_cents))
+        deleted = self._deleted
+        return [row for row in range(len(self.amount_cents)) if row not in deleted]
+
+    def row_of(self, expense_id: str) -> Optional[int]:
+        """Return the row holding an expense id, or None"""
+        return self._id_rows.get(expense_id)
+
+    def rows_of(self, expense_ids: Iterable[str]) -> List[int]:
+        """Return the sorted rows holding the given ids, skipping unknown ones"""
+        rows = [row for row in map(self._id_rows.get, expense_ids) if row is not None]
+        rows.sort()
+        return rows
+
+    def get(self, expense_id: str) -> Optional[Expense]:
+        """Return the expense with an id, or None"""
+        row = self._id_rows.get(expense_id)
+        return None if row is None else self._view(row)
+
+    def _unbucket(self, row: int):
+        key = month_key(date.fromordinal(self.date_ordinals[row]))
+        bucket = self._month_rows[key]
+        del bucket[bisect_left(bucket, row)]
+        if not bucket:
+            del self._month_rows[key]
+            self._months.remove(key)
+
+    def _bucket(self, row: int):
+        key = month_key(date.fromordinal(self.date_ordinals[row]))
+        bucket = self._month_rows.get(key)
+        if bucket is None:
+            bucket = self._month_rows[key] = array('l')
+            insort(self._months, key)
+        insort(bucket, row)
+
+    def replace(self, row: int, expense: Expense) -> Expense:
+        """Overwrite a row in place (keeping its id) and return the previous expense"""
+        # Converted first, so an invalid amount raises before the row changes
+        cents = to_cents(expense.amount)
+        code = CATEGORY_CODES[expense.category]
+        description = sys.intern(expense.description)
+        previous = self._view(row)
+        if expense.date != previous.date:
+            self._unbucket(row)
+            self.date_ordinals[row] = expense.date.toordinal()
+            self._bucket(row)
+        self.category_codes[row] = code
+        self.amount_cents[row] = cents
+        self.descriptions[row] = description
+        return previous
+
+    def delete(self, row: int) -> Expense:
+        """Tombstone a row and return the expense it held"""
+        previous = self._view(row)
+        self._unbucket(row)
+        if self._id_rows.get(previous.id) == row:
+            del self._id_rows[previous.id]
+        self.amount_cents[row] = 0
+        self._deleted.add(row)
+        return previous
+
+    def compact(self):
+        """Drop tombstoned rows from the columns, renumbering the remaining rows"""
+        if not self._deleted:
+            return
+        deleted = self._deleted
+        live = [
+            values for row, values in enumerate(zip(
+                self.date_ordinals, self.category_codes, self.amount_cents, self.descriptions, self.ids
+            ))
+            if row not in deleted
+        ]
+        self.__init__()
+        month_keys: Dict[int, int] = {}
+        for ordinal, code, cents, description, expense_id in live:
+            key = month_keys.get(ordinal)
+            if key is None:
+                key = month_keys[ordinal] = month_key(date.fromordinal(ordinal))
+            self._append_row(ordinal, key, code, cents, description, expense_id)
+
+    def copy(self) -> 'ExpenseStore':
+        """Return an independent copy of the store, e.g. a snapshot for a background reader"""
+        other = ExpenseStore.__new__(ExpenseStore)
+        other.date_ordinals = self.date_ordinals[:]
+        other.category_codes = self.category_codes[:]
+        other.amount_cents = self.amount_cents[:]
+        other.descriptions = self.descriptions[:]
+        other.ids = self.ids[:]
+        other._month_rows = {key: rows[:] for key, rows in self._month_rows.items()}
+        other._months = self._months[:]
+        other._id_rows = dict(self._id_rows)
+        other._unkeyed = self._unkeyed[:]
+        other._deleted = set(self._deleted)
+        other.generation = next(_GENERATIONS)
+        return other
+
+    def rows_between(self, start: Optional[date] = None, end: Optional[date] = None) -> List[int]:
+        """
+        Return row indices with start <= date <= end (either bound may be None)
+        
+        Only the month buckets overlapping the window are visited, and only the
+        first and last of those need a per-row date check.
+        """
+        if start is None and end is None:
+            self.compact()
+            return list(range(len(self)))
+        first = bisect_left(self._months, month_key(start)) if start else 0
+        last = bisect_right(self._months, month_key(end)) if end else len(self._months)
+        start_ordinal = start.toordinal() if start else None
+        end_ordinal = end.toordinal() if end else None
+        ordinals = self.date_ordinals
+        
+        rows: List[int] = []
+        for key in self._months[first:last]:
+            bucket = self._month_rows[key]
+            partial = (start and key == month_key(start)) or (end and key == month_key(end))
+            if not partial:
+                rows.extend(bucket)
+                continue
+            rows.extend(
+                row for row in bucket
+                if (start_ordinal is None or ordinals[row] >= start_ordinal)
+                and (end_ordinal is None or ordinals[row] <= end_ordinal)
+            )
+        rows.sort()
+        return rows
+
+    def month_buckets(self) -> Iterator[Tuple[int, array]]:
+        """Yield (month key, row indices) for every month with expenses, oldest first"""
+        for key in self._months:
+            yield key, self._month_rows[key]
+
+    def between(self, start: Optional[date] = None, end: Optional[date] = None) -> List[Expense]:
+        """Return the expenses dated within [start, end]"""
+        return self.at(self.rows_between(start, end))
+
+    def at(self, rows: Iterable[int]) -> List[Expense]:
+        """Return the expenses stored in the given rows"""
+        return [self._view(row) for row in rows]
+
+    def category_cents(self, rows: Optional[Iterable[int]] = None) -> List[int]:
+        """Sum amounts in cents per category code, over all rows or the given ones"""
+        sums = [0] * len(CATEGORIES)
+        if rows is None:
+            for code, cents in zip(self.category_codes, self.amount_cents):
+                sums[code] += cents
+        else:
+            codes, amounts = self.category_codes, self.amount_cents
+            for row in rows:
+                sums[codes[row]] += amounts[row]
+        return sums
+
+    def totals_by_category(self) -> Dict[ExpenseCategory, float]:
+        """Sum amounts per category"""
+        return {
+            category: cents / 100
+            for category, cents in zip(CATEGORIES, self.category_cents())
+        }
+
+    def iter_rows(self) -> Iterator[Tuple[str, str, float, str]]:
+        """Yield (ISO date, category value, amount, description) tuples straight from the columns"""
+        self.compact()
+        iso_dates: Dict[int, str] = {}
+        category_values = [category.value for category in CATEGORIES]
+        for ordinal, code, cents, description in zip(
+            self.date_ordinals, self.category_codes, self.amount_cents, self.descriptions
+        ):
+            iso = iso_dates.get(ordinal)
+            if iso is None:
+                iso = iso_dates[ordinal] = date.fromordinal(ordinal).isoformat()
+            yield iso, category_values[code], cents / 100, description
+
+    def to_dicts(self) -> Iterator[Dict]:
+        """Yield rows as serialization dictionaries"""
+        self.compact()
+        for (iso, category, amount, description), expense_id in zip(self.iter_rows(), self.ids):
+            yield {
+                'id': expense_id,
+                'date': iso,
+                'category': category,
+                'amount': amount,
+                'description': description
+            }
@@ -0,0 +1,138 @@
+import calendar
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Iterator, Optional, Tuple
+
+from .expense import Expense, ExpenseCategory, new_expense_id
+from .expense_store import MAX_CENTS
+
+RECURRENCE_FREQUENCIES = ('monthly', 'weekly')
+
+
+def _month_index(value: date) -> int:
+    return value.year * 12 + value.month - 1
+
+
+def _day_in_month(month_index: int, day: int) -> date:
+    """The given day of a month, moved to the month's last day when it is shorter"""
+    year, month = divmod(month_index, 12)
+    month += 1
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+@dataclass
+class RecurringExpense:
+    """
+    A rule for an expense that repeats, e.g. rent on the 1st of every month.
+
+    Only the rule is stored; occurrences are generated from it when a date
+    window is queried. Monthly rules fall on the given day of each month
+    (the last day in shorter months), weekly rules every 7 days from start.
+    Both stop after end when it is set.
+    """
+    category: ExpenseCategory
+    amount: float
+    start: date
+    description: str = ''
+    frequency: str = 'monthly'
+    # Day of the month for monthly rules; defaults to the day of start
+    day: Optional[int] = None
+    end: Optional[date] = None
+    id: str = field(default_factory=new_expense_id)
+
+    def __post_init__(self):
+        if self.frequency not in RECURRENCE_FREQUENCIES:
+            raise ValueError(f"Unknown recurrence frequency '{self.frequency}'")
+        if not self.amount > 0:
+            raise ValueError("Amount must be positive")
+        if not self.amount * 100 < MAX_CENTS:
+            raise ValueError("Amount is too large")
+        if self.day is None and self.frequency == 'monthly':
+            self.day = self.start.day
+        if self.day is not None and not 1 <= self.day <= 31:
+            raise ValueError("Day of the month must be between 1 and 31")
+        if self.end is not None and self.end < self.start:
+            raise ValueError("End date cannot be before the start date")
+
+    def _window(self, start: Optional[date], end: date) -> Optional[Tuple[date, date]]:
+        """Clip [start, end] to the dates the rule is active, or None if they don't overlap"""
+        low = self.start if start is None else max(start, self.start)
+        high = end if self.end is None else min(end, self.end)
+        return (low, high) if low <= high else None
+
+    def _month_span(self, low: date, high: date) -> Tuple[int, int]:
+        """First and last month index whose occurrence falls within [low, high]"""
+        first = _month_index(low)
+        if _day_in_month(first, self.day) < low:
+            first += 1
+        last = _month_index(high)
+        if _day_in_month(last, self.day) > high:
+            last -= 1
+        return first, last
+
+    def _week_span(self, low: date, high: date) -> Tuple[int, int]:
+        """First and last week number, counted from start, whose occurrence falls within [low, high]"""
+        return -(-(low - self.start).days // 7), (high - self.start).days // 7
+
+    def count_between(self, start: Optional[date], end: date) -> int:
+        """Return how many occurrences fall within [start, end], without generating them"""
+        window = self._window(start, end)
+        if window is None:
+            return 0
+        span = self._month_span if self.frequency == 'monthly' else self._week_span
+        first, last = span(*window)
+        return max(0, last - first + 1)
+
+    def dates_between(self, start: Optional[date], end: date) -> Iterator[date]:
+        """Yield the occurrence dates within [start, end] in order"""
+        window = self._window(start, end)
+        if window is None:
+            return
+        if self.frequency == 'monthly':
+            first, last = self._month_span(*window)
+            for month in range(first, last + 1):
+                yield _day_in_month(month, self.day)
+        else:
+            first, last = self._week_span(*window)
+            for week in range(first, last + 1):
+                yield self.start + timedelta(weeks=week)
+
+    def occurrences(self, start: Optional[date], end: date) -> Iterator[Expense]:
+        """
+        Yield the occurrences within [start, end] as expenses
+
+        Each occurrence gets a stable id made of the rule id and its date.
+        """
+        for value in self.dates_between(start, end):
+            yield Expense(value, self.category, self.amount, self.description,
+                          id=f'{self.id}@{value.isoformat()}')
+
+    def to_dict(self):
+        """Convert the rule to a dictionary for serialization"""
+        data = {
+            'id': self.id,
+            'category': self.category.value,
+            'amount': self.amount,
+            'description': self.description,
+            'frequency': self.frequency,
+            'start': self.start.isoformat(),
+        }
+        if self.day is not None:
+            data['day'] = self.day
+        if self.end is not None:
+            data['end'] = self.end.isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Create a RecurringExpense from a dictionary"""
+        return cls(
+            category=ExpenseCategory(data['category']),
+            amount=float(data['amount']),
+            start=date.fromisoformat(data['start']),
+            description=data.get('description', ''),
+            frequency=data.get('frequency', 'monthly'),
+            day=data.get('day'),
+            end=date.fromisoformat(data['end']) if data.get('end') else None,
+            id=data.get('id') or new_expense_id()
+        )
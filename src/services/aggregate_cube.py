@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from ..models.expense import ExpenseCategory
+from ..models.expense_store import CATEGORIES, CATEGORY_CODES
+
+# Period label for each supported rollup granularity
+PERIOD_LABELS = {
+    'day': lambda value: value.isoformat(),
+    'week': lambda value: '{0}-W{1:02d}'.format(*value.isocalendar()),
+    'month': lambda value: f'{value.year}-{value.month:02d}',
+    'year': lambda value: str(value.year),
+}
+
+
+def previous_periods(granularity: str, count: int, until: date = None) -> List[str]:
+    """Return the labels of the count periods ending with the one containing until, oldest first"""
+    until = until or date.today()
+    label = PERIOD_LABELS[granularity]
+    if granularity == 'month':
+        index = until.year * 12 + until.month - 1
+        return [
+            label(date((index - offset) // 12, (index - offset) % 12 + 1, 1))
+            for offset in reversed(range(count))
+        ]
+    if granularity == 'week':
+        return [label(until - timedelta(weeks=offset)) for offset in reversed(range(count))]
+    if granularity == 'day':
+        return [label(until - timedelta(days=offset)) for offset in reversed(range(count))]
+    return [str(until.year - offset) for offset in reversed(range(count))]
+
+
+def period_bounds(granularity: str, period: str) -> Tuple[date, date]:
+    """Return the first and last date of the period with the given label"""
+    if granularity == 'day':
+        first = date.fromisoformat(period)
+        return first, first
+    if granularity == 'week':
+        year, week = period.split('-W')
+        first = date.fromisocalendar(int(year), int(week), 1)
+        return first, first + timedelta(days=6)
+    if granularity == 'month':
+        year, month = map(int, period.split('-'))
+        following = date(year + month // 12, month % 12 + 1, 1)
+        return date(year, month, 1), following - timedelta(days=1)
+    if granularity == 'year':
+        return date(int(period), 1, 1), date(int(period), 12, 31)
+    raise ValueError(f"Unknown period granularity '{granularity}'")
+
+
+class AggregateCube:
+    """
+    Expense totals keyed by (period, category) for one granularity.
+
+    Cells hold integer cents and are updated incrementally as expenses are
+    added, so reading a period costs O(categories) regardless of how many
+    expenses fall into it. Each period also counts its expenses, and is
+    dropped once the last one is taken out, so a cube updated in place
+    matches one rebuilt from scratch.
+    """
+
+    def __init__(self, granularity: str = 'month'):
+        if granularity not in PERIOD_LABELS:
+            raise ValueError(f"Unknown period granularity '{granularity}'")
+        self.granularity = granularity
+        self._label = PERIOD_LABELS[granularity]
+        self._labels: Dict[int, str] = {}
+        # Period label -> cents per category code
+        self.cells: Dict[str, List[int]] = {}
+        # Period label -> number of expenses in it
+        self.counts: Dict[str, int] = {}
+
+    def period_of(self, value: date) -> str:
+        """Return the label of the period containing a date"""
+        return self._label(value)
+
+    def add_ordinal(self, ordinal: int, category_code: int, cents: int, count: int = 1):
+        """Add an amount given its date ordinal and category code; count=-1 takes an expense out"""
+        period = self._labels.get(ordinal)
+        if period is None:
+            period = self._labels[ordinal] = self._label(date.fromordinal(ordinal))
+        cell = self.cells.get(period)
+        if cell is None:
+            cell = self.cells[period] = [0] * len(CATEGORIES)
+        cell[category_code] += cents
+        remaining = self.counts.get(period, 0) + count
+        if remaining > 0:
+            self.counts[period] = remaining
+        else:
+            del self.cells[period]
+            self.counts.pop(period, None)
+
+    def add(self, value: date, category: ExpenseCategory, cents: int, count: int = 1):
+        """Add an amount in cents to the (period, category) cell; count=-1 takes an expense out"""
+        self.add_ordinal(value.toordinal(), CATEGORY_CODES[category], cents, count)
+
+    def extend(self, rows: Iterable[Tuple[int, int, int]]):
+        """Add (date ordinal, category code, cents) rows"""
+        for ordinal, code, cents in rows:
+            self.add_ordinal(ordinal, code, cents)
+
+    def clear(self):
+        """Drop all cells"""
+        self.cells.clear()
+        self.counts.clear()
+
+    def periods(self) -> List[str]:
+        """Return the labels of all periods with expenses, oldest first"""
+        return sorted(self.cells)
+
+    def period_cents(self, period: str) -> List[int]:
+        """Return cents per category code for a period"""
+        return self.cells.get(period, [0] * len(CATEGORIES))
+
+    def period_totals(self, period: str) -> Dict[ExpenseCategory, float]:
+        """Return expenses by category for a period"""
+        return {
+            category: cents / 100
+            for category, cents in zip(CATEGORIES, self.period_cents(period))
+        }
+
+    def totals_by_period(self) -> Dict[str, float]:
+        """Return total expenses per period, oldest first"""
+        return {period: sum(self.cells[period]) / 100 for period in self.periods()}
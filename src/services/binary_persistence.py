@@ -0,0 +1,256 @@
+import mmap
+import os
+import struct
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..models.expense import ExpenseCategory
+from ..models.expense_store import CATEGORIES, CATEGORY_CODES, ExpenseStore
+from .data_persistence import JSONPersistence, JournaledJSONPersistence, _atomic_write
+from ..utils.instrumentation import instrumented, record_io
+
+MAGIC = b'BEXP'
+VERSION = 1
+# magic, version, category count, record count, category names (heap offset, length)
+HEADER = struct.Struct('<4sHHQII')
+# date ordinal, category code, amount in cents, description and id (heap offset, length)
+RECORD = struct.Struct('<iBxxxqIIII')
+ORDINAL = struct.Struct('<i')
+# Heap offset marking an expense without an id
+NO_ID = 0xFFFFFFFF
+
+
+def write_snapshot(path: str, records: Iterable[Dict]) -> Tuple[int, int]:
+    """
+    Atomically write expense dicts as a binary snapshot sorted by date
+
+    Returns:
+        Tuple[int, int]: Number of records and bytes written
+    """
+    store = ExpenseStore.from_records(records)
+    # Stable sort, so expenses on the same day keep their order
+    order = sorted(range(len(store)), key=store.date_ordinals.__getitem__)
+
+    heap = bytearray()
+    spans: Dict[str, Tuple[int, int]] = {}
+
+    def add_text(text: str) -> Tuple[int, int]:
+        # Repeated strings are stored once
+        span = spans.get(text)
+        if span is None:
+            data = text.encode('utf-8')
+            span = spans[text] = (len(heap), len(data))
+            heap.extend(data)
+        return span
+
+    names = add_text('\n'.join(category.value for category in CATEGORIES))
+    body = bytearray(RECORD.size * len(order))
+    for slot, row in enumerate(order):
+        expense_id = store.ids[row]
+        RECORD.pack_into(
+            body, slot * RECORD.size,
+            store.date_ordinals[row], store.category_codes[row], store.amount_cents[row],
+            *add_text(store.descriptions[row]),
+            *(add_text(expense_id) if expense_id is not None else (NO_ID, 0))
+        )
+    totals = store.category_cents()
+
+    def write(f):
+        f.write(HEADER.pack(MAGIC, VERSION, len(CATEGORIES), len(order), *names))
+        f.write(struct.pack(f'<{len(totals)}q', *totals))
+        f.write(body)
+        f.write(heap)
+    return len(order), _atomic_write(path, write, binary=True)
+
+
+class BinarySnapshot:
+    """
+    Read-only, memory-mapped view of a binary expense snapshot.
+
+    The file is a header, the total in cents per category, fixed-width
+    records sorted by date and a heap of UTF-8 strings the records point
+    into. Nothing is decoded up front: totals come from the header, date
+    windows are found by binary search over the records, and only the
+    records a query touches are unpacked.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            # The mapping keeps its own handle, so the file can be closed right away
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, category_count, self.count, names_offset, names_length = (
+                HEADER.unpack_from(self._map, 0)
+            )
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"'{path}' is not a binary expense snapshot")
+            self._records_start = HEADER.size + 8 * category_count
+            self._heap_start = self._records_start + self.count * RECORD.size
+
+            # Map the file's category codes onto the current ones by name
+            names = self._text(names_offset, names_length).split('\n')
+            self._codes = [CATEGORY_CODES[ExpenseCategory(name)] for name in names]
+            self.category_cents = [0] * len(CATEGORIES)
+            stored = struct.unpack_from(f'<{category_count}q', self._map, HEADER.size)
+            for code, cents in zip(self._codes, stored):
+                self.category_cents[code] += cents
+        except BaseException:
+            self._map.close()
+            raise
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        self._map.close()
+
+    def _text(self, offset: int, length: int) -> str:
+        start = self._heap_start + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def _ordinal_at(self, slot: int) -> int:
+        return ORDINAL.unpack_from(self._map, self._records_start + slot * RECORD.size)[0]
+
+    def slots_between(self, start: Optional[date] = None, end: Optional[date] = None) -> range:
+        """Return the record slots dated within [start, end], found by binary search"""
+        slots = range(self.count)
+        first = bisect_left(slots, start.toordinal(), key=self._ordinal_at) if start else 0
+        last = bisect_right(slots, end.toordinal(), key=self._ordinal_at) if end else self.count
+        return range(first, max(first, last))
+
+    def _unpack(self, slots: range) -> Iterator[Tuple]:
+        begin = self._records_start + slots.start * RECORD.size
+        return RECORD.iter_unpack(self._map[begin:begin + len(slots) * RECORD.size])
+
+    def cents_by_category(self, slots: Optional[range] = None) -> List[int]:
+        """Sum cents per category code, over all records (from the header) or the given slots"""
+        if slots is None or len(slots) == self.count:
+            return list(self.category_cents)
+        sums = [0] * len(CATEGORIES)
+        codes = self._codes
+        for _, code, cents, *_ in self._unpack(slots):
+            sums[codes[code]] += cents
+        return sums
+
+    def iter_records(self, slots: Optional[range] = None) -> Iterator[Dict]:
+        """Decode records into expense dicts, only for the given slots"""
+        slots = range(self.count) if slots is None else slots
+        category_values = [CATEGORIES[code].value for code in self._codes]
+        iso_dates: Dict[int, str] = {}
+        texts: Dict[int, str] = {}
+        for ordinal, code, cents, desc_offset, desc_length, id_offset, id_length in self._unpack(slots):
+            iso = iso_dates.get(ordinal)
+            if iso is None:
+                iso = iso_dates[ordinal] = date.fromordinal(ordinal).isoformat()
+            description = texts.get(desc_offset)
+            if description is None:
+                description = texts[desc_offset] = self._text(desc_offset, desc_length)
+            yield {
+                'id': None if id_offset == NO_ID else self._text(id_offset, id_length),
+                'date': iso,
+                'category': category_values[code],
+                'amount': cents / 100,
+                'description': description
+            }
+
+
+class BinarySnapshotPersistence(JSONPersistence):
+    """
+    Persistence storing expenses in a memory-mapped binary snapshot.
+
+    Startup only reads the snapshot header: totals and date-window queries
+    are answered from the mapping, and rows are decoded when they are
+    actually needed. Expenses are stored sorted by date, and every save
+    rewrites the snapshot. The budget is kept in JSON like JSONPersistence.
+    """
+    supports_incremental_writes = False
+    supports_aggregation = True
+
+    def __init__(self, expenses_file: str = 'data/expenses.bin',
+                 budget_file: str = 'data/budget_config.json'):
+        super().__init__(expenses_file, budget_file)
+        self._snapshot: Optional[BinarySnapshot] = None
+
+    def _open(self) -> Optional[BinarySnapshot]:
+        if self._snapshot is None:
+            try:
+                self._snapshot = BinarySnapshot(self.expenses_file)
+            except FileNotFoundError:
+                return None
+        return self._snapshot
+
+    def _detach(self):
+        snapshot, self._snapshot = self._snapshot, None
+        # Windows can't replace or delete a mapped file. Elsewhere the old
+        # mapping stays valid for readers still using it until it is collected.
+        if snapshot is not None and os.name == 'nt':
+            snapshot.close()
+
+    @instrumented('persistence.save_expenses')
+    def save_expenses(self, expenses: List[Dict]):
+        """Save expenses as a binary snapshot"""
+        self._detach()
+        rows, written = write_snapshot(self.expenses_file, expenses)
+        record_io('persistence.save_expenses', rows=rows, bytes_written=written)
+
+    @instrumented('persistence.load_expenses', rows=len)
+    def load_expenses(self) -> List[Dict]:
+        """Load all expenses, sorted by date"""
+        return list(self.iter_expenses())
+
+    def iter_expenses(self, start: Optional[date] = None,
+                      end: Optional[date] = None) -> Iterator[Dict]:
+        """Yield expenses sorted by date, optionally only those within [start, end]"""
+        snapshot = self._open()
+        if snapshot is not None:
+            yield from snapshot.iter_records(snapshot.slots_between(start, end))
+
+    def clear_expenses(self):
+        """Remove the stored snapshot"""
+        self._detach()
+        super().clear_expenses()
+
+    @instrumented('persistence.binary_total')
+    def get_total_expenses(self) -> float:
+        """Sum all expense amounts from the snapshot header"""
+        snapshot = self._open()
+        return sum(snapshot.category_cents) / 100 if snapshot else 0.0
+
+    @instrumented('persistence.binary_totals_by_category')
+    def get_expenses_by_category(self, start: Optional[date] = None,
+                                 end: Optional[date] = None) -> Dict[str, float]:
+        """Sum expense amounts per category, optionally within [start, end]"""
+        snapshot = self._open()
+        if snapshot is None:
+            return {}
+        slots = snapshot.slots_between(start, end) if start or end else None
+        return {
+            category.value: cents / 100
+            for category, cents in zip(CATEGORIES, snapshot.cents_by_category(slots))
+            if cents
+        }
+
+    def close(self):
+        """Release the snapshot mapping"""
+        snapshot, self._snapshot = self._snapshot, None
+        if snapshot is not None:
+            snapshot.close()
+
+
+def json_to_binary(json_file: str, binary_file: str) -> int:
+    """Convert a JSON expenses snapshot (and its journal, if any) to a binary snapshot; returns the row count"""
+    rows, _ = write_snapshot(binary_file, JournaledJSONPersistence(json_file).iter_expenses())
+    return rows
+
+
+def binary_to_json(binary_file: str, json_file: str) -> int:
+    """Convert a binary snapshot to a JSON expenses snapshot; returns the row count"""
+    source = BinarySnapshotPersistence(binary_file)
+    try:
+        expenses = source.load_expenses()
+    finally:
+        source.close()
+    JournaledJSONPersistence(json_file).save_expenses(expenses)
+    return len(expenses)
@@ -0,0 +1,123 @@
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..models.expense import Expense, ExpenseCategory
+from ..models.expense_store import to_cents
+
+# Alert level -> fraction of the limit that spending has to go above
+DEFAULT_THRESHOLDS = {'warning': 0.8, 'exceeded': 1.0}
+
+
+@dataclass(frozen=True)
+class BudgetAlert:
+    category: ExpenseCategory
+    # Name of the crossed threshold, e.g. 'warning' or 'exceeded'
+    level: str
+    threshold: float
+    spent: float
+    limit: float
+    # Budget period label ('2025-05', '2025-W20'), or None for all-time budgets
+    period: Optional[str] = None
+
+    @property
+    def message(self) -> str:
+        """Describe the alert for display"""
+        scope = f' in {self.period}' if self.period else ''
+        return (
+            f"{self.category.value} budget {self.level}{scope}: "
+            f"${self.spent:.2f} of ${self.limit:.2f} ({self.spent / self.limit:.0%})"
+        )
+
+
+class BudgetAlertEngine:
+    """
+    Fires budget alerts as expenses come in.
+
+    ExpenseService reports which (category, period) cells each insert or
+    batch touched. Only those cells are compared against their limit, using
+    the service's running totals or aggregate cube, so nothing is rescanned.
+    Subscribers are called when spending goes above a threshold (by default
+    80% 'warning' and 100% 'exceeded' of the limit). Each threshold fires
+    once per cell, and again only after spending has dropped back below it
+    or the budget changed.
+    """
+
+    def __init__(self, service, thresholds: Dict[str, float] = None):
+        self.service = service
+        self.set_thresholds(thresholds or DEFAULT_THRESHOLDS)
+        self._subscribers: List[Callable[[BudgetAlert], None]] = []
+        # (category, period) -> index of the highest threshold already alerted
+        self._fired: Dict[Tuple[ExpenseCategory, Optional[str]], int] = {}
+        self._lock = threading.Lock()
+
+    def set_thresholds(self, thresholds: Dict[str, float]):
+        """Replace the alert levels, as level name -> fraction of the limit"""
+        if not thresholds or any(fraction <= 0 for fraction in thresholds.values()):
+            raise ValueError('Alert thresholds must be positive fractions of the limit')
+        self.thresholds = sorted((fraction, level) for level, fraction in thresholds.items())
+        self.reset()
+
+    def subscribe(self, callback: Callable[[BudgetAlert], None]) -> Callable[[], None]:
+        """Call callback(alert) for every new alert; returns a function that unsubscribes"""
+        self._subscribers.append(callback)
+        return lambda: self.unsubscribe(callback)
+
+    def unsubscribe(self, callback: Callable[[BudgetAlert], None]):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def reset(self):
+        """Forget which alerts fired, e.g. after the limits change"""
+        self._fired = {}
+
+    def expenses_changed(self, added: Iterable[Expense], removed: Iterable[Expense] = ()):
+        """
+        Re-evaluate the (category, period) cells the added and removed expenses fall into
+
+        Spending already over a threshold before the change (e.g. from an
+        earlier run) doesn't alert again; only crossing it does.
+        """
+        granularity = self.service.budget.granularity
+        # Cell -> change in cents, to tell the spending before the change
+        cells: Dict[Tuple[ExpenseCategory, Optional[str]], int] = {}
+        for expenses, sign in ((added, 1), (removed, -1)):
+            for expense in expenses:
+                cell = (expense.category, self.service.period_of(expense.date) if granularity else None)
+                cells[cell] = cells.get(cell, 0) + sign * to_cents(expense.amount)
+        alerts = []
+        with self._lock:
+            for (category, period), delta in cells.items():
+                alert = self._evaluate(category, period, delta / 100)
+                if alert is not None:
+                    alerts.append(alert)
+        # Subscribers run outside the lock, so they may call back into the service
+        for alert in alerts:
+            for callback in list(self._subscribers):
+                callback(alert)
+
+    def _crossed(self, spent: float, limit: float) -> int:
+        """Index of the highest threshold spent is above, or -1"""
+        crossed = -1
+        for index, (fraction, _) in enumerate(self.thresholds):
+            if spent > fraction * limit:
+                crossed = index
+        return crossed
+
+    def _evaluate(self, category: ExpenseCategory, period: Optional[str],
+                  delta: float) -> Optional[BudgetAlert]:
+        limit = self.service.budget.get_limit(category)
+        if limit <= 0:
+            return None
+        spent = self.service.get_category_spending(category, period)
+        crossed = self._crossed(spent, limit)
+        key = (category, period)
+        fired = self._fired.get(key)
+        if fired is None:
+            fired = self._crossed(spent - delta, limit)
+        self._fired[key] = crossed
+        if crossed <= fired:
+            # Nothing new; if spending dropped, lower thresholds can fire again later
+            return None
+        fraction, level = self.thresholds[crossed]
+        return BudgetAlert(category, level, fraction, spent, limit, period)
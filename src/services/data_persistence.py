@@ -1,37 +1,525 @@
+import atexit
 import json
-from typing import List, Dict
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, TextIO
 import os
+import tempfile
+import threading
+
+from ..utils.instrumentation import instrumented, record_io
+
+
+def _atomic_write(path: str, write: Callable[[TextIO], None], binary: bool = False) -> int:
+    """Write through write(f) to a temp file in the same directory, rename it over path and return the bytes written"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+            written = f.tell()
+        os.replace(tmp_path, path)
+        return written
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _atomic_write_json(path: str, data, indent=4) -> int:
+    """Atomically write data as one JSON document"""
+    return _atomic_write(path, lambda f: json.dump(data, f, indent=indent))
+
+
+def _atomic_write_ndjson(path: str, records: List[Dict]) -> int:
+    """Atomically write records as one JSON object per line"""
+    def write(f):
+        for record in records:
+            f.write(json.dumps(record))
+            f.write('\n')
+    return _atomic_write(path, write)
+
+
+def _iter_json_array(f: TextIO, chunk_size: int = 1 << 20) -> Iterator:
+    """
+    Yield the items of a top-level JSON array one at a time
+    
+    The file is read in chunks and each item is decoded as soon as it is
+    complete, so the whole document is never held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size)
+    pos = 0
+    eof = not buffer
+    started = False
+    while True:
+        # Skip whitespace, the opening bracket and separators
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,[':
+            if buffer[pos] == '[':
+                started = True
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        if pos < len(buffer):
+            if not started:
+                raise ValueError('Expected a JSON array of expenses')
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Only accept an item if something follows it, otherwise it might be truncated
+                if end < len(buffer) or eof:
+                    yield item
+                    pos = end
+                    continue
+        if eof:
+            return
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def _iter_ndjson(path: str) -> Iterator[Dict]:
+    """Yield one record per line, stopping at a partial trailing line"""
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append can leave a partial last line
+                    break
+    except FileNotFoundError:
+        pass
+
+
+def _append_ndjson(path: str, records: List[Dict]) -> int:
+    """Append records as lines, syncing before returning the bytes written"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    payload = ''.join(json.dumps(record) + '\n' for record in records)
+    with open(path, 'a') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(payload)
+
+
+def _recover_ndjson(path: str) -> int:
+    """Drop a partial trailing line left by a crash and count the complete ones"""
+    try:
+        with open(path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end != len(data):
+                f.truncate(end)
+            return data.count(b'\n')
+    except FileNotFoundError:
+        return 0
+
 
 class JSONPersistence:
-    def __init__(self, expenses_file: str = 'data/expenses.json', 
+    # Whether append_expenses can write new rows without rewriting everything
+    supports_incremental_writes = False
+    # Whether totals can be computed by the backend without loading expenses
+    supports_aggregation = False
+    # Whether update_expense/delete_expense can change one expense without rewriting
+    # everything; both also get the previous version, for backends that locate rows by date
+    supports_incremental_updates = False
+
+    def __init__(self, expenses_file: str = 'data/expenses.json',
                  budget_file: str = 'data/budget_config.json'):
         self.expenses_file = expenses_file
         self.budget_file = budget_file
-    
+
+    @instrumented('persistence.save_expenses')
     def save_expenses(self, expenses: List[Dict]):
         """Save expenses to JSON file"""
-        os.makedirs(os.path.dirname(self.expenses_file), exist_ok=True)
-        with open(self.expenses_file, 'w') as f:
-            json.dump(expenses, f, indent=4)
-    
+        written = _atomic_write_json(self.expenses_file, expenses)
+        record_io('persistence.save_expenses', rows=len(expenses), bytes_written=written)
+
+    @instrumented('persistence.load_expenses', rows=len)
     def load_expenses(self) -> List[Dict]:
         """Load expenses from JSON file"""
+        return self._read_snapshot()
+
+    def _read_snapshot(self) -> List[Dict]:
         try:
             with open(self.expenses_file, 'r') as f:
                 return json.load(f)
         except FileNotFoundError:
             return []
-    
+
+    def _iter_snapshot(self) -> Iterator[Dict]:
+        try:
+            with open(self.expenses_file, 'r') as f:
+                yield from _iter_json_array(f)
+        except FileNotFoundError:
+            return
+
+    def iter_expenses(self) -> Iterator[Dict]:
+        """Stream stored expenses one at a time without loading the whole file"""
+        yield from self._iter_snapshot()
+
+    def clear_expenses(self):
+        """Remove all stored expenses"""
+        try:
+            os.remove(self.expenses_file)
+        except FileNotFoundError:
+            pass
+
+    @instrumented('persistence.save_budget')
     def save_budget(self, budget: Dict):
         """Save budget configuration to JSON file"""
-        os.makedirs(os.path.dirname(self.budget_file), exist_ok=True)
-        with open(self.budget_file, 'w') as f:
-            json.dump(budget, f, indent=4)
-    
+        written = _atomic_write_json(self.budget_file, budget)
+        record_io('persistence.save_budget', bytes_written=written)
+
+    @instrumented('persistence.load_budget')
     def load_budget(self) -> Dict:
         """Load budget configuration from JSON file"""
         try:
             with open(self.budget_file, 'r') as f:
                 return json.load(f)
         except FileNotFoundError:
-            return {}
\ No newline at end of file
+            return {}
+
+    def clear_budget(self):
+        """Remove the stored budget configuration"""
+        try:
+            os.remove(self.budget_file)
+        except FileNotFoundError:
+            pass
+
+
+class JournaledJSONPersistence(JSONPersistence):
+    """
+    JSON persistence with an append-only journal.
+
+    New expenses are appended as one JSON record per line to a journal file
+    next to the snapshot, as are updates and deletes (as records with an
+    'op' key). Loading replays the journal over the snapshot, and compaction
+    folds the journal back into the snapshot.
+    """
+    supports_incremental_writes = True
+    supports_incremental_updates = True
+
+    def __init__(self, expenses_file: str = 'data/expenses.json',
+                 budget_file: str = 'data/budget_config.json',
+                 journal_file: str = None,
+                 compact_every: int = 1000):
+        super().__init__(expenses_file, budget_file)
+        self.journal_file = journal_file or os.path.splitext(expenses_file)[0] + '.journal'
+        self.compact_every = compact_every
+        self._journal_records = _recover_ndjson(self.journal_file)
+
+    def _iter_journal(self) -> Iterator[Dict]:
+        return _iter_ndjson(self.journal_file)
+
+    def _replay(self, snapshot: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Yield snapshot expenses with journaled changes applied, then journaled additions
+        
+        A crash between writing a compacted snapshot and removing the journal
+        leaves additions that are already in the snapshot; those are skipped
+        by id, and updates and deletes are idempotent.
+        """
+        journal = list(self._iter_journal())
+        if not journal:
+            yield from snapshot
+            return
+        
+        # Fold the journal into the final state of every id it touches
+        changed: Dict[str, Optional[Dict]] = {}
+        added: List[Optional[Dict]] = []
+        added_rows: Dict[str, int] = {}
+        for record in journal:
+            op = record.get('op')
+            if op is None:
+                added_rows[record.get('id')] = len(added)
+                added.append(record)
+                continue
+            expense_id = record['id']
+            expense = record.get('expense') if op == 'update' else None
+            if expense_id in added_rows:
+                added[added_rows[expense_id]] = expense
+            # Also kept for the snapshot, in case the addition was already compacted into it
+            changed[expense_id] = expense
+        
+        snapshot_ids = set()
+        for expense in snapshot:
+            expense_id = expense.get('id')
+            snapshot_ids.add(expense_id)
+            if expense_id in changed:
+                expense = changed[expense_id]
+                if expense is None:
+                    continue
+            yield expense
+        for expense in added:
+            if expense is None:
+                continue
+            expense_id = expense.get('id')
+            if expense_id is None or expense_id not in snapshot_ids:
+                yield expense
+
+    @instrumented('persistence.load_expenses', rows=len)
+    def load_expenses(self) -> List[Dict]:
+        """Load the snapshot and replay the journal on top of it"""
+        return list(self._replay(self._read_snapshot()))
+
+    def iter_expenses(self) -> Iterator[Dict]:
+        """Yield snapshot expenses with the journal replayed on top"""
+        yield from self._replay(self._iter_snapshot())
+
+    def save_expenses(self, expenses: List[Dict]):
+        """Write a new snapshot and discard the journal it supersedes"""
+        super().save_expenses(expenses)
+        self._truncate_journal()
+
+    @instrumented('persistence.append_expenses')
+    def append_expenses(self, expenses: List[Dict]):
+        """Append expenses to the journal without touching the snapshot"""
+        if not expenses:
+            return
+        written = _append_ndjson(self.journal_file, expenses)
+        record_io('persistence.append_expenses', rows=len(expenses), bytes_written=written)
+        self._journal_records += len(expenses)
+        if self.compact_every and self._journal_records >= self.compact_every:
+            self.compact()
+
+    def _journal_op(self, name: str, record: Dict):
+        written = _append_ndjson(self.journal_file, [record])
+        record_io(name, rows=1, bytes_written=written)
+        self._journal_records += 1
+        if self.compact_every and self._journal_records >= self.compact_every:
+            self.compact()
+
+    @instrumented('persistence.update_expense')
+    def update_expense(self, expense: Dict, previous: Optional[Dict] = None):
+        """Journal a new version of the expense with the same id"""
+        self._journal_op(
+            'persistence.update_expense', {'op': 'update', 'id': expense['id'], 'expense': expense}
+        )
+
+    @instrumented('persistence.delete_expense')
+    def delete_expense(self, expense_id: str, previous: Optional[Dict] = None):
+        """Journal the removal of an expense"""
+        self._journal_op('persistence.delete_expense', {'op': 'delete', 'id': expense_id})
+
+    def compact(self):
+        """Fold the journal into the snapshot"""
+        if self._journal_records == 0:
+            return
+        self.save_expenses(self.load_expenses())
+
+    def _truncate_journal(self):
+        try:
+            os.remove(self.journal_file)
+        except FileNotFoundError:
+            pass
+        self._journal_records = 0
+
+    def clear_expenses(self):
+        """Remove the snapshot and the journal"""
+        super().clear_expenses()
+        self._truncate_journal()
+
+
+class NDJSONPersistence(JSONPersistence):
+    """
+    JSON persistence storing one expense object per line (NDJSON).
+
+    Lines can be parsed one at a time, so loading streams in constant memory,
+    and new expenses are appended without rewriting the file.
+    """
+    supports_incremental_writes = True
+
+    def __init__(self, expenses_file: str = 'data/expenses.ndjson',
+                 budget_file: str = 'data/budget_config.json'):
+        super().__init__(expenses_file, budget_file)
+        _recover_ndjson(self.expenses_file)
+
+    @instrumented('persistence.save_expenses')
+    def save_expenses(self, expenses: List[Dict]):
+        """Save expenses as one JSON object per line"""
+        written = _atomic_write_ndjson(self.expenses_file, expenses)
+        record_io('persistence.save_expenses', rows=len(expenses), bytes_written=written)
+
+    def _read_snapshot(self) -> List[Dict]:
+        return list(_iter_ndjson(self.expenses_file))
+
+    def _iter_snapshot(self) -> Iterator[Dict]:
+        return _iter_ndjson(self.expenses_file)
+
+    @instrumented('persistence.append_expenses')
+    def append_expenses(self, expenses: List[Dict]):
+        """Append expenses as new lines"""
+        if not expenses:
+            return
+        written = _append_ndjson(self.expenses_file, expenses)
+        record_io('persistence.append_expenses', rows=len(expenses), bytes_written=written)
+
+
+class WriteBehindPersistence:
+    """
+    Write-behind wrapper around another persistence backend.
+
+    Saves only mark state dirty: the latest full expense list, any appended
+    expenses and the latest budget are coalesced in memory and written to the
+    wrapped backend once per flush. Flushes happen flush_interval seconds
+    after the first unsaved change, on commit(), before any load and on
+    close() (also registered to run at interpreter exit). The wrapped
+    backend's own writes are atomic, so a flush never leaves a half-written
+    file behind; if one fails, the changes it didn't write go back into the
+    buffer to be retried and the error is raised to the caller.
+    """
+    supports_incremental_writes = True
+
+    def __init__(self, persistence, flush_interval: float = 2.0):
+        self.persistence = persistence
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._pending_expenses: Optional[List[Dict]] = None
+        self._pending_appends: List[Dict] = []
+        self._pending_budget: Optional[Dict] = None
+        atexit.register(self.close)
+
+    @property
+    def supports_aggregation(self):
+        return self.persistence.supports_aggregation
+
+    @property
+    def supports_incremental_updates(self):
+        # update_expense/delete_expense go through __getattr__, flushing first
+        return self.persistence.supports_incremental_updates
+
+    def __getattr__(self, name):
+        # Everything else (loads, aggregation queries, file paths, ...) comes from
+        # the wrapped backend; methods flush first so they never see stale data
+        attr = getattr(self.persistence, name)
+        if not callable(attr):
+            return attr
+        
+        def flushed(*args, **kwargs):
+            self.flush()
+            return attr(*args, **kwargs)
+        return flushed
+
+    @property
+    def dirty(self) -> bool:
+        """Whether there are changes not yet written to the wrapped backend"""
+        return (
+            self._pending_expenses is not None
+            or bool(self._pending_appends)
+            or self._pending_budget is not None
+        )
+
+    def _schedule(self):
+        # Called with self._lock held
+        if self.flush_interval is None or self._timer is not None:
+            return
+        self._timer = threading.Timer(self.flush_interval, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def save_expenses(self, expenses: List[Dict]):
+        """Replace all expenses at the next flush"""
+        with self._lock:
+            self._pending_expenses = list(expenses)
+            self._pending_appends = []
+            self._schedule()
+
+    def append_expenses(self, expenses: List[Dict]):
+        """Append expenses at the next flush"""
+        with self._lock:
+            if self._pending_expenses is not None:
+                self._pending_expenses.extend(expenses)
+            else:
+                self._pending_appends.extend(expenses)
+            self._schedule()
+
+    def save_budget(self, budget: Dict):
+        """Save the budget at the next flush"""
+        with self._lock:
+            self._pending_budget = budget
+            self._schedule()
+
+    @instrumented('persistence.write_behind_flush')
+    def flush(self):
+        """Write all coalesced changes to the wrapped backend; raises if a write fails"""
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        # Called with self._flush_lock held
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            expenses, self._pending_expenses = self._pending_expenses, None
+            appends, self._pending_appends = self._pending_appends, []
+            budget, self._pending_budget = self._pending_budget, None
+
+        try:
+            if expenses is not None:
+                self.persistence.save_expenses(expenses)
+            elif appends:
+                if self.persistence.supports_incremental_writes:
+                    self.persistence.append_expenses(appends)
+                else:
+                    self.persistence.save_expenses(self.persistence.load_expenses() + appends)
+            expenses, appends = None, []
+            if budget is not None:
+                self.persistence.save_budget(budget)
+        except BaseException:
+            self._restore(expenses, appends, budget)
+            raise
+
+    def _restore(self, expenses: Optional[List[Dict]], appends: List[Dict], budget: Optional[Dict]):
+        """Put back changes a failed flush didn't write, behind any newer ones, and retry later"""
+        with self._lock:
+            if self._pending_expenses is None:
+                if expenses is not None:
+                    # Appends made since belong after the full list
+                    self._pending_expenses = expenses + self._pending_appends
+                    self._pending_appends = []
+                else:
+                    self._pending_appends = appends + self._pending_appends
+            if self._pending_budget is None:
+                self._pending_budget = budget
+            if self.dirty:
+                self._schedule()
+
+    def commit(self):
+        """Flush now; an explicit commit point for callers"""
+        self.flush()
+
+    def close(self):
+        """Flush outstanding changes and stop the timer"""
+        self.flush()
+        atexit.unregister(self.close)
+
+    def clear_expenses(self):
+        # Holding the flush lock keeps a failed background flush from restoring cleared expenses
+        with self._flush_lock:
+            with self._lock:
+                self._pending_expenses = None
+                self._pending_appends = []
+            self._flush()
+            self.persistence.clear_expenses()
+
+    def clear_budget(self):
+        with self._flush_lock:
+            with self._lock:
+                self._pending_budget = None
+            self._flush()
+            self.persistence.clear_budget()
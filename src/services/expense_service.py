@@ -1,84 +1,727 @@
+import copy
+import math
 import os
-from typing import List, Dict
+import zlib
+from datetime import date
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from ..models.expense import Expense, ExpenseCategory
-from ..models.budget import Budget
+from ..models.budget import Budget, BUDGET_PERIODS
+from ..models.recurring_expense import RecurringExpense
+from ..models.expense_store import ExpenseStore, CATEGORIES, CATEGORY_CODES, to_cents
 from .data_persistence import JSONPersistence
+from ..utils.instrumentation import instrumented, record_io
+from .aggregate_cube import AggregateCube, PERIOD_LABELS, period_bounds, previous_periods
+from .search_index import SearchIndex
+from .budget_alerts import BudgetAlertEngine
+from .sort_index import SortIndex
 
 class ExpenseService:
-    def __init__(self, persistence: JSONPersistence = None):
+    def __init__(self, persistence: JSONPersistence = None, search_index_file: str = None):
         self.persistence = persistence or JSONPersistence()
-        self.expenses: List[Expense] = self._load_expenses()
+        # Backends that aggregate on their side don't need every row up front
+        self._expenses: Optional[ExpenseStore] = (
+            None if self.persistence.supports_aggregation else self._load_expenses()
+        )
         self.budget = self._load_budget()
+        # Running totals in cents, kept up to date on add and reset
+        self._category_cents: Dict[ExpenseCategory, int] = self._compute_category_cents()
+        self._total_cents = sum(self._category_cents.values())
+        # (period, category) aggregate cubes, built on first use per granularity
+        self._cubes: Dict[str, AggregateCube] = {}
+        # Description search index, built (or loaded from search_index_file) on first search
+        self.search_index_file = search_index_file
+        self._search_index: Optional[SearchIndex] = None
+        # Whether search_index_file may still match the expenses; cleared (and the file removed) on change
+        self._search_index_saved = bool(search_index_file)
+        # NumPy snapshot of the expense columns, dropped whenever expenses change
+        self._analytics = None
+        # Fires budget alerts for the categories each insert touches
+        self.alerts = BudgetAlertEngine(self)
+        # Row orders by column for paging through sorted expenses, built on first use
+        self._sort_indexes: Dict[str, SortIndex] = {}
+        # ((store generation, query), matching rows) of the last page query
+        self._page_query: Optional[Tuple[tuple, Sequence[int]]] = None
+        # Set on snapshots, which read from persistence but never write to it
+        self._is_snapshot = False
     
-    def _load_expenses(self) -> List[Expense]:
-        """Load expenses from persistence"""
-        expense_dicts = self.persistence.load_expenses()
-        return [Expense.from_dict(exp_dict) for exp_dict in expense_dicts]
+    def snapshot(self) -> 'ExpenseService':
+        """
+        Return a read-only copy of the service for background readers
+        
+        The copy has its own columns, running totals and budget, so a report
+        or chart built from it on a worker thread sees one consistent state
+        while this service keeps changing. Rows that aren't loaded yet (for
+        backends that aggregate on their side) aren't loaded here either: the
+        copy reads them from the backend when it is first used, on the
+        worker, and so sees the rows stored at that time. Don't modify the copy.
+        """
+        snapshot = copy.copy(self)
+        snapshot._is_snapshot = True
+        snapshot._expenses = None if self._expenses is None else self._expenses.copy()
+        snapshot.budget = copy.deepcopy(self.budget)
+        snapshot._category_cents = dict(self._category_cents)
+        snapshot._cubes = {}
+        snapshot.search_index_file = None
+        snapshot._search_index = None
+        snapshot._search_index_saved = False
+        snapshot._sort_indexes = {}
+        snapshot._page_query = None
+        snapshot.alerts = BudgetAlertEngine(snapshot)
+        return snapshot
+    
+    @property
+    def expenses(self) -> ExpenseStore:
+        """All expenses, loaded from persistence on first access"""
+        if self._expenses is None:
+            self._expenses = self._load_expenses()
+        return self._expenses
+    
+    @instrumented('service.load_expenses', rows=len)
+    def _load_expenses(self) -> ExpenseStore:
+        """Stream expenses from persistence into a columnar store"""
+        store = ExpenseStore.from_records(self.persistence.iter_expenses())
+        # Older files reused one id per day; give duplicates fresh ids and save them once
+        if store.ensure_unique_ids() and not self._is_snapshot:
+            self.persistence.save_expenses(list(store.to_dicts()))
+        return store
+    
+    def _compute_category_cents(self) -> Dict[ExpenseCategory, int]:
+        """Compute per-category totals with a single pass (or in the backend)"""
+        if self.persistence.supports_aggregation:
+            stored_totals = self.persistence.get_expenses_by_category()
+            return {
+                category: to_cents(stored_totals.get(category.value, 0.0))
+                for category in ExpenseCategory
+            }
+        return dict(zip(CATEGORIES, self.expenses.category_cents()))
     
     def _load_budget(self) -> Budget:
         """Load budget from persistence"""
         budget_dict = self.persistence.load_budget()
         return Budget.from_dict(budget_dict) if budget_dict else Budget()
     
+    def _get_cube(self, granularity: str) -> AggregateCube:
+        """Return the aggregate cube for a granularity, building it with one pass if needed"""
+        cube = self._cubes.get(granularity)
+        if cube is None:
+            cube = AggregateCube(granularity)
+            if self._expenses is None:
+                for exp_dict in self.persistence.iter_expenses():
+                    cube.add(
+                        date.fromisoformat(exp_dict['date']),
+                        ExpenseCategory(exp_dict['category']),
+                        to_cents(exp_dict['amount'])
+                    )
+            else:
+                cube.extend(self._live_cells(self._expenses))
+            self._cubes[granularity] = cube
+        return cube
+    
+    def _get_search_index(self) -> SearchIndex:
+        """Return the search index, loading it from disk if it is current, else building it"""
+        if self._search_index is None:
+            store = self.expenses
+            store.compact()
+            index = None
+            if self.search_index_file:
+                index = SearchIndex.load(self.search_index_file, self._index_fingerprint())
+            # A loaded index matches its file until the first change
+            self._search_index_saved = index is not None
+            if index is None:
+                index = SearchIndex()
+                index.extend(zip(store.ids, store.descriptions))
+            self._search_index = index
+        return self._search_index
+    
+    def _index_fingerprint(self) -> List[int]:
+        """Identify the indexed data, including description-only edits made outside this service"""
+        store = self.expenses
+        checksum = zlib.crc32('\x1f'.join(
+            f'{expense_id}\x1e{description}'
+            for expense_id, description in zip(store.ids, store.descriptions)
+        ).encode('utf-8'))
+        return [len(store), self._total_cents, checksum]
+    
+    def _index_changed(self):
+        """Drop the saved index file once the expenses diverge from it, whether or not the index is loaded"""
+        if self._search_index_saved:
+            self._search_index_saved = False
+            try:
+                os.remove(self.search_index_file)
+            except FileNotFoundError:
+                pass
+    
+    def save_search_index(self):
+        """Save the search index next to the data, if one is configured and it has changed"""
+        if self._search_index is None or not self.search_index_file or self._search_index_saved:
+            return
+        self._search_index.save(self.search_index_file, self._index_fingerprint())
+        self._search_index_saved = True
+    
+    def _index(self, added: Optional[Expense] = None, removed: Optional[Expense] = None):
+        """Keep the search index, if built, in step with an added and/or removed expense"""
+        if self._search_index is not None:
+            if removed is not None:
+                self._search_index.remove(removed.id, removed.description)
+            if added is not None:
+                self._search_index.add(added.id, added.description)
+        self._index_changed()
+    
+    def _track(self, expense: Expense, sign: int = 1):
+        """Fold a new expense into the running totals and cubes (or take it out with sign=-1)"""
+        cents = sign * to_cents(expense.amount)
+        self._analytics = None
+        self._page_query = None
+        self._category_cents[expense.category] += cents
+        self._total_cents += cents
+        for cube in self._cubes.values():
+            cube.add(expense.date, expense.category, cents, sign)
+    
+    @staticmethod
+    def _live_cells(store: ExpenseStore) -> Iterable[Tuple[int, int, int]]:
+        """(date ordinal, category code, cents) of every row that isn't deleted"""
+        if not store._deleted:
+            return zip(store.date_ordinals, store.category_codes, store.amount_cents)
+        return (
+            (store.date_ordinals[row], store.category_codes[row], store.amount_cents[row])
+            for row in store.live_rows()
+        )
+    
+    def _sort_insert(self, rows: Sequence[int]):
+        """Add new or changed rows to the sort indexes built so far"""
+        for index in self._sort_indexes.values():
+            index.insert(rows)
+    
+    def _sort_remove(self, row: int):
+        """Take a row out of the sort indexes before it changes or is deleted"""
+        for index in self._sort_indexes.values():
+            index.remove(row)
+    
+    def _writable_store(self) -> Optional[ExpenseStore]:
+        """Return the store new expenses go into, or None while rows can stay unloaded"""
+        if self.persistence.supports_incremental_writes:
+            return self._expenses
+        # Every save rewrites all expenses, so they have to be in memory
+        return self.expenses
+    
+    @instrumented('service.add_expense')
     def add_expense(self, expense: Expense):
         """Add a new expense"""
-        self.expenses.append(expense)
-        self._save_expenses()
+        store = self._writable_store()
+        if store is not None:
+            store.append(expense)
+            self._sort_insert([len(store.amount_cents) - 1])
+        self._track(expense)
+        self._index(added=expense)
+        if self.persistence.supports_incremental_writes:
+            self.persistence.append_expenses([expense.to_dict()])
+        else:
+            self._save_expenses()
+        self.alerts.expenses_changed([expense])
+    
+    @instrumented('service.add_expenses')
+    def add_expenses(self, expenses: List[Expense]):
+        """Add a batch of expenses with a single persistence write"""
+        if not expenses:
+            return
+        # Reject the whole batch before anything changes if an amount can't be stored
+        for expense in expenses:
+            to_cents(expense.amount)
+        store = self._writable_store()
+        if store is not None:
+            store.extend(expenses)
+            end = len(store.amount_cents)
+            self._sort_insert(range(end - len(expenses), end))
+        for expense in expenses:
+            self._track(expense)
+            self._index(added=expense)
+        record_io('service.add_expenses', rows=len(expenses))
+        if self.persistence.supports_incremental_writes:
+            self.persistence.append_expenses([expense.to_dict() for expense in expenses])
+        else:
+            self._save_expenses()
+        self.alerts.expenses_changed(expenses)
+    
+    @instrumented('service.get_expense')
+    def get_expense(self, expense_id: str) -> Optional[Expense]:
+        """Return the expense with an id, or None"""
+        return self.expenses.get(expense_id)
+    
+    @instrumented('service.update_expense')
+    def update_expense(self, expense: Expense) -> Expense:
+        """
+        Replace the stored expense that has expense.id and return the previous version
+        
+        Raises ValueError if no expense has that id.
+        """
+        store = self.expenses
+        row = store.row_of(expense.id)
+        if row is None:
+            raise ValueError(f"No expense with id '{expense.id}'")
+        to_cents(expense.amount)
+        self._sort_remove(row)
+        previous = store.replace(row, expense)
+        self._sort_insert([row])
+        self._track(previous, sign=-1)
+        self._track(expense)
+        self._index(added=expense, removed=previous)
+        if self.persistence.supports_incremental_updates:
+            self.persistence.update_expense(expense.to_dict(), previous.to_dict())
+        else:
+            self._save_expenses()
+        self.alerts.expenses_changed([expense], [previous])
+        return previous
+    
+    @instrumented('service.delete_expense')
+    def delete_expense(self, expense_id: str) -> Expense:
+        """
+        Delete the expense with an id and return it
+        
+        Raises ValueError if no expense has that id.
+        """
+        store = self.expenses
+        row = store.row_of(expense_id)
+        if row is None:
+            raise ValueError(f"No expense with id '{expense_id}'")
+        self._sort_remove(row)
+        previous = store.delete(row)
+        self._track(previous, sign=-1)
+        self._index(removed=previous)
+        if self.persistence.supports_incremental_updates:
+            self.persistence.delete_expense(expense_id, previous.to_dict())
+        else:
+            self._save_expenses()
+        self.alerts.expenses_changed([], [previous])
+        return previous
     
     def _save_expenses(self):
         """Save expenses to persistence"""
-        expense_dicts = [exp.to_dict() for exp in self.expenses]
-        self.persistence.save_expenses(expense_dicts)
+        self.persistence.save_expenses(list(self.expenses.to_dicts()))
     
+    @instrumented('service.reset_expenses')
     def reset_expenses(self):
         """Reset all expenses"""
-        self.expenses.clear()
-        # Remove the expenses file
-        try:
-            os.remove(self.persistence.expenses_file)
-        except FileNotFoundError:
-            pass
+        if self._expenses is not None:
+            self._expenses.clear()
+        self._category_cents = {category: 0 for category in ExpenseCategory}
+        self._total_cents = 0
+        self._analytics = None
+        self._page_query = None
+        self.alerts.reset()
+        for cube in self._cubes.values():
+            cube.clear()
+        if self._search_index is not None:
+            self._search_index.clear()
+        self._index_changed()
+        # Remove the stored expenses
+        self.persistence.clear_expenses()
     
     def reset_budget_limits(self):
         """Reset all budget limits to zero"""
-        # Create a new empty budget
-        self.budget = Budget()
+        # Create a new empty budget, keeping the recurring expenses
+        self.budget = Budget(recurring=self.budget.recurring)
+        self.alerts.reset()
+        
+        if self.budget.recurring:
+            self.persistence.save_budget(self.budget.to_dict())
+        else:
+            # Remove the stored budget configuration
+            self.persistence.clear_budget()
+    
+    @property
+    def recurring_expenses(self) -> List[RecurringExpense]:
+        """The recurring expense rules, in the order they were added"""
+        return self.budget.recurring
+    
+    def add_recurring_expense(self, rule: RecurringExpense):
+        """Add a recurring expense rule, saved with the budget"""
+        self.budget.recurring.append(rule)
+        self.alerts.reset()
+        self.persistence.save_budget(self.budget.to_dict())
+    
+    def remove_recurring_expense(self, rule_id: str) -> RecurringExpense:
+        """Remove a recurring expense rule by id; raises ValueError if there is none"""
+        for index, rule in enumerate(self.budget.recurring):
+            if rule.id == rule_id:
+                del self.budget.recurring[index]
+                self.alerts.reset()
+                self.persistence.save_budget(self.budget.to_dict())
+                return rule
+        raise ValueError(f"No recurring expense with id '{rule_id}'")
+    
+    def recurring_occurrences(self, start: Optional[date] = None,
+                              end: Optional[date] = None) -> Iterator[Expense]:
+        """
+        Yield the occurrences of the recurring expenses within [start, end]
         
-        # Remove the budget configuration file
-        try:
-            os.remove(self.persistence.budget_file)
-        except FileNotFoundError:
-            pass
+        Occurrences are generated on demand rather than stored, and only
+        count once their date has come, so the window ends today at the latest.
+        """
+        end = min(end, date.today()) if end else date.today()
+        for rule in self.budget.recurring:
+            yield from rule.occurrences(start, end)
     
+    def _recurring_cents(self, start: Optional[date] = None, end: Optional[date] = None) -> List[int]:
+        """
+        Sum the recurring occurrences within [start, end] in cents per category code
+        
+        Each rule's occurrences are counted in closed form, so this is
+        O(rules) however long the window is.
+        """
+        sums = [0] * len(CATEGORIES)
+        end = min(end, date.today()) if end else date.today()
+        for rule in self.budget.recurring:
+            count = rule.count_between(start, end)
+            sums[CATEGORY_CODES[rule.category]] += count * to_cents(rule.amount)
+        return sums
+    
+    @instrumented('service.get_total_expenses')
     def get_total_expenses(self) -> float:
-        """Calculate total expenses"""
-        return sum(expense.amount for expense in self.expenses)
+        """Return total expenses, including recurring expenses to date"""
+        return (self._total_cents + sum(self._recurring_cents())) / 100
     
+    @instrumented('service.get_expenses_by_category')
     def get_expenses_by_category(self) -> Dict[ExpenseCategory, float]:
-        """Calculate expenses by category"""
-        category_totals = {}
-        for category in ExpenseCategory:
-            total = sum(
-                expense.amount 
-                for expense in self.expenses 
-                if expense.category == category
+        """Return expenses by category, including recurring expenses to date"""
+        recurring = self._recurring_cents()
+        return {
+            category: (cents + recurring[CATEGORY_CODES[category]]) / 100
+            for category, cents in self._category_cents.items()
+        }
+    
+    def export_source(self, start: Optional[date] = None, end: Optional[date] = None) -> Iterable:
+        """
+        Return the expenses within [start, end] for a streaming export
+        
+        That is the columnar store itself for all-time exports, or the
+        backend's row stream while rows aren't loaded, so nothing is copied.
+        Occurrences of recurring expenses are generated after the stored rows.
+        """
+        if self._expenses is None:
+            source = self.persistence.iter_expenses(start, end)
+        elif start or end:
+            source = self.expenses.between(start, end)
+        else:
+            source = self._expenses
+        if self.budget.recurring:
+            return chain(source, self.recurring_occurrences(start, end))
+        return source
+    
+    @instrumented('service.get_expenses_between', rows=len)
+    def get_expenses_between(self, start: Optional[date] = None,
+                             end: Optional[date] = None) -> List[Expense]:
+        """Return expenses dated within [start, end] using the date index, then recurring occurrences"""
+        if self._expenses is None:
+            # Let the backend filter on its date index instead of loading every row
+            expenses = [
+                Expense.from_dict(exp_dict)
+                for exp_dict in self.persistence.iter_expenses(start, end)
+            ]
+        else:
+            expenses = self.expenses.between(start, end)
+        expenses.extend(self.recurring_occurrences(start, end))
+        return expenses
+    
+    @instrumented('service.get_expenses_by_category_between')
+    def get_expenses_by_category_between(self, start: Optional[date] = None,
+                                         end: Optional[date] = None) -> Dict[ExpenseCategory, float]:
+        """Return expenses by category for the window [start, end]"""
+        if start is None and end is None:
+            return self.get_expenses_by_category()
+        recurring = self._recurring_cents(start, end)
+        if self._expenses is None:
+            stored_totals = self.persistence.get_expenses_by_category(start, end)
+            return {
+                category: round(stored_totals.get(category.value, 0.0)
+                                + recurring[CATEGORY_CODES[category]] / 100, 2)
+                for category in ExpenseCategory
+            }
+        sums = self.expenses.category_cents(self.expenses.rows_between(start, end))
+        return {
+            category: (cents + extra) / 100
+            for category, cents, extra in zip(CATEGORIES, sums, recurring)
+        }
+    
+    @instrumented('service.search', rows=len)
+    def search(self, query: str, category: Optional[ExpenseCategory] = None,
+               start: Optional[date] = None, end: Optional[date] = None,
+               limit: Optional[int] = None) -> List[Expense]:
+        """
+        Find expenses whose description contains every word of query as a word prefix
+        
+        "ub ride" matches "Uber ride". Results can be narrowed to a category and
+        a date window [start, end] and are returned in insertion order. An
+        empty query matches every expense, so only the filters apply.
+        """
+        index = self._get_search_index()
+        store = self.expenses
+        ids = index.match(query)
+        if ids is None:
+            rows = store.rows_between(start, end)
+        else:
+            rows = store.rows_of(ids)
+            if start or end:
+                first = start.toordinal() if start else None
+                last = end.toordinal() if end else None
+                ordinals = store.date_ordinals
+                rows = [
+                    row for row in rows
+                    if (first is None or ordinals[row] >= first)
+                    and (last is None or ordinals[row] <= last)
+                ]
+        if category is not None:
+            code = CATEGORY_CODES[category]
+            codes = store.category_codes
+            rows = [row for row in rows if codes[row] == code]
+        return store.at(rows[:limit] if limit is not None else rows)
+    
+    def _sorted_rows(self, sort: str, descending: bool, category: Optional[ExpenseCategory],
+                     start: Optional[date], end: Optional[date],
+                     min_amount: Optional[float], max_amount: Optional[float]) -> Sequence[int]:
+        """Return the rows matching the filters in sort order, reusing the last query's rows"""
+        store = self.expenses
+        query = (store.generation, sort, descending, category, start, end, min_amount, max_amount)
+        if self._page_query is not None and self._page_query[0] == query:
+            return self._page_query[1]
+        index = self._sort_indexes.get(sort)
+        if index is None:
+            index = self._sort_indexes[sort] = SortIndex(store, sort)
+        first = start.toordinal() if start else None
+        last = end.toordinal() if end else None
+        low_cents = to_cents(min_amount) if min_amount is not None else None
+        high_cents = to_cents(max_amount) if max_amount is not None else None
+        code = CATEGORY_CODES[category] if category is not None else None
+        
+        # Narrow to the key range of the sort index, then filter what that range doesn't cover
+        low, high = (), ()
+        if sort == 'date':
+            low = (first,) if first is not None else ()
+            high = (last,) if last is not None else ()
+            first = last = None
+        elif sort == 'amount':
+            low = (low_cents,) if low_cents is not None else ()
+            high = (high_cents,) if high_cents is not None else ()
+            low_cents = high_cents = None
+        elif code is not None:
+            low = (code,) if first is None else (code, first)
+            high = (code,) if last is None else (code, last)
+            code = first = last = None
+        begin, stop = index.span(low, high)
+        rows: Sequence[int] = index.order[begin:stop]
+        
+        if code is not None:
+            codes = store.category_codes
+            rows = [row for row in rows if codes[row] == code]
+        if first is not None or last is not None:
+            ordinals = store.date_ordinals
+            rows = [
+                row for row in rows
+                if (first is None or ordinals[row] >= first) and (last is None or ordinals[row] <= last)
+            ]
+        if low_cents is not None or high_cents is not None:
+            amounts = store.amount_cents
+            rows = [
+                row for row in rows
+                if (low_cents is None or amounts[row] >= low_cents)
+                and (high_cents is None or amounts[row] <= high_cents)
+            ]
+        if descending:
+            rows = rows[::-1]
+        self._page_query = (query, rows)
+        return rows
+    
+    @instrumented('service.page_expenses')
+    def page_expenses(self, offset: int = 0, limit: int = 50, sort: str = 'date',
+                      descending: bool = False, category: Optional[ExpenseCategory] = None,
+                      start: Optional[date] = None, end: Optional[date] = None,
+                      min_amount: Optional[float] = None,
+                      max_amount: Optional[float] = None) -> Tuple[int, List[Expense]]:
+        """
+        Return one page of expenses sorted by 'date', 'category' or 'amount', and the number of matches
+        
+        Rows come from a sort index kept up to date as expenses change, and
+        filters on the sort column (a date window, one category, an amount
+        range) are binary searches in it. The matching rows of the last query
+        are kept, so paging through them only builds the requested page.
+        """
+        rows = self._sorted_rows(sort, descending, category, start, end, min_amount, max_amount)
+        return len(rows), self.expenses.at(rows[offset:offset + limit])
+    
+    def get_analytics(self, start: Optional[date] = None, end: Optional[date] = None):
+        """
+        Return a vectorized AnalyticsEngine over the expenses, optionally within [start, end]
+        
+        The all-time engine is cached until expenses change, so repeated
+        analyses only pay for copying the columns into NumPy once.
+        """
+        # Imported here so NumPy is only loaded when analytics are used
+        from ..utils.analytics import AnalyticsEngine
+        
+        if start or end:
+            return AnalyticsEngine(self.expenses, start, end)
+        if self._analytics is None:
+            self._analytics = AnalyticsEngine(self.expenses)
+        return self._analytics
+    
+    @instrumented('service.get_totals_by_period')
+    def get_totals_by_period(self, granularity: str = 'month', start: Optional[date] = None,
+                             end: Optional[date] = None) -> Dict[str, float]:
+        """
+        Return total expenses per period within [start, end]
+        
+        granularity is one of 'day', 'week', 'month' or 'year'. Periods are
+        labelled '2025-05-12', '2025-W20', '2025-05' and '2025' respectively.
+        Recurring occurrences are added one by one, as each may fall into a
+        different period.
+        """
+        label = PERIOD_LABELS.get(granularity)
+        if label is None:
+            raise ValueError(f"Unknown period granularity '{granularity}'")
+        period_cents: Dict[str, int] = {}
+        if start is None and end is None:
+            cube = self._get_cube(granularity)
+            if not self.budget.recurring:
+                return cube.totals_by_period()
+            period_cents = {period: sum(cube.period_cents(period)) for period in cube.periods()}
+            dated_cents = ()
+        elif self._expenses is None:
+            dated_cents = (
+                (date.fromisoformat(exp_dict['date']).toordinal(), to_cents(exp_dict['amount']))
+                for exp_dict in self.persistence.iter_expenses(start, end)
+            )
+        else:
+            store = self.expenses
+            dated_cents = (
+                (store.date_ordinals[row], store.amount_cents[row])
+                for row in store.rows_between(start, end)
             )
-            category_totals[category] = total
-        return category_totals
+        
+        recurring_cents = (
+            (expense.date.toordinal(), to_cents(expense.amount))
+            for expense in self.recurring_occurrences(start, end)
+        )
+        
+        labels: Dict[int, str] = {}
+        for ordinal, cents in chain(dated_cents, recurring_cents):
+            period = labels.get(ordinal)
+            if period is None:
+                period = labels[ordinal] = label(date.fromordinal(ordinal))
+            period_cents[period] = period_cents.get(period, 0) + cents
+        return {period: period_cents[period] / 100 for period in sorted(period_cents)}
     
+    def verify_totals(self) -> bool:
+        """Check the running totals and built cubes against a full recompute"""
+        store = self.expenses
+        category_cents = dict(zip(CATEGORIES, store.category_cents()))
+        if category_cents != self._category_cents or sum(category_cents.values()) != self._total_cents:
+            return False
+        for granularity, cube in self._cubes.items():
+            fresh = AggregateCube(granularity)
+            fresh.extend(self._live_cells(store))
+            if fresh.cells != cube.cells or fresh.counts != cube.counts:
+                return False
+        return True
+    
+    @instrumented('service.set_budget_limit')
     def set_budget_limit(self, category: ExpenseCategory, limit: float):
-        """Set budget limit for a category"""
+        """Set budget limit for a category; raises ValueError for a negative or non-finite limit"""
+        if not (limit >= 0 and math.isfinite(limit)):
+            raise ValueError(f"Invalid limit for {category.value}")
         self.budget.set_limit(category, limit)
+        self.alerts.reset()
         self.persistence.save_budget(self.budget.to_dict())
     
-    def check_budget_limits(self) -> Dict[ExpenseCategory, bool]:
-        """Check if expenses exceed budget limits"""
-        category_totals = self.get_expenses_by_category()
+    @instrumented('service.set_budget_limits')
+    def set_budget_limits(self, limits: Dict[ExpenseCategory, float], period: str = None):
+        """
+        Set several budget limits (and optionally the budget period) at once
+        
+        All values are validated before anything changes, and the budget is
+        saved once. Raises ValueError without modifying the budget if any
+        limit is negative or not finite (nan, inf) or the period is unknown.
+        """
+        if period is not None and period not in BUDGET_PERIODS:
+            raise ValueError(f"Unknown budget period '{period}'")
+        for category, limit in limits.items():
+            if not (limit >= 0 and math.isfinite(limit)):
+                raise ValueError(f"Invalid limit for {category.value}")
+        
+        for category, limit in limits.items():
+            self.budget.set_limit(category, float(limit))
+        if period is not None:
+            self.budget.period = period
+        self.alerts.reset()
+        self.persistence.save_budget(self.budget.to_dict())
+    
+    def set_budget_period(self, period: str):
+        """Set whether limits apply to all time ('all') or to each 'monthly' or 'weekly' period"""
+        if period not in BUDGET_PERIODS:
+            raise ValueError(f"Unknown budget period '{period}'")
+        self.budget.period = period
+        self.alerts.reset()
+        self.persistence.save_budget(self.budget.to_dict())
+    
+    def _exceeded(self, category_totals: Dict[ExpenseCategory, float]) -> Dict[ExpenseCategory, bool]:
+        """Compare totals against the budget limits; categories without a limit never exceed"""
+        status = {}
+        for category in ExpenseCategory:
+            limit = self.budget.get_limit(category)
+            status[category] = limit > 0 and category_totals.get(category, 0) > limit
+        return status
+    
+    def get_period_totals(self, period: str, granularity: str = None) -> Dict[ExpenseCategory, float]:
+        """Return expenses by category for one period label, read from the aggregate cube"""
+        granularity = granularity or self.budget.granularity or 'month'
+        cube = self._get_cube(granularity)
+        if not self.budget.recurring:
+            return cube.period_totals(period)
+        recurring = self._recurring_cents(*period_bounds(granularity, period))
         return {
-            category: (
-                category_totals.get(category, 0) > self.budget.get_limit(category)
-                if self.budget.get_limit(category) > 0 
-                else False
-            )
-            for category in ExpenseCategory
-        }
\ No newline at end of file
+            category: (cents + extra) / 100
+            for category, cents, extra in zip(CATEGORIES, cube.period_cents(period), recurring)
+        }
+    
+    def period_of(self, value: date) -> Optional[str]:
+        """Return the label of the budget period containing a date, or None for all-time budgets"""
+        granularity = self.budget.granularity
+        return PERIOD_LABELS[granularity](value) if granularity else None
+    
+    def get_category_spending(self, category: ExpenseCategory, period: Optional[str] = None) -> float:
+        """Return one category's spending, all-time or within a budget period, from the running totals"""
+        code = CATEGORY_CODES[category]
+        if period is None:
+            return (self._category_cents[category] + self._recurring_cents()[code]) / 100
+        granularity = self.budget.granularity or 'month'
+        recurring = self._recurring_cents(*period_bounds(granularity, period))[code]
+        return (self._get_cube(granularity).period_cents(period)[code] + recurring) / 100
+    
+    def current_period(self) -> Optional[str]:
+        """Return the label of the current budget period, or None for all-time budgets"""
+        return self.period_of(date.today())
+    
+    @instrumented('service.check_budget_limits')
+    def check_budget_limits(self) -> Dict[ExpenseCategory, bool]:
+        """Check if expenses exceed budget limits for the current budget period"""
+        period = self.current_period()
+        if period is None:
+            return self._exceeded(self.get_expenses_by_category())
+        return self._exceeded(self.get_period_totals(period))
+    
+    def check_budget_for_period(self, period: str) -> Dict[ExpenseCategory, bool]:
+        """Check if expenses exceed the per-period budget limits in the given period"""
+        return self._exceeded(self.get_period_totals(period))
+    
+    @instrumented('service.get_budget_history')
+    def get_budget_history(self, count: int = 24) -> List[Tuple[str, Dict[ExpenseCategory, bool]]]:
+        """
+        Return budget status for the last count periods, oldest first
+        
+        Each period is read from the aggregate cube, so the cost is
+        O(periods x categories) regardless of the number of expenses.
+        """
+        granularity = self.budget.granularity or 'month'
+        return [
+            (period, self._exceeded(self.get_period_totals(period, granularity)))
+            for period in previous_periods(granularity, count)
+        ]
\ No newline at end of file
@@ -0,0 +1,124 @@
+import json
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .data_persistence import _atomic_write_json
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=4096)
+def tokenize(text: str) -> Tuple[str, ...]:
+    """Split text into distinct lowercase word tokens"""
+    return tuple(dict.fromkeys(TOKEN_PATTERN.findall(text.lower())))
+
+
+class SearchIndex:
+    """
+    Token inverted index over expense descriptions.
+
+    Maps every lowercase word to the ids of the expenses whose description
+    contains it. A sorted list of the distinct tokens answers prefix queries
+    with a binary search, so "ub" finds "uber" without scanning expenses.
+    The index is kept up to date with add/remove as expenses change.
+    """
+
+    VERSION = 1
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        # Sorted distinct tokens, rebuilt on the next query after the vocabulary changes
+        self._sorted_tokens: Optional[List[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.postings)
+
+    def add(self, expense_id: Optional[str], description: str):
+        """Index an expense's description"""
+        if expense_id is None:
+            return
+        for token in tokenize(description):
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                self._sorted_tokens = None
+            ids.add(expense_id)
+
+    def remove(self, expense_id: Optional[str], description: str):
+        """Drop an expense indexed with description"""
+        for token in tokenize(description):
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(expense_id)
+            if not ids:
+                del self.postings[token]
+                self._sorted_tokens = None
+
+    def extend(self, documents: Iterable[Tuple[Optional[str], str]]):
+        """Index (expense id, description) pairs"""
+        for expense_id, description in documents:
+            self.add(expense_id, description)
+
+    def clear(self):
+        """Drop every indexed expense"""
+        self.postings.clear()
+        self._sorted_tokens = []
+
+    def _tokens(self) -> List[str]:
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self.postings)
+        return self._sorted_tokens
+
+    def prefix_ids(self, prefix: str) -> Set[str]:
+        """Return the ids of expenses with a token starting with prefix"""
+        tokens = self._tokens()
+        index = bisect_left(tokens, prefix)
+        matched: Set[str] = set()
+        while index < len(tokens) and tokens[index].startswith(prefix):
+            matched |= self.postings[tokens[index]]
+            index += 1
+        return matched
+
+    def match(self, query: str) -> Optional[Set[str]]:
+        """
+        Return the ids of expenses matching every word of query, each as a prefix
+
+        Returns None when query has no words, meaning no text filter.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return None
+        # Intersect the smallest candidate sets first
+        candidates = sorted((self.prefix_ids(term) for term in terms), key=len)
+        matched = candidates[0]
+        for ids in candidates[1:]:
+            if not matched:
+                break
+            matched &= ids
+        return matched
+
+    def save(self, path: str, fingerprint) -> int:
+        """Write the index to path, tagged with a fingerprint of the data it covers"""
+        return _atomic_write_json(path, {
+            'version': self.VERSION,
+            'fingerprint': fingerprint,
+            'postings': {token: list(ids) for token, ids in self.postings.items()},
+        }, indent=None)
+
+    @classmethod
+    def load(cls, path: str, fingerprint) -> Optional['SearchIndex']:
+        """Load an index saved for the same fingerprint, or return None if it is missing or stale"""
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if data.get('version') != cls.VERSION or data.get('fingerprint') != fingerprint:
+            return None
+        index = cls()
+        index.postings = {token: set(ids) for token, ids in data['postings'].items()}
+        index._sorted_tokens = None
+        return index
@@ -0,0 +1,254 @@
+import json
+import os
+import threading
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .aggregate_cube import PERIOD_LABELS
+from .data_persistence import JSONPersistence, _atomic_write_json, _iter_json_array
+from ..models.expense_store import to_cents
+from ..utils.instrumentation import instrumented, record_io
+
+
+class ShardedJSONPersistence(JSONPersistence):
+    """
+    JSON persistence splitting expenses into one file per period.
+
+    Expenses live in shard_dir/<period>.json (e.g. data/expenses/2025-05.json
+    for monthly shards). A manifest next to the shards records, for every
+    shard, its row count, first and last date and totals in cents per
+    category. Adding, updating or deleting an expense rewrites only the
+    shards involved plus the manifest, a date window only opens the shards
+    overlapping it, and all-time totals come from the manifest alone.
+    """
+    supports_incremental_writes = True
+    supports_aggregation = True
+    supports_incremental_updates = True
+
+    def __init__(self, shard_dir: str = 'data/expenses',
+                 budget_file: str = 'data/budget_config.json',
+                 granularity: str = 'month'):
+        super().__init__(os.path.join(shard_dir, 'manifest.json'), budget_file)
+        self.shard_dir = shard_dir
+        self.manifest_file = self.expenses_file
+        self._lock = threading.RLock()
+        self._shards: Dict[str, Dict] = {}
+        self.granularity = granularity
+        self._load_manifest()
+        if self.granularity not in PERIOD_LABELS:
+            raise ValueError(f"Unknown shard granularity '{self.granularity}'")
+        self._label = PERIOD_LABELS[self.granularity]
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_file, 'r') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            if os.path.isdir(self.shard_dir) and self._shard_files():
+                self.rebuild_manifest()
+            return
+        # Shards already on disk keep the period they were written with
+        self.granularity = manifest['granularity']
+        self._shards = manifest['shards']
+
+    def _shard_files(self) -> List[str]:
+        return sorted(
+            name[:-len('.json')] for name in os.listdir(self.shard_dir)
+            # Skips the manifest and temp files left by an interrupted write
+            if name.endswith('.json') and not name.startswith('.')
+            and name != os.path.basename(self.manifest_file)
+        )
+
+    def _shard_path(self, shard: str) -> str:
+        return os.path.join(self.shard_dir, f'{shard}.json')
+
+    def _shard_of(self, expense: Dict) -> str:
+        return self._label(date.fromisoformat(expense['date']))
+
+    @staticmethod
+    def _covered(entry: Dict, first: Optional[str], last: Optional[str]) -> bool:
+        """Whether every row of a shard is dated within [first, last] (ISO dates)"""
+        return (first is None or entry['first'] >= first) and (last is None or entry['last'] <= last)
+
+    @staticmethod
+    def _shard_entry(rows: List[Dict]) -> Dict:
+        """Summarize a shard's rows for the manifest"""
+        totals: Dict[str, int] = {}
+        for row in rows:
+            totals[row['category']] = totals.get(row['category'], 0) + to_cents(float(row['amount']))
+        dates = [row['date'] for row in rows]
+        return {'count': len(rows), 'first': min(dates), 'last': max(dates), 'cents': totals}
+
+    def _read_shard(self, shard: str) -> List[Dict]:
+        return list(self._iter_shard(shard))
+
+    def _iter_shard(self, shard: str) -> Iterator[Dict]:
+        try:
+            with open(self._shard_path(shard), 'r') as f:
+                yield from _iter_json_array(f)
+        except FileNotFoundError:
+            return
+
+    def _write_shard(self, shard: str, rows: List[Dict]) -> int:
+        """Rewrite one shard (or remove it when empty) and update its manifest entry"""
+        if not rows:
+            self._shards.pop(shard, None)
+            try:
+                os.remove(self._shard_path(shard))
+            except FileNotFoundError:
+                pass
+            return 0
+        self._shards[shard] = self._shard_entry(rows)
+        return _atomic_write_json(self._shard_path(shard), rows)
+
+    def _write_manifest(self) -> int:
+        # Written after the shards, so it never lists rows that aren't on disk yet
+        return _atomic_write_json(
+            self.manifest_file,
+            {'granularity': self.granularity, 'shards': dict(sorted(self._shards.items()))}
+        )
+
+    def rebuild_manifest(self):
+        """Recompute the manifest from the shard files, e.g. after a crash between writes"""
+        with self._lock:
+            self._shards = {}
+            for shard in self._shard_files():
+                rows = self._read_shard(shard)
+                if rows:
+                    self._shards[shard] = self._shard_entry(rows)
+            self._write_manifest()
+
+    def shards_between(self, start: Optional[date] = None, end: Optional[date] = None) -> List[str]:
+        """Return the shards holding expenses dated within [start, end], oldest first"""
+        first = start.isoformat() if start else None
+        last = end.isoformat() if end else None
+        return [
+            shard for shard, entry in sorted(self._shards.items())
+            if (first is None or entry['last'] >= first) and (last is None or entry['first'] <= last)
+        ]
+
+    @instrumented('persistence.save_expenses')
+    def save_expenses(self, expenses: List[Dict]):
+        """Replace all stored expenses, writing one file per shard"""
+        grouped = self._group(expenses)
+        written = 0
+        with self._lock:
+            for shard in set(self._shards) - set(grouped):
+                self._write_shard(shard, [])
+            for shard, rows in grouped.items():
+                written += self._write_shard(shard, rows)
+            written += self._write_manifest()
+        record_io('persistence.save_expenses', rows=len(expenses), bytes_written=written)
+
+    def _group(self, expenses: Iterable[Dict]) -> Dict[str, List[Dict]]:
+        grouped: Dict[str, List[Dict]] = {}
+        for expense in expenses:
+            grouped.setdefault(self._shard_of(expense), []).append(expense)
+        return grouped
+
+    @instrumented('persistence.append_expenses')
+    def append_expenses(self, expenses: List[Dict]):
+        """Add expenses, rewriting only the shards they fall into"""
+        if not expenses:
+            return
+        written = 0
+        with self._lock:
+            for shard, rows in self._group(expenses).items():
+                written += self._write_shard(shard, self._read_shard(shard) + rows)
+            written += self._write_manifest()
+        record_io('persistence.append_expenses', rows=len(expenses), bytes_written=written)
+
+    def _find_shard(self, expense_id: str, previous: Optional[Dict]) -> Optional[str]:
+        """Return the shard holding an id, looking in the previous version's shard first"""
+        candidates = sorted(self._shards)
+        if previous is not None:
+            hint = self._shard_of(previous)
+            candidates = [hint] + [shard for shard in candidates if shard != hint]
+        for shard in candidates:
+            if any(row.get('id') == expense_id for row in self._iter_shard(shard)):
+                return shard
+        return None
+
+    def _replace(self, expense_id: str, expense: Optional[Dict], previous: Optional[Dict]) -> int:
+        """Remove the row with expense_id and add expense (if any) to its shard"""
+        written = 0
+        source = self._find_shard(expense_id, previous)
+        target = self._shard_of(expense) if expense is not None else None
+        if source is not None:
+            rows = [row for row in self._read_shard(source) if row.get('id') != expense_id]
+            if source == target:
+                rows.append(expense)
+                target = None
+            written += self._write_shard(source, rows)
+        if target is not None:
+            written += self._write_shard(target, self._read_shard(target) + [expense])
+        return written + self._write_manifest()
+
+    @instrumented('persistence.update_expense')
+    def update_expense(self, expense: Dict, previous: Optional[Dict] = None):
+        """Rewrite the shard(s) holding the old and new version of an expense"""
+        with self._lock:
+            written = self._replace(expense['id'], expense, previous)
+        record_io('persistence.update_expense', rows=1, bytes_written=written)
+
+    @instrumented('persistence.delete_expense')
+    def delete_expense(self, expense_id: str, previous: Optional[Dict] = None):
+        """Rewrite the shard holding an expense without it"""
+        with self._lock:
+            written = self._replace(expense_id, None, previous)
+        record_io('persistence.delete_expense', rows=1, bytes_written=written)
+
+    @instrumented('persistence.load_expenses', rows=len)
+    def load_expenses(self) -> List[Dict]:
+        """Load all expenses, shard by shard"""
+        return list(self.iter_expenses())
+
+    def iter_expenses(self, start: Optional[date] = None,
+                      end: Optional[date] = None) -> Iterator[Dict]:
+        """Yield expenses oldest shard first, opening only the shards overlapping [start, end]"""
+        first = start.isoformat() if start else None
+        last = end.isoformat() if end else None
+        for shard in self.shards_between(start, end):
+            inside = self._covered(self._shards[shard], first, last)
+            for expense in self._iter_shard(shard):
+                if inside or ((first is None or expense['date'] >= first)
+                              and (last is None or expense['date'] <= last)):
+                    yield expense
+
+    def clear_expenses(self):
+        """Remove every shard and the manifest"""
+        with self._lock:
+            for shard in list(self._shards):
+                self._write_shard(shard, [])
+            super().clear_expenses()
+
+    @instrumented('persistence.sharded_total')
+    def get_total_expenses(self) -> float:
+        """Sum all expenses from the manifest without opening any shard"""
+        return sum(
+            cents for entry in self._shards.values() for cents in entry['cents'].values()
+        ) / 100
+
+    @instrumented('persistence.sharded_totals_by_category')
+    def get_expenses_by_category(self, start: Optional[date] = None,
+                                 end: Optional[date] = None) -> Dict[str, float]:
+        """
+        Sum expense amounts per category, optionally within [start, end]
+
+        Shards entirely inside the window are summed from the manifest; only
+        shards straddling a window edge are opened.
+        """
+        first = start.isoformat() if start else None
+        last = end.isoformat() if end else None
+        cents: Dict[str, int] = {}
+        for shard in self.shards_between(start, end):
+            entry = self._shards[shard]
+            if self._covered(entry, first, last):
+                for category, value in entry['cents'].items():
+                    cents[category] = cents.get(category, 0) + value
+                continue
+            for expense in self._iter_shard(shard):
+                if (first is None or expense['date'] >= first) and (last is None or expense['date'] <= last):
+                    category = expense['category']
+                    cents[category] = cents.get(category, 0) + to_cents(float(expense['amount']))
+        return {category: value / 100 for category, value in cents.items()}
@@ -0,0 +1,93 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Tuple
+
+from ..models.expense_store import ExpenseStore
+
+# Sortable columns -> store columns making up the sort key, most significant first
+SORT_COLUMNS = {
+    'date': ('date_ordinals',),
+    'category': ('category_codes', 'date_ordinals'),
+    'amount': ('amount_cents',),
+}
+
+# Inserting more rows than this one at a time costs more than rebuilding on next use
+MAX_INCREMENTAL_INSERTS = 256
+
+
+def _after(prefix: Tuple[int, ...]) -> Tuple[int, ...]:
+    """Smallest key prefix sorting after every key starting with prefix"""
+    return prefix[:-1] + (prefix[-1] + 1,)
+
+
+class SortIndex:
+    """
+    Rows of an ExpenseStore ordered by one column.
+
+    The order is an array of row numbers sorted by the column, then by its
+    tie-break columns and finally by row, so every row has a unique key. It
+    is built with stable sorts over the raw columns on first use and then
+    kept up to date as rows are added, changed or deleted, with a binary
+    search and one array insert or delete each. Key ranges (a date window,
+    one category, an amount range) are found by binary search as well, so
+    a page of sorted rows never needs sorting or scanning the whole store.
+    The order is rebuilt after the store renumbers its rows.
+    """
+
+    def __init__(self, store: ExpenseStore, column: str):
+        if column not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort expenses by '{column}'")
+        self.store = store
+        self.column = column
+        self._order = array('l')
+        # Store generation the order was built for; None when it needs a rebuild
+        self._generation = None
+
+    def _key(self, row: int) -> Tuple[int, ...]:
+        store = self.store
+        return tuple(getattr(store, name)[row] for name in SORT_COLUMNS[self.column]) + (row,)
+
+    @property
+    def order(self) -> array:
+        """Live rows sorted by the column"""
+        if self._generation != self.store.generation:
+            store = self.store
+            order = list(store.live_rows())
+            # Least significant column first; stable sorts keep the earlier orderings as tie-breaks
+            for name in reversed(SORT_COLUMNS[self.column]):
+                order.sort(key=getattr(store, name).__getitem__)
+            self._order = array('l', order)
+            self._generation = store.generation
+        return self._order
+
+    def _current(self) -> bool:
+        return self._generation == self.store.generation
+
+    def insert(self, rows: Iterable[int]):
+        """Add newly appended rows"""
+        rows = list(rows)
+        if not self._current():
+            return
+        if len(rows) > MAX_INCREMENTAL_INSERTS:
+            self._generation = None
+            return
+        for row in rows:
+            self._order.insert(bisect_left(self._order, self._key(row), key=self._key), row)
+
+    def remove(self, row: int):
+        """Take a row out, before it is changed or deleted (insert it again after a change)"""
+        if self._current():
+            del self._order[bisect_left(self._order, self._key(row), key=self._key)]
+
+    def span(self, low: Tuple[int, ...] = (), high: Tuple[int, ...] = ()) -> Tuple[int, int]:
+        """
+        Return the positions [first, last) in order of the rows whose key lies within [low, high]
+
+        Args:
+            low: Prefix of the sort key, e.g. (category code, start ordinal); empty for no lower bound
+            high: Prefix of the sort key; empty for no upper bound
+        """
+        order = self.order
+        first = bisect_left(order, low, key=self._key) if low else 0
+        last = bisect_left(order, _after(high), key=self._key) if high else len(order)
+        return first, max(first, last)
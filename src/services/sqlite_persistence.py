@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+from datetime import date
+from typing import List, Dict, Iterator, Optional
+
+from ..utils.instrumentation import instrumented, record_io
+
+
+class SQLitePersistence:
+    """
+    SQLite-backed persistence with the same interface as JSONPersistence.
+
+    Expenses live in an indexed table so inserts touch a single row and
+    totals are aggregated inside the database instead of in Python.
+    """
+    supports_incremental_writes = True
+    supports_aggregation = True
+    supports_incremental_updates = True
+
+    def __init__(self, db_file: str = 'data/budget.db'):
+        self.db_file = db_file
+        if os.path.dirname(db_file):
+            os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.connection:
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS expenses (
+                    rowid INTEGER PRIMARY KEY,
+                    id TEXT,
+                    date TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    description TEXT NOT NULL DEFAULT ''
+                );
+                CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+                CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category);
+                CREATE INDEX IF NOT EXISTS idx_expenses_id ON expenses(id);
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            ''')
+
+    @staticmethod
+    def _expense_row(expense: Dict):
+        return (
+            expense.get('id'),
+            expense['date'],
+            expense['category'],
+            float(expense['amount']),
+            expense.get('description', '')
+        )
+
+    @instrumented('persistence.save_expenses')
+    def save_expenses(self, expenses: List[Dict]):
+        """Replace all stored expenses"""
+        with self.connection:
+            self.connection.execute('DELETE FROM expenses')
+            self.connection.executemany(
+                'INSERT INTO expenses (id, date, category, amount, description) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (self._expense_row(exp) for exp in expenses)
+            )
+        record_io('persistence.save_expenses', rows=len(expenses))
+
+    @instrumented('persistence.append_expenses')
+    def append_expenses(self, expenses: List[Dict]):
+        """Insert expenses without touching existing rows"""
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO expenses (id, date, category, amount, description) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (self._expense_row(exp) for exp in expenses)
+            )
+        record_io('persistence.append_expenses', rows=len(expenses))
+
+    @instrumented('persistence.update_expense')
+    def update_expense(self, expense: Dict, previous: Optional[Dict] = None):
+        """Overwrite the row with the expense's id"""
+        expense_id, *values = self._expense_row(expense)
+        with self.connection:
+            self.connection.execute(
+                'UPDATE expenses SET date = ?, category = ?, amount = ?, description = ? '
+                'WHERE id = ?',
+                (*values, expense_id)
+            )
+
+    @instrumented('persistence.delete_expense')
+    def delete_expense(self, expense_id: str, previous: Optional[Dict] = None):
+        """Delete the row with an expense id"""
+        with self.connection:
+            self.connection.execute('DELETE FROM expenses WHERE id = ?', (expense_id,))
+
+    @instrumented('persistence.load_expenses', rows=len)
+    def load_expenses(self) -> List[Dict]:
+        """Load all expenses in insertion order"""
+        return list(self.iter_expenses())
+
+    @staticmethod
+    def _date_filter(start: Optional[date], end: Optional[date]):
+        """Build a WHERE clause on the indexed date column"""
+        clauses, params = [], []
+        if start:
+            clauses.append('date >= ?')
+            params.append(start.isoformat())
+        if end:
+            clauses.append('date <= ?')
+            params.append(end.isoformat())
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def iter_expenses(self, start: Optional[date] = None, end: Optional[date] = None,
+                      batch_size: int = 10000) -> Iterator[Dict]:
+        """Yield expenses in insertion order, optionally within [start, end], fetching rows in batches"""
+        where, params = self._date_filter(start, end)
+        cursor = self.connection.execute(
+            'SELECT id, date, category, amount, description FROM expenses'
+            + where + ' ORDER BY rowid',
+            params
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield {
+                    'id': row[0],
+                    'date': row[1],
+                    'category': row[2],
+                    'amount': row[3],
+                    'description': row[4]
+                }
+
+    def clear_expenses(self):
+        """Remove all stored expenses"""
+        with self.connection:
+            self.connection.execute('DELETE FROM expenses')
+
+    @instrumented('persistence.sql_total')
+    def get_total_expenses(self) -> float:
+        """Sum all expense amounts inside the database"""
+        row = self.connection.execute('SELECT COALESCE(SUM(amount), 0) FROM expenses').fetchone()
+        return row[0]
+
+    @instrumented('persistence.sql_totals_by_category')
+    def get_expenses_by_category(self, start: Optional[date] = None,
+                                 end: Optional[date] = None) -> Dict[str, float]:
+        """Sum expense amounts per category inside the database, optionally within [start, end]"""
+        where, params = self._date_filter(start, end)
+        cursor = self.connection.execute(
+            'SELECT category, SUM(amount) FROM expenses' + where + ' GROUP BY category',
+            params
+        )
+        return {category: total for category, total in cursor}
+
+    @instrumented('persistence.save_budget')
+    def save_budget(self, budget: Dict):
+        """Save the budget configuration as a JSON document"""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES ('budget', ?)",
+                (json.dumps(budget),)
+            )
+
+    def load_budget(self) -> Dict:
+        """Load the budget configuration"""
+        row = self.connection.execute(
+            "SELECT value FROM settings WHERE key = 'budget'"
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def clear_budget(self):
+        """Remove the stored budget configuration"""
+        with self.connection:
+            self.connection.execute("DELETE FROM settings WHERE key = 'budget'")
+
+    def close(self):
+        """Close the database connection"""
+        self.connection.close()
@@ -0,0 +1,169 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .expense_service import ExpenseService
+from ..utils.instrumentation import instrumented
+
+# User ids become directory names, so keep them to a safe alphabet
+USER_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+def validate_user_id(user_id: str) -> str:
+    """Return user_id if it is a valid user id, else raise ValueError"""
+    if not USER_ID_PATTERN.fullmatch(user_id):
+        raise ValueError(f"Invalid user id '{user_id}'")
+    return user_id
+
+
+class UserSession:
+    """One user's ExpenseService plus the bookkeeping the cache needs"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.service: Optional[ExpenseService] = None
+        # Serializes work on this user's service; services aren't thread-safe
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        # Requests currently holding the session; pinned sessions are never evicted
+        self.active = 0
+        # Set once an evicted session has flushed, so a reload sees its writes
+        self.closed = threading.Event()
+
+
+class UserServiceCache:
+    """
+    LRU cache of warm per-user ExpenseService instances.
+
+    Services are opened on first use with open_service(user_id) and kept
+    loaded, so later requests skip loading the user's data. At most
+    max_users services stay open: opening another evicts the least
+    recently used idle one, and evict_idle() drops those unused for
+    idle_timeout seconds. Evicted services are closed with
+    close_service(service), which flushes their pending writes; a user
+    evicted mid-flush is only reopened after the flush completes.
+    """
+
+    def __init__(self, open_service: Callable[[str], ExpenseService],
+                 close_service: Callable[[ExpenseService], None],
+                 max_users: int = 64, idle_timeout: float = 600.0):
+        if max_users < 1:
+            raise ValueError('max_users must be at least 1')
+        self.open_service = open_service
+        self.close_service = close_service
+        self.max_users = max_users
+        self.idle_timeout = idle_timeout
+        self._sessions: 'OrderedDict[str, UserSession]' = OrderedDict()
+        # Evicted sessions still flushing, by user id
+        self._closing: Dict[str, UserSession] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache size and hit, miss and eviction counts"""
+        return {
+            'users': len(self._sessions),
+            'max_users': self.max_users,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    @contextmanager
+    def session(self, user_id: str) -> Iterator[ExpenseService]:
+        """
+        Hold a user's service for the duration of the block, opening it if needed
+
+        Blocks run one at a time per user. Opening a service loads the user's
+        data, so call this from a worker thread rather than an event loop.
+        """
+        validate_user_id(user_id)
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                session = self._sessions[user_id] = UserSession(user_id)
+            self._sessions.move_to_end(user_id)
+            session.active += 1
+            evicted = self._pop_over_capacity()
+        try:
+            self._close(evicted)
+            with session.lock:
+                if session.service is None:
+                    self._open(session)
+                else:
+                    with self._lock:
+                        self.hits += 1
+                yield session.service
+        finally:
+            with self._lock:
+                session.active -= 1
+                session.last_used = time.monotonic()
+
+    def _open(self, session: UserSession):
+        # Called with session.lock held
+        with self._lock:
+            previous = self._closing.get(session.user_id)
+        if previous is not None:
+            previous.closed.wait()
+        with self._lock:
+            self.misses += 1
+        session.service = self.open_service(session.user_id)
+
+    def _pop_over_capacity(self) -> List[UserSession]:
+        # Called with self._lock held; the newest session is pinned, so it is never chosen
+        evicted = []
+        for user_id in list(self._sessions):
+            if len(self._sessions) <= self.max_users:
+                break
+            if self._sessions[user_id].active == 0:
+                evicted.append(self._evict(user_id))
+        return evicted
+
+    def _evict(self, user_id: str) -> UserSession:
+        # Called with self._lock held
+        session = self._sessions.pop(user_id)
+        self._closing[user_id] = session
+        self.evictions += 1
+        return session
+
+    @instrumented('cache.close_sessions')
+    def _close(self, sessions: List[UserSession]):
+        for session in sessions:
+            try:
+                with session.lock:
+                    if session.service is not None:
+                        self.close_service(session.service)
+                        session.service = None
+            finally:
+                session.closed.set()
+                with self._lock:
+                    if self._closing.get(session.user_id) is session:
+                        del self._closing[session.user_id]
+
+    def evict_idle(self, now: float = None) -> int:
+        """Close the services idle for longer than idle_timeout; returns how many were closed"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            evicted = [
+                self._evict(user_id) for user_id, session in list(self._sessions.items())
+                if session.active == 0 and now - session.last_used > self.idle_timeout
+            ]
+        self._close(evicted)
+        return len(evicted)
+
+    def close_all(self):
+        """Close every idle service, e.g. at shutdown"""
+        with self._lock:
+            evicted = [
+                self._evict(user_id) for user_id, session in list(self._sessions.items())
+                if session.active == 0
+            ]
+        self._close(evicted)
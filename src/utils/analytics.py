@@ -0,0 +1,161 @@
+from datetime import date, timedelta
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..models.expense import Expense, ExpenseCategory
+from ..models.expense_store import CATEGORIES, ExpenseStore
+from .instrumentation import instrumented
+
+# date.toordinal() of 1970-01-01, the datetime64 epoch
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _month_label(month: int) -> str:
+    """Label months counted from 1970-01 like the 'month' period granularity"""
+    return f'{1970 + month // 12}-{month % 12 + 1:02d}'
+
+
+class AnalyticsEngine:
+    """
+    Vectorized analytics over the columns of an ExpenseStore.
+
+    The date, category and amount columns are copied into NumPy arrays once
+    (a memcpy per column, optionally restricted to a date window). Every
+    aggregate is then a bincount, sort or partition over those arrays instead
+    of a Python loop over rows. The engine is a snapshot: build a new one
+    after expenses change.
+    """
+
+    def __init__(self, store: ExpenseStore, start: Optional[date] = None,
+                 end: Optional[date] = None):
+        store.compact()
+        self.store = store
+        ordinals = np.frombuffer(store.date_ordinals, dtype=f'i{store.date_ordinals.itemsize}')
+        codes = np.frombuffer(store.category_codes, dtype=np.uint8)
+        cents = np.frombuffer(store.amount_cents, dtype=np.int64)
+        rows = np.arange(len(cents))
+        if start or end:
+            mask = np.ones(len(cents), dtype=bool)
+            if start:
+                mask &= ordinals >= start.toordinal()
+            if end:
+                mask &= ordinals <= end.toordinal()
+            rows = rows[mask]
+        # Fancy indexing copies, so the store's arrays are free to grow afterwards
+        self.rows = rows
+        self.ordinals = ordinals[rows].astype(np.int64)
+        self.codes = codes[rows]
+        self.cents = cents[rows]
+
+    @cached_property
+    def months(self) -> np.ndarray:
+        """Month of each expense, counted from 1970-01"""
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        # Convert each distinct day in the range once, then look rows up by day
+        first = int(self.ordinals.min())
+        days = np.arange(first - EPOCH_ORDINAL, int(self.ordinals.max()) - EPOCH_ORDINAL + 1)
+        day_months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return day_months[self.ordinals - first]
+
+    def __len__(self) -> int:
+        return len(self.cents)
+
+    @instrumented('analytics.totals_by_category')
+    def totals_by_category(self) -> Dict[ExpenseCategory, float]:
+        """Return expenses by category"""
+        sums = np.bincount(self.codes, weights=self.cents, minlength=len(CATEGORIES))
+        return {category: float(total) / 100 for category, total in zip(CATEGORIES, sums)}
+
+    @instrumented('analytics.totals_by_month')
+    def totals_by_month(self) -> Dict[str, float]:
+        """Return total expenses per month with expenses, oldest first"""
+        if not len(self):
+            return {}
+        first = int(self.months.min())
+        offsets = self.months - first
+        sums = np.bincount(offsets, weights=self.cents)
+        counts = np.bincount(offsets)
+        return {
+            _month_label(first + offset): float(sums[offset]) / 100
+            for offset in np.flatnonzero(counts)
+        }
+
+    @instrumented('analytics.category_by_month')
+    def category_by_month(self) -> Tuple[List[str], Dict[ExpenseCategory, List[float]]]:
+        """
+        Return expenses per category for every month from the first to the last expense
+
+        Returns:
+            Tuple[List[str], Dict[ExpenseCategory, List[float]]]: Month labels
+            ('YYYY-MM', oldest first, empty months included) and each
+            category's total per month, aligned with the labels
+        """
+        if not len(self):
+            return [], {category: [] for category in CATEGORIES}
+        first = int(self.months.min())
+        count = int(self.months.max()) - first + 1
+        cells = np.bincount(
+            (self.months - first) * len(CATEGORIES) + self.codes,
+            weights=self.cents,
+            minlength=count * len(CATEGORIES)
+        ).reshape(count, len(CATEGORIES)) / 100
+        labels = [_month_label(first + offset) for offset in range(count)]
+        return labels, {category: cells[:, code].tolist() for code, category in enumerate(CATEGORIES)}
+
+    @instrumented('analytics.percentiles')
+    def percentiles(self, quantiles: Iterable[float] = (50, 90, 99)) -> Dict[ExpenseCategory, Dict[float, float]]:
+        """Return amount percentiles (linear interpolation) per category with expenses"""
+        quantiles = list(quantiles)
+        # Group rows by category with one stable (radix, for uint8) sort, then take each category's run
+        order = np.argsort(self.codes, kind='stable')
+        grouped = self.cents[order]
+        counts = np.bincount(self.codes, minlength=len(CATEGORIES))
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+
+        result: Dict[ExpenseCategory, Dict[float, float]] = {}
+        for code in np.flatnonzero(counts):
+            # np.percentile partitions instead of fully sorting each run
+            values = np.percentile(grouped[bounds[code]:bounds[code + 1]], quantiles)
+            result[CATEGORIES[code]] = {
+                quantile: float(value) / 100 for quantile, value in zip(quantiles, values)
+            }
+        return result
+
+    @instrumented('analytics.rolling_average')
+    def rolling_average(self, window: int = 30,
+                        category: Optional[ExpenseCategory] = None) -> Dict[str, float]:
+        """
+        Return the average daily spending over the trailing window days, for every
+        day from the first to the last expense (days before a full window average
+        over the days so far)
+        """
+        ordinals, cents = self.ordinals, self.cents
+        if category is not None:
+            selected = self.codes == CATEGORIES.index(category)
+            ordinals, cents = ordinals[selected], cents[selected]
+        if not len(ordinals):
+            return {}
+        first = int(ordinals.min())
+        daily = np.bincount(ordinals - first, weights=cents)
+        running = np.concatenate(([0.0], np.cumsum(daily)))
+        ends = np.arange(1, len(daily) + 1)
+        starts = np.maximum(ends - window, 0)
+        averages = (running[ends] - running[starts]) / (ends - starts) / 100
+        first_day = date.fromordinal(first)
+        return {
+            (first_day + timedelta(days=offset)).isoformat(): float(average)
+            for offset, average in enumerate(averages)
+        }
+
+    @instrumented('analytics.top_expenses')
+    def top_expenses(self, count: int = 10) -> List[Expense]:
+        """Return the count largest expenses, largest first"""
+        count = min(count, len(self))
+        if count <= 0:
+            return []
+        largest = np.argpartition(self.cents, len(self) - count)[len(self) - count:]
+        largest = largest[np.argsort(-self.cents[largest], kind='stable')]
+        return self.store.at(self.rows[largest].tolist())
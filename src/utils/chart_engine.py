@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional
+
+from ..models.expense import ExpenseCategory
+
+SUPPORTED_FORMATS = ('png', 'svg')
+# Renders of the same chart key are serialized on one of this many striped locks
+KEY_LOCK_STRIPES = 64
+
+_default_lock = threading.Lock()
+
+
+class ChartEngine:
+    """
+    Renders charts with matplotlib's object-oriented Agg API and caches the output.
+
+    Every chart is keyed by a hash of its input data and rendering options.
+    Rendered files are kept in an on-disk cache, so asking for the same chart
+    again is a file copy instead of a render. The cache is trimmed to
+    max_cache_bytes, evicting the least recently used files first. No pyplot
+    state is involved, so the engine can be used from worker threads.
+    """
+
+    _default: Optional['ChartEngine'] = None
+
+    def __init__(self, cache_dir: str = 'reports/.chart_cache',
+                 max_cache_bytes: int = 50 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self._lock = threading.Lock()
+        # Fixed pool, so long-running processes don't keep a lock per chart ever drawn
+        self._key_locks: List[threading.Lock] = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+
+    @classmethod
+    def default(cls) -> 'ChartEngine':
+        """Return the engine shared by ExpenseAnalyzer and DataExporter"""
+        if cls._default is None:
+            with _default_lock:
+                if cls._default is None:
+                    cls._default = cls()
+        return cls._default
+
+    @staticmethod
+    def cache_key(kind: str, data, options: Dict) -> str:
+        """Hash chart kind, data and options into a cache key"""
+        payload = json.dumps({'kind': kind, 'data': data, 'options': options}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def render_pie(
+        self,
+        category_totals: Dict[ExpenseCategory, float],
+        output_path: str,
+        title: str = 'Expenses by Category',
+        dpi: int = 100,
+        fmt: str = None
+    ) -> str:
+        """
+        Render a pie chart of expenses by category, skipping categories without expenses
+
+        Args:
+            category_totals (Dict[ExpenseCategory, float]): Expenses by category
+            output_path (str): Where to write the chart
+            title (str, optional): Chart title
+            dpi (int, optional): Resolution for raster output. Defaults to 100
+            fmt (str, optional): 'png' or 'svg'. Defaults to the output file extension
+
+        Returns:
+            str: output_path
+        """
+        data = [
+            [category.value, round(total, 2)]
+            for category, total in category_totals.items()
+            if total > 0
+        ]
+
+        def draw(figure):
+            axes = figure.subplots()
+            axes.pie(
+                [total for _, total in data],
+                labels=[label for label, _ in data],
+                autopct='%1.1f%%'
+            )
+            axes.set_title(title)
+            axes.axis('equal')
+
+        return self.render('pie', data, draw, output_path, {'title': title}, dpi, fmt)
+
+    def render_stacked_bars(
+        self,
+        labels: List[str],
+        series: Dict[ExpenseCategory, List[float]],
+        output_path: str,
+        title: str = 'Monthly Expenses by Category',
+        dpi: int = 100,
+        fmt: str = None
+    ) -> str:
+        """
+        Render a stacked bar chart with one bar per label and one segment per category
+
+        Args:
+            labels (List[str]): Bar labels, e.g. months
+            series (Dict[ExpenseCategory, List[float]]): Each category's values, aligned with labels
+            output_path (str): Where to write the chart
+            title (str, optional): Chart title
+            dpi (int, optional): Resolution for raster output. Defaults to 100
+            fmt (str, optional): 'png' or 'svg'. Defaults to the output file extension
+
+        Returns:
+            str: output_path
+        """
+        data = {
+            'labels': list(labels),
+            'series': [
+                [category.value, [round(value, 2) for value in values]]
+                for category, values in series.items()
+                if any(values)
+            ],
+        }
+
+        def draw(figure):
+            axes = figure.subplots()
+            positions = range(len(data['labels']))
+            bottom = [0.0] * len(data['labels'])
+            for name, values in data['series']:
+                axes.bar(positions, values, bottom=bottom, label=name)
+                bottom = [base + value for base, value in zip(bottom, values)]
+            axes.set_xticks(list(positions))
+            axes.set_xticklabels(data['labels'], rotation=45, ha='right')
+            axes.set_title(title)
+            axes.legend()
+            figure.tight_layout()
+
+        return self.render('stacked_bars', data, draw, output_path, {'title': title}, dpi, fmt)
+
+    def render_trend(
+        self,
+        points: Dict[str, float],
+        output_path: str,
+        title: str = 'Spending Trend',
+        ylabel: str = 'Amount',
+        dpi: int = 100,
+        fmt: str = None
+    ) -> str:
+        """
+        Render a line chart of values in label order, e.g. a rolling average per day
+
+        Args:
+            points (Dict[str, float]): Label -> value, in plotting order
+            output_path (str): Where to write the chart
+            title (str, optional): Chart title
+            ylabel (str, optional): Y axis label
+            dpi (int, optional): Resolution for raster output. Defaults to 100
+            fmt (str, optional): 'png' or 'svg'. Defaults to the output file extension
+
+        Returns:
+            str: output_path
+        """
+        data = [[label, round(value, 2)] for label, value in points.items()]
+
+        def draw(figure):
+            axes = figure.subplots()
+            axes.plot(range(len(data)), [value for _, value in data])
+            # At most ~12 tick labels, however many points there are
+            step = max(1, len(data) // 12)
+            ticks = list(range(0, len(data), step))
+            axes.set_xticks(ticks)
+            axes.set_xticklabels([data[tick][0] for tick in ticks], rotation=45, ha='right')
+            axes.set_ylabel(ylabel)
+            axes.set_title(title)
+            figure.tight_layout()
+
+        return self.render(
+            'trend', data, draw, output_path, {'title': title, 'ylabel': ylabel}, dpi, fmt
+        )
+
+    def render(
+        self,
+        kind: str,
+        data,
+        draw: Callable,
+        output_path: str,
+        options: Dict = None,
+        dpi: int = 100,
+        fmt: str = None,
+        figsize=(10, 7)
+    ) -> str:
+        """
+        Render a chart through the cache
+
+        Args:
+            kind (str): Chart type, part of the cache key
+            data: JSON-serializable chart input, part of the cache key
+            draw (Callable): Called with a fresh matplotlib Figure to draw the chart
+            output_path (str): Where to write the chart
+            options (Dict, optional): JSON-serializable drawing options, part of the cache key
+            dpi (int, optional): Resolution for raster output. Defaults to 100
+            fmt (str, optional): 'png' or 'svg'. Defaults to the output file extension
+            figsize (tuple, optional): Figure size in inches
+
+        Returns:
+            str: output_path
+        """
+        fmt = (fmt or os.path.splitext(output_path)[1].lstrip('.') or 'png').lower()
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported chart format '{fmt}'")
+        key = self.cache_key(
+            kind, data, dict(options or {}, dpi=dpi, fmt=fmt, figsize=list(figsize))
+        )
+        cached_path = os.path.join(self.cache_dir, f'{key}.{fmt}')
+
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        with self._key_lock(key):
+            try:
+                # Mark as recently used for eviction
+                os.utime(cached_path)
+            except FileNotFoundError:
+                self._render_to(cached_path, draw, dpi, fmt, figsize)
+                self._evict(keep=cached_path)
+            shutil.copyfile(cached_path, output_path)
+        return output_path
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        # Keys are hex digests, so their leading digits spread evenly over the stripes
+        return self._key_locks[int(key[:8], 16) % KEY_LOCK_STRIPES]
+
+    def _render_to(self, path: str, draw: Callable, dpi: int, fmt: str, figsize):
+        # Imported here so callers that never draw charts skip loading matplotlib
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(figure)
+        draw(figure)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=f'.{fmt}.tmp')
+        os.close(fd)
+        try:
+            figure.savefig(tmp_path, format=fmt, dpi=dpi)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _evict(self, keep: str = None):
+        """Remove least recently used cache files until the cache fits in max_cache_bytes"""
+        with self._lock:
+            try:
+                entries = [
+                    entry for entry in os.scandir(self.cache_dir)
+                    if entry.is_file() and not entry.name.endswith('.tmp') and entry.path != keep
+                ]
+            except FileNotFoundError:
+                return
+            stats = [(entry.stat(), entry.path) for entry in entries]
+            total = sum(stat.st_size for stat, _ in stats)
+            if keep and os.path.exists(keep):
+                total += os.path.getsize(keep)
+            for stat, path in sorted(stats, key=lambda item: item[0].st_mtime):
+                if total <= self.max_cache_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= stat.st_size
+
+    def clear_cache(self):
+        """Delete every cached chart"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
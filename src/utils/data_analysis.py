@@ -1,26 +1,39 @@
-import matplotlib.pyplot as plt
-from typing import Dict
+from typing import Dict, List
 from ..models.expense import ExpenseCategory
+from .chart_engine import ChartEngine
 
 class ExpenseAnalyzer:
     @staticmethod
     def generate_category_pie_chart(
         category_totals: Dict[ExpenseCategory, float], 
-        output_path: str = 'expense_categories.png'
+        output_path: str = 'expense_categories.png',
+        dpi: int = 100
     ):
-        """Generate pie chart of expenses by category"""
-        # Filter out categories with zero expenses
-        filtered_totals = {
-            cat: total for cat, total in category_totals.items() if total > 0
-        }
-        
-        plt.figure(figsize=(10, 7))
-        plt.pie(
-            filtered_totals.values(), 
-            labels=[cat.value for cat in filtered_totals.keys()], 
-            autopct='%1.1f%%'
-        )
-        plt.title('Expenses by Category')
-        plt.axis('equal')
-        plt.savefig(output_path)
-        plt.close()
\ No newline at end of file
+        """Generate pie chart of expenses by category (PNG or SVG, by file extension)"""
+        return ChartEngine.default().render_pie(category_totals, output_path, dpi=dpi)
+    
+    @staticmethod
+    def generate_monthly_stacked_bar_chart(
+        months: List[str], 
+        category_series: Dict[ExpenseCategory, List[float]], 
+        output_path: str = 'monthly_expenses.png',
+        dpi: int = 100
+    ):
+        """Generate stacked bar chart of expenses per month and category, e.g. from AnalyticsEngine.category_by_month()"""
+        return ChartEngine.default().render_stacked_bars(months, category_series, output_path, dpi=dpi)
+    
+    @staticmethod
+    def generate_trend_chart(
+        daily_averages: Dict[str, float], 
+        output_path: str = 'expense_trend.png',
+        window: int = 30,
+        dpi: int = 100
+    ):
+        """Generate line chart of a rolling average, e.g. from AnalyticsEngine.rolling_average()"""
+        return ChartEngine.default().render_trend(
+            daily_averages, 
+            output_path, 
+            title=f'{window}-Day Average Daily Spending', 
+            ylabel='Average per day',
+            dpi=dpi
+        )
\ No newline at end of file
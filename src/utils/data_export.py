@@ -1,11 +1,103 @@
 import csv
+import gzip
+import json
 import os
-from typing import List, Dict
-import matplotlib.pyplot as plt
-import pandas as pd
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from itertools import islice
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
 
 from ..models.expense import Expense, ExpenseCategory
 from ..models.budget import Budget
+from ..models.expense_store import CATEGORIES, ExpenseStore
+from .chart_engine import ChartEngine
+from .instrumentation import instrumented, is_enabled, record_io
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled before it finishes"""
+
+
+# Columnar dataset formats -> part file extension; parquet and feather need pyarrow
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'feather': '.feather', 'ndjson': '.ndjson'}
+# Fields of every exported row, named like the persisted expense dicts
+COLUMNAR_FIELDS = ('date', 'category', 'amount', 'description', 'id')
+
+
+def arrow_available() -> bool:
+    """Whether pyarrow is installed, enabling the parquet and feather formats"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _NDJSONPartWriter:
+    """Writes a partition as one JSON object per line"""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'w')
+
+    def write(self, rows: List[Tuple]):
+        self._file.writelines(json.dumps(dict(zip(COLUMNAR_FIELDS, row))) + '\n' for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ArrowPartWriter:
+    """Writes a partition as a Parquet file or an Arrow IPC (Feather v2) file, one row group per write"""
+
+    def __init__(self, path: str, fmt: str):
+        # Imported here so pyarrow stays an optional dependency
+        import pyarrow as pa
+        
+        self._pa = pa
+        self._fmt = fmt
+        self._dates: Dict[str, date] = {}
+        # One fixed dictionary for every batch; IPC files can't replace it midway
+        self._category_values = pa.array([category.value for category in CATEGORIES], pa.string())
+        self._category_indices = {category.value: code for code, category in enumerate(CATEGORIES)}
+        self.schema = pa.schema([
+            ('date', pa.date32()),
+            ('category', pa.dictionary(pa.int32(), pa.string())),
+            ('amount', pa.float64()),
+            ('description', pa.string()),
+            ('id', pa.string()),
+        ])
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, rows: List[Tuple]):
+        pa = self._pa
+        iso_dates, categories, amounts, descriptions, ids = zip(*rows)
+        dates = self._dates
+        for iso in iso_dates:
+            if iso not in dates:
+                dates[iso] = date.fromisoformat(iso)
+        batch = pa.record_batch([
+            pa.array([dates[iso] for iso in iso_dates], pa.date32()),
+            pa.DictionaryArray.from_arrays(
+                pa.array([self._category_indices[value] for value in categories], pa.int32()),
+                self._category_values
+            ),
+            pa.array(amounts, pa.float64()),
+            pa.array(descriptions, pa.string()),
+            pa.array(ids, pa.string()),
+        ], schema=self.schema)
+        if self._fmt == 'parquet':
+            self._writer.write_table(pa.Table.from_batches([batch]), row_group_size=len(rows))
+        else:
+            self._writer.write_batch(batch)
+
+    def close(self):
+        self._writer.close()
+
 
 class DataExporter:
     @staticmethod
@@ -23,34 +115,238 @@ class DataExporter:
         Returns:
             str: Path to the generated CSV file
         """
-        # Ensure the 'reports' directory exists
-        os.makedirs('reports', exist_ok=True)
-        filepath = os.path.join('reports', filename)
+        return DataExporter.export_expenses_stream(expenses, filename)
+
+    @staticmethod
+    def _expense_rows(expenses: Iterable) -> Iterator[Tuple[str, str, str, str]]:
+        """Turn expenses, expense dicts or an ExpenseStore into CSV row tuples"""
+        if isinstance(expenses, ExpenseStore):
+            # Read straight from the columns without building Expense objects
+            for iso_date, category, amount, description in expenses.iter_rows():
+                yield iso_date, category, f'{amount:.2f}', description
+            return
+        for expense in expenses:
+            if isinstance(expense, dict):
+                yield (
+                    expense['date'],
+                    expense['category'],
+                    f"{float(expense['amount']):.2f}",
+                    expense.get('description', '')
+                )
+            else:
+                yield (
+                    expense.date.isoformat(),
+                    expense.category.value,
+                    f'{expense.amount:.2f}',
+                    expense.description
+                )
+
+    @staticmethod
+    @instrumented('export.expenses_csv')
+    def export_expenses_stream(
+        expenses: Iterable,
+        filename: str = 'expenses_report.csv',
+        batch_size: int = 10000,
+        compress: bool = False,
+        cancel_event: threading.Event = None,
+        directory: str = 'reports'
+    ):
+        """
+        Export expenses to a CSV file in batches without materializing them
         
-        with open(filepath, 'w', newline='') as csvfile:
-            # Define fieldnames
-            fieldnames = ['Date', 'Category', 'Amount', 'Description']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            # Write header
-            writer.writeheader()
+        Args:
+            expenses (Iterable): Any iterable or generator of expenses, expense
+                dicts (e.g. persistence.iter_expenses()) or an ExpenseStore
+            filename (str, optional): Name of the CSV file. Defaults to 'expenses_report.csv'
+            batch_size (int, optional): Rows written per batch. Defaults to 10000
+            compress (bool, optional): Write gzip output, adding a '.gz' suffix. Defaults to False
+            cancel_event (threading.Event, optional): Abort between batches once set
+            directory (str, optional): Output directory. Defaults to 'reports'
+        
+        Returns:
+            str: Path to the generated CSV file
+        
+        Raises:
+            ExportCancelled: If cancel_event was set before the export finished
+        """
+        # Ensure the output directory exists
+        os.makedirs(directory, exist_ok=True)
+        filepath = os.path.join(directory, filename)
+        if compress and not filepath.endswith('.gz'):
+            filepath += '.gz'
+        
+        opener = gzip.open if compress else open
+        with opener(filepath, 'wt', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['Date', 'Category', 'Amount', 'Description'])
             
-            # Write expense rows
-            for expense in expenses:
-                writer.writerow({
-                    'Date': expense.date.isoformat(),
-                    'Category': expense.category.value,
-                    'Amount': f'{expense.amount:.2f}',
-                    'Description': expense.description
-                })
+            rows = DataExporter._expense_rows(expenses)
+            row_count = 0
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                writer.writerows(batch)
+                row_count += len(batch)
+        
+        if cancel_event is not None and cancel_event.is_set():
+            os.remove(filepath)
+            raise ExportCancelled(f'Export to {filepath} was cancelled')
         
+        if is_enabled():
+            record_io('export.expenses_csv', rows=row_count, bytes_written=os.path.getsize(filepath))
         return filepath
 
     @staticmethod
+    def _month_rows(expenses: Iterable) -> Iterator[Tuple[str, Tuple]]:
+        """
+        Turn expenses, expense dicts or an ExpenseStore into (month, row) pairs,
+        row holding the COLUMNAR_FIELDS values
+        
+        A store is read month by month from its date index, so its rows come
+        grouped by month; other sources keep their own order.
+        """
+        if isinstance(expenses, ExpenseStore):
+            iso_dates: Dict[int, str] = {}
+            category_values = [category.value for category in CATEGORIES]
+            for key, rows in expenses.month_buckets():
+                month = f'{key // 12}-{key % 12 + 1:02d}'
+                for row in list(rows):
+                    ordinal = expenses.date_ordinals[row]
+                    iso = iso_dates.get(ordinal)
+                    if iso is None:
+                        iso = iso_dates[ordinal] = date.fromordinal(ordinal).isoformat()
+                    yield month, (
+                        iso, category_values[expenses.category_codes[row]],
+                        expenses.amount_cents[row] / 100, expenses.descriptions[row], expenses.ids[row]
+                    )
+            return
+        for expense in expenses:
+            if isinstance(expense, dict):
+                iso = expense['date']
+                yield iso[:7], (
+                    iso, expense['category'], float(expense['amount']),
+                    expense.get('description', ''), expense.get('id')
+                )
+            else:
+                iso = expense.date.isoformat()
+                yield iso[:7], (
+                    iso, expense.category.value, expense.amount, expense.description, expense.id
+                )
+
+    @staticmethod
+    @instrumented('export.expenses_columnar')
+    def export_expenses_columnar(
+        expenses: Iterable,
+        dataset: str = 'expenses_dataset',
+        fmt: str = 'auto',
+        row_group_size: int = 10000,
+        cancel_event: threading.Event = None,
+        directory: str = 'reports'
+    ):
+        """
+        Export expenses as a columnar dataset partitioned by month
+        
+        Rows are written to <directory>/<dataset>/month=YYYY-MM/part-0<ext>, so
+        downstream jobs can read only the months they need. Each month's rows
+        are buffered and written as a row group (Parquet) or record batch
+        (Feather) once row_group_size rows are pending, so at most one row
+        group per open month is held in memory. An ExpenseStore is read month
+        by month and each month's file is closed before the next is opened.
+        
+        Args:
+            expenses (Iterable): Any iterable or generator of expenses, expense
+                dicts (e.g. persistence.iter_expenses()) or an ExpenseStore
+            dataset (str, optional): Dataset directory under directory. Defaults to 'expenses_dataset'
+            fmt (str, optional): 'parquet', 'feather', 'ndjson', or 'auto' for
+                parquet when pyarrow is installed and ndjson otherwise. Defaults to 'auto'
+            row_group_size (int, optional): Rows per row group. Defaults to 10000
+            cancel_event (threading.Event, optional): Abort between row groups once set
+            directory (str, optional): Output directory for the dataset. Defaults to 'reports'
+        
+        Returns:
+            str: Path to the dataset directory
+        
+        Raises:
+            ValueError: If the format is unknown, or needs pyarrow and it isn't installed
+            ExportCancelled: If cancel_event was set before the export finished
+        """
+        if fmt == 'auto':
+            fmt = 'parquet' if arrow_available() else 'ndjson'
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}'")
+        if fmt != 'ndjson' and not arrow_available():
+            raise ValueError(f"The {fmt} format needs pyarrow; install it or export as ndjson")
+        
+        os.makedirs(directory, exist_ok=True)
+        dirpath = os.path.join(directory, dataset)
+        # Written next to the old dataset and swapped in at the end, so readers never see half of one
+        temp_dir = os.path.join(directory, f'.{dataset}.tmp')
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        
+        # month -> (part writer, pending rows)
+        partitions: Dict[str, Tuple[object, List[Tuple]]] = {}
+        ordered = isinstance(expenses, ExpenseStore)
+        row_count = 0
+        
+        def open_partition(month: str):
+            month_dir = os.path.join(temp_dir, f'month={month}')
+            os.makedirs(month_dir)
+            path = os.path.join(month_dir, f'part-0{COLUMNAR_FORMATS[fmt]}')
+            writer = _NDJSONPartWriter(path) if fmt == 'ndjson' else _ArrowPartWriter(path, fmt)
+            return writer, []
+        
+        def close_partition(month: str):
+            writer, pending = partitions.pop(month)
+            if pending:
+                writer.write(pending)
+            writer.close()
+        
+        try:
+            current: Optional[str] = None
+            for month, row in DataExporter._month_rows(expenses):
+                partition = partitions.get(month)
+                if partition is None:
+                    if ordered and current is not None:
+                        close_partition(current)
+                    partition = partitions[month] = open_partition(month)
+                    current = month
+                writer, pending = partition
+                pending.append(row)
+                if len(pending) >= row_group_size:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ExportCancelled(f'Export to {dirpath} was cancelled')
+                    writer.write(pending)
+                    pending.clear()
+                row_count += 1
+            for month in list(partitions):
+                close_partition(month)
+        except BaseException:
+            for writer, _ in partitions.values():
+                writer.close()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        
+        shutil.rmtree(dirpath, ignore_errors=True)
+        os.replace(temp_dir, dirpath)
+        if is_enabled():
+            written = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(dirpath) for name in names
+            )
+            record_io('export.expenses_columnar', rows=row_count, bytes_written=written)
+        return dirpath
+
+    @staticmethod
+    @instrumented('export.budget_csv')
     def export_budget_to_csv(
         budget: Budget, 
         expenses_by_category: Dict[ExpenseCategory, float],
-        filename: str = 'budget_report.csv'
+        filename: str = 'budget_report.csv',
+        directory: str = 'reports'
     ):
         """
         Export budget limits and actual expenses to a CSV file
@@ -59,13 +355,14 @@ class DataExporter:
             budget (Budget): Budget limits
             expenses_by_category (Dict[ExpenseCategory, float]): Actual expenses by category
             filename (str, optional): Name of the CSV file. Defaults to 'budget_report.csv'
+            directory (str, optional): Output directory. Defaults to 'reports'
         
         Returns:
             str: Path to the generated CSV file
         """
-        # Ensure the 'reports' directory exists
-        os.makedirs('reports', exist_ok=True)
-        filepath = os.path.join('reports', filename)
+        # Ensure the output directory exists
+        os.makedirs(directory, exist_ok=True)
+        filepath = os.path.join(directory, filename)
         
         with open(filepath, 'w', newline='') as csvfile:
             # Define fieldnames
@@ -93,9 +390,16 @@ class DataExporter:
         return filepath
 
     @staticmethod
+    @instrumented('export.comprehensive_report')
     def generate_comprehensive_report(
         expenses: List[Expense], 
-        budget: Budget
+        budget: Budget,
+        expenses_by_category: Dict[ExpenseCategory, float] = None,
+        start: date = None,
+        end: date = None,
+        progress: Callable[[str], None] = None,
+        cancel_event: threading.Event = None,
+        directory: str = 'reports'
     ):
         """
         Generate a comprehensive report with CSV exports and visualization
@@ -103,70 +407,93 @@ class DataExporter:
         Args:
             expenses (List[Expense]): List of expenses
             budget (Budget): Budget limits
+            expenses_by_category (Dict[ExpenseCategory, float], optional): Precomputed
+                totals by category for the same window. Computed from expenses when omitted
+            start (date, optional): Only report expenses on or after this date
+            end (date, optional): Only report expenses on or before this date
+            progress (Callable[[str], None], optional): Called with a message as each file is written
+            cancel_event (threading.Event, optional): Abort the report once set
+            directory (str, optional): Output directory for all files. Defaults to 'reports'
         
         Returns:
             Dict[str, str]: Paths to generated files
-        """
-        # Calculate expenses by category
-        expenses_by_category = {}
-        for category in ExpenseCategory:
-            expenses_by_category[category] = sum(
-                exp.amount for exp in expenses if exp.category == category
-            )
         
-        # Export expenses CSV
-        expenses_csv = DataExporter.export_expenses_to_csv(expenses)
+        Raises:
+            ExportCancelled: If cancel_event was set before the report finished
+        """
+        # Restrict to the date window
+        if start or end:
+            if isinstance(expenses, ExpenseStore):
+                expenses = expenses.between(start, end)
+            else:
+                expenses = [
+                    exp for exp in expenses
+                    if (start is None or exp.date >= start) and (end is None or exp.date <= end)
+                ]
         
-        # Export budget CSV
-        budget_csv = DataExporter.export_budget_to_csv(budget, expenses_by_category)
+        # Calculate expenses by category
+        if expenses_by_category is None and isinstance(expenses, ExpenseStore):
+            expenses_by_category = expenses.totals_by_category()
+        elif expenses_by_category is None:
+            expenses_by_category = {category: 0.0 for category in ExpenseCategory}
+            for exp in expenses:
+                expenses_by_category[exp.category] += exp.amount
         
-        # Generate pie chart
-        chart_path = DataExporter.generate_expense_pie_chart(expenses_by_category)
+        # The two CSV exports and the chart don't depend on each other
+        def run(name, func, *args, **kwargs):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled('Report generation was cancelled')
+            path = func(*args, **kwargs)
+            if progress is not None:
+                progress(f'{name} written to {path}')
+            return path
         
-        return {
-            'expenses_csv': expenses_csv,
-            'budget_csv': budget_csv,
-            'chart_path': chart_path
-        }
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            expenses_csv = executor.submit(
+                run, 'Expenses CSV', DataExporter.export_expenses_stream, 
+                expenses, 'expenses_report.csv', cancel_event=cancel_event, directory=directory
+            )
+            budget_csv = executor.submit(
+                run, 'Budget CSV', DataExporter.export_budget_to_csv, 
+                budget, expenses_by_category, directory=directory
+            )
+            chart_path = executor.submit(
+                run, 'Expense chart', DataExporter.generate_expense_pie_chart, 
+                expenses_by_category, directory=directory
+            )
+            
+            return {
+                'expenses_csv': expenses_csv.result(),
+                'budget_csv': budget_csv.result(),
+                'chart_path': chart_path.result()
+            }
 
     @staticmethod
+    @instrumented('export.pie_chart')
     def generate_expense_pie_chart(
         expenses_by_category: Dict[ExpenseCategory, float], 
-        filename: str = 'expense_categories_chart.png'
+        filename: str = 'expense_categories_chart.png',
+        dpi: int = 100,
+        directory: str = 'reports'
     ):
         """
         Generate a pie chart of expenses by category
         
+        Rendering goes through the shared ChartEngine, so unchanged totals are
+        served from its cache instead of being drawn again.
+        
         Args:
             expenses_by_category (Dict[ExpenseCategory, float]): Expenses by category
-            filename (str, optional): Name of the chart file. Defaults to 'expense_categories_chart.png'
+            filename (str, optional): Name of the chart file; a '.svg' extension
+                writes SVG. Defaults to 'expense_categories_chart.png'
+            dpi (int, optional): Resolution for PNG output. Defaults to 100
+            directory (str, optional): Output directory. Defaults to 'reports'
         
         Returns:
             str: Path to the generated chart
         """
-        # Ensure the 'reports' directory exists
-        os.makedirs('reports', exist_ok=True)
-        filepath = os.path.join('reports', filename)
-        
-        # Filter out categories with zero expenses
-        filtered_expenses = {
-            cat.value: amount 
-            for cat, amount in expenses_by_category.items() 
-            if amount > 0
-        }
-        
-        # Create pie chart
-        plt.figure(figsize=(10, 7))
-        plt.pie(
-            filtered_expenses.values(), 
-            labels=[cat for cat in filtered_expenses.keys()], 
-            autopct='%1.1f%%'
-        )
-        plt.title('Expenses by Category')
-        plt.axis('equal')
-        
-        # Save the chart
-        plt.savefig(filepath)
-        plt.close()
-        
-        return filepath
\ No newline at end of file
+        # Ensure the output directory exists
+        os.makedirs(directory, exist_ok=True)
+        filepath = os.path.join(directory, filename)
+        
+        return ChartEngine.default().render_pie(expenses_by_category, filepath, dpi=dpi)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from ..models.expense import Expense, ExpenseCategory
+from .validators import ExpenseValidator
+
+
+@dataclass
+class ImportResult:
+    expenses: List[Expense] = field(default_factory=list)
+    # (row number, error message) for every rejected row
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+
+class ExpenseImporter:
+    @staticmethod
+    def parse_rows(rows: Iterable[Dict], first_row: int = 1) -> ImportResult:
+        """
+        Parse and validate a batch of raw expense rows
+        
+        Rows are dictionaries with date, category, amount and description keys
+        (case-insensitive). Invalid rows are reported in the result instead of
+        aborting the batch.
+        
+        Args:
+            rows (Iterable[Dict]): Raw rows to parse
+            first_row (int, optional): Number of the first row, used in error messages. Defaults to 1
+        
+        Returns:
+            ImportResult: Parsed expenses and per-row errors
+        """
+        result = ImportResult()
+        today = date.today()
+        dates: Dict[str, date] = {}
+        categories = {category.value: category for category in ExpenseCategory}
+        
+        for row_number, row in enumerate(rows, start=first_row):
+            try:
+                row = {key.strip().lower(): value for key, value in row.items() if key}
+                date_str = str(row.get('date', '')).strip()
+                expense_date = dates.get(date_str)
+                if expense_date is None:
+                    expense_date = dates[date_str] = date.fromisoformat(date_str)
+                category = categories.get(str(row.get('category', '')).strip())
+                if category is None:
+                    raise ValueError(f"Unknown category '{row.get('category', '')}'")
+                amount = float(row.get('amount', ''))
+                description = row.get('description') or ''
+                if not isinstance(description, str):
+                    raise ValueError(f"Description must be text, not {description!r}")
+                
+                if not ExpenseValidator.validate_date(expense_date, today):
+                    raise ValueError("Date cannot be in the future")
+                if not ExpenseValidator.validate_amount(amount):
+                    raise ValueError("Amount must be positive" if not amount > 0 else "Amount is too large")
+                
+                result.expenses.append(Expense(
+                    date=expense_date,
+                    category=category,
+                    amount=amount,
+                    description=description
+                ))
+            except (ValueError, TypeError, AttributeError, OverflowError) as e:
+                # OverflowError: JSON integers too large for a float
+                result.errors.append((row_number, str(e)))
+        
+        return result
+
+    @staticmethod
+    def import_csv(filepath: str) -> ImportResult:
+        """
+        Parse expenses from a CSV file with Date, Category, Amount and Description columns
+        
+        Args:
+            filepath (str): Path to the CSV file
+        
+        Returns:
+            ImportResult: Parsed expenses and per-row errors
+        """
+        with open(filepath, 'r', newline='') as csvfile:
+            # Row 1 is the header
+            return ExpenseImporter.parse_rows(csv.DictReader(csvfile), first_row=2)
+
+    @staticmethod
+    def import_json(filepath: str) -> ImportResult:
+        """
+        Parse expenses from a JSON file holding a list of expense objects
+        
+        Args:
+            filepath (str): Path to the JSON file
+        
+        Returns:
+            ImportResult: Parsed expenses and per-row errors
+        """
+        with open(filepath, 'r') as f:
+            rows = json.load(f)
+        if not isinstance(rows, list):
+            raise ValueError("JSON import file must contain a list of expenses")
+        return ExpenseImporter.parse_rows(rows)
@@ -0,0 +1,210 @@
+"""
+Opt-in instrumentation for the persistence, service and export hot paths.
+
+Operations are wrapped with @instrumented('area.operation'). While
+instrumentation is disabled (the default) the wrapper only checks a flag
+before calling straight through. Once enable() is called, every call records
+its latency into a histogram, and code can attribute rows touched and bytes
+written to an operation with record_io().
+"""
+import functools
+import io
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Upper bounds (milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = [0.1, 1, 10, 100, 1000, 10000, math.inf]
+
+
+class _State:
+    enabled = False
+
+
+_state = _State()
+_lock = threading.Lock()
+
+
+class OperationStats:
+    """Counters for one instrumented operation"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.bytes_written = 0
+        self.histogram = [0] * len(LATENCY_BUCKETS_MS)
+
+    def add_call(self, seconds: float, failed: bool):
+        self.calls += 1
+        self.errors += failed
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        elapsed_ms = seconds * 1000
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[index] += 1
+                break
+
+    def to_dict(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': self.total_seconds * 1000,
+            'mean_ms': self.total_seconds * 1000 / self.calls if self.calls else 0.0,
+            'max_ms': self.max_seconds * 1000,
+            'rows': self.rows,
+            'bytes_written': self.bytes_written,
+            'latency_histogram_ms': {
+                f'<={bound:g}': count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram)
+            },
+        }
+
+
+_stats: Dict[str, OperationStats] = {}
+
+
+def enable():
+    """Start recording statistics"""
+    _state.enabled = True
+
+
+def disable():
+    """Stop recording statistics (already recorded ones are kept)"""
+    _state.enabled = False
+
+
+def is_enabled() -> bool:
+    return _state.enabled
+
+
+def reset():
+    """Drop all recorded statistics"""
+    with _lock:
+        _stats.clear()
+
+
+def _operation(name: str) -> OperationStats:
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = OperationStats()
+    return stats
+
+
+def record_io(name: str, rows: int = 0, bytes_written: int = 0):
+    """Attribute rows touched and bytes written to an operation"""
+    if not _state.enabled:
+        return
+    with _lock:
+        stats = _operation(name)
+        stats.rows += rows
+        stats.bytes_written += bytes_written
+
+
+def instrumented(name: str, rows: Optional[Callable] = None):
+    """
+    Decorator recording call count and latency of a function under name
+
+    Args:
+        name (str): Operation name, e.g. 'service.add_expense'
+        rows (Callable, optional): Called with the return value to count rows touched
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                with _lock:
+                    stats = _operation(name)
+                    stats.add_call(elapsed, failed)
+                    if rows is not None and not failed:
+                        stats.rows += rows(result)
+        return wrapper
+    return decorator
+
+
+def get_stats() -> Dict[str, Dict]:
+    """Return a snapshot of all recorded statistics, keyed by operation name"""
+    with _lock:
+        return {name: _stats[name].to_dict() for name in sorted(_stats)}
+
+
+def dump_json(path: str) -> str:
+    """Write the recorded statistics to a JSON file and return its path"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'enabled': _state.enabled, 'operations': get_stats()}, f, indent=4)
+    return path
+
+
+class ProfileResult:
+    """What profile_operation collected for one block"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.peak_memory_bytes: Optional[int] = None
+        self.profile = None
+        self.top_allocations: List[str] = []
+
+    def profile_text(self, limit: int = 20, sort: str = 'cumulative') -> str:
+        """Format the cProfile statistics, most expensive first"""
+        if self.profile is None:
+            return ''
+        import pstats
+        
+        output = io.StringIO()
+        pstats.Stats(self.profile, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+@contextmanager
+def profile_operation(cpu: bool = True, memory: bool = True, top: int = 10):
+    """
+    Profile a single operation with cProfile and/or tracemalloc
+
+        with profile_operation() as result:
+            service.get_expenses_by_category()
+        print(result.profile_text())
+    """
+    # Profiling modules are only imported when a profile is actually taken
+    import cProfile
+    import tracemalloc
+    
+    result = ProfileResult()
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if memory:
+        tracemalloc.reset_peak()
+    if cpu:
+        result.profile = cProfile.Profile()
+        result.profile.enable()
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.seconds = time.perf_counter() - started
+        if cpu:
+            result.profile.disable()
+        if memory:
+            result.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot()
+            result.top_allocations = [str(stat) for stat in snapshot.statistics('lineno')[:top]]
+            if started_tracing:
+                tracemalloc.stop()
@@ -1,16 +1,21 @@
+import math
 from datetime import date
 from ..models.expense import ExpenseCategory
+from ..models.expense_store import MAX_CENTS
+
+# Amounts must stay below this to fit the store's 64-bit cents column
+MAX_AMOUNT = MAX_CENTS / 100
 
 class ExpenseValidator:
     @staticmethod
-    def validate_date(input_date: date) -> bool:
+    def validate_date(input_date: date, today: date = None) -> bool:
         """Validate that date is not in the future"""
-        return input_date <= date.today()
+        return input_date <= (today or date.today())
     
     @staticmethod
     def validate_amount(amount: float) -> bool:
-        """Validate that amount is positive"""
-        return amount > 0
+        """Validate that amount is positive, finite and small enough to store in cents"""
+        return amount > 0 and math.isfinite(amount) and amount < MAX_AMOUNT
     
     @staticmethod
     def validate_category(category: ExpenseCategory) -> bool:
@@ -1,58 +1,337 @@
-import PySimpleGUI as sg
+import os
 from datetime import datetime
 from ..services.expense_service import ExpenseService
 from ..models.expense import Expense, ExpenseCategory
+from ..models.recurring_expense import RecurringExpense
 from ..utils.validators import ExpenseValidator
 from ..utils.data_analysis import ExpenseAnalyzer
 from ..utils.data_export import DataExporter
+from ..utils.data_import import ExpenseImporter
+from ..utils import instrumentation
 
 class BudgetViewModel:
     def __init__(self, expense_service: ExpenseService):
         self.expense_service = expense_service
     
+    def snapshot(self):
+        """Return a view model over a read-only snapshot of the expenses, for background jobs"""
+        return BudgetViewModel(self.expense_service.snapshot())
+    
+    @staticmethod
+    def _parse_expense(date_str: str, category_str: str, amount_str: str, description: str):
+        """Convert and validate expense form input; raises ValueError"""
+        # Convert inputs
+        expense_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        category = ExpenseCategory(category_str)
+        amount = float(amount_str)
+        
+        # Validate inputs
+        if not ExpenseValidator.validate_date(expense_date):
+            raise ValueError("Date cannot be in the future")
+        if not ExpenseValidator.validate_amount(amount):
+            raise ValueError("Amount must be positive" if not amount > 0 else "Amount is too large")
+        
+        return Expense(
+            date=expense_date,
+            category=category,
+            amount=amount,
+            description=description
+        )
+    
     def add_expense(self, date_str: str, category_str: str, amount_str: str, description: str):
         """Add a new expense with validation"""
         try:
-            # Convert inputs
-            expense_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            category = ExpenseCategory(category_str)
-            amount = float(amount_str)
-            
-            # Validate inputs
-            if not ExpenseValidator.validate_date(expense_date):
-                raise ValueError("Date cannot be in the future")
-            if not ExpenseValidator.validate_amount(amount):
-                raise ValueError("Amount must be positive")
-            
             # Create and add expense
-            expense = Expense(
-                date=expense_date,
-                category=category,
-                amount=amount,
-                description=description
-            )
+            expense = self._parse_expense(date_str, category_str, amount_str, description)
             self.expense_service.add_expense(expense)
-            return True, "Expense added successfully"
+            return True, f"Expense added successfully (id {expense.id})"
         
         except ValueError as e:
             return False, str(e)
     
-    def get_expenses_summary(self):
-        """Generate expenses summary"""
-        total_expenses = self.expense_service.get_total_expenses()
-        category_totals = self.expense_service.get_expenses_by_category()
+    def update_expense(self, expense_id: str, date_str: str, category_str: str,
+                       amount_str: str, description: str):
+        """Replace an existing expense with validated new values"""
+        try:
+            expense = self._parse_expense(date_str, category_str, amount_str, description)
+            expense.id = expense_id
+            self.expense_service.update_expense(expense)
+            return True, "Expense updated successfully"
+        except ValueError as e:
+            return False, str(e)
+    
+    def delete_expense(self, expense_id: str):
+        """Delete an expense by id"""
+        try:
+            self.expense_service.delete_expense(expense_id)
+            return True, "Expense deleted successfully"
+        except ValueError as e:
+            return False, str(e)
+    
+    def import_expenses(self, filepath: str):
+        """Import expenses from a CSV or JSON file in one batch"""
+        try:
+            if filepath.lower().endswith('.json'):
+                result = ExpenseImporter.import_json(filepath)
+            else:
+                result = ExpenseImporter.import_csv(filepath)
+        except (OSError, ValueError) as e:
+            return False, f"Import failed: {e}"
+        
+        try:
+            self.expense_service.add_expenses(result.expenses)
+        except (OSError, ValueError, TypeError) as e:
+            return False, f"Import failed: {e}"
+        
+        message = f"Imported {len(result.expenses)} expenses"
+        if result.errors:
+            message += f", skipped {len(result.errors)} invalid rows:\n"
+            message += "\n".join(f"Row {row}: {error}" for row, error in result.errors[:20])
+            if len(result.errors) > 20:
+                message += f"\n... and {len(result.errors) - 20} more"
+        return True, message
+    
+    @staticmethod
+    def _parse_window(start_str: str = '', end_str: str = ''):
+        """Parse optional YYYY-MM-DD window bounds; empty strings mean unbounded"""
+        start = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else None
+        end = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else None
+        return start, end
+    
+    def get_expense_totals(self, start_str: str = '', end_str: str = ''):
+        """Return expenses by category, optionally for a date window"""
+        start, end = self._parse_window(start_str, end_str)
+        return self.expense_service.get_expenses_by_category_between(start, end)
+    
+    def get_expenses_summary(self, start_str: str = '', end_str: str = ''):
+        """Generate expenses summary, optionally for a date window"""
+        start, end = self._parse_window(start_str, end_str)
+        category_totals = self.expense_service.get_expenses_by_category_between(start, end)
+        total_expenses = sum(category_totals.values())
         
         summary = "Expenses Summary:\n"
+        if start or end:
+            summary = f"Expenses Summary ({start_str or '...'} to {end_str or '...'}):\n"
         for category, total in category_totals.items():
             summary += f"{category.value}: ${total:.2f}\n"
         summary += f"\nTotal Expenses: ${total_expenses:.2f}"
         
         return summary
     
-    def generate_expense_chart(self):
-        """Generate expense category pie chart"""
-        category_totals = self.expense_service.get_expenses_by_category()
-        ExpenseAnalyzer.generate_category_pie_chart(category_totals)
+    def get_expense_page(self, page: int = 0, page_size: int = 50, sort: str = 'date',
+                         descending: bool = False, category_str: str = '', start_str: str = '',
+                         end_str: str = '', min_str: str = '', max_str: str = ''):
+        """
+        Fetch one page of the expense table, sorted by 'date', 'category' or 'amount' and filtered
+        
+        Returns:
+            Tuple[List[List[str]], int, str]: The page's rows (date, category,
+            amount, description, id), the number of pages and a status message
+        """
+        start, end = self._parse_window(start_str, end_str)
+        category = ExpenseCategory(category_str) if category_str else None
+        min_amount = float(min_str) if min_str else None
+        max_amount = float(max_str) if max_str else None
+        total, expenses = self.expense_service.page_expenses(
+            page * page_size, page_size, sort, descending, category, start, end, min_amount, max_amount
+        )
+        pages = max(1, -(-total // page_size))
+        rows = [
+            [expense.date.isoformat(), expense.category.value, f'{expense.amount:.2f}',
+             expense.description, expense.id]
+            for expense in expenses
+        ]
+        return rows, pages, f"{total} expenses, page {page + 1} of {pages}"
+    
+    def _search(self, query: str, category_str: str, start_str: str, end_str: str, limit: int = None):
+        start, end = self._parse_window(start_str, end_str)
+        category = ExpenseCategory(category_str) if category_str else None
+        return self.expense_service.search(query, category, start, end, limit)
+    
+    def search_expenses(self, query: str, category_str: str = '', start_str: str = '',
+                        end_str: str = '', limit: int = 200):
+        """
+        Search expense descriptions, optionally within a category and date window
+        
+        Returns:
+            Tuple[List[List[str]], str]: Up to limit result rows (date, category,
+            amount, description, id) and a message describing the result count
+        """
+        results = self._search(query, category_str, start_str, end_str, limit + 1)
+        rows = [
+            [expense.date.isoformat(), expense.category.value, f'{expense.amount:.2f}',
+             expense.description, expense.id]
+            for expense in results[:limit]
+        ]
+        if len(results) > limit:
+            return rows, f"Found more than {limit} matching expenses, showing the first {limit}"
+        return rows, f"Found {len(rows)} matching expenses"
+    
+    def export_search_results(self, query: str, category_str: str = '', start_str: str = '',
+                              end_str: str = '', filename: str = 'reports/search_results.csv'):
+        """Export every expense matching a search to CSV at exactly the path filename"""
+        results = self._search(query, category_str, start_str, end_str)
+        directory, name = os.path.split(filename)
+        path = DataExporter.export_expenses_stream(results, name, directory=directory or '.')
+        return f"Exported {len(results)} matching expenses to {path}"
+    
+    def set_budget_limits(self, limit_strs: dict, period: str = None):
+        """
+        Set all budget limits from user input in one transaction
+        
+        Args:
+            limit_strs (dict): Category value -> limit text; empty text means no limit
+            period (str, optional): Budget period ('all', 'monthly' or 'weekly')
+        
+        Returns:
+            Tuple[bool, str]: Success flag and budget status or error message
+        """
+        limits = {}
+        for category in ExpenseCategory:
+            limit_str = limit_strs.get(category.value, '')
+            try:
+                limits[category] = float(limit_str) if limit_str else 0.0
+            except ValueError:
+                return False, f'Invalid limit for {category.value}'
+        try:
+            self.expense_service.set_budget_limits(limits, period)
+        except ValueError as e:
+            return False, str(e)
+        return True, self.get_budget_status()
+    
+    def set_budget_period(self, period: str):
+        """Set the budget period ('all', 'monthly' or 'weekly')"""
+        self.expense_service.set_budget_period(period)
+    
+    def add_recurring_expense(self, category_str: str, amount_str: str, start_str: str,
+                              description: str = '', frequency: str = 'monthly',
+                              day_str: str = '', end_str: str = ''):
+        """
+        Add a recurring expense rule from user input
+        
+        Args:
+            category_str (str): Category value
+            amount_str (str): Amount of each occurrence
+            start_str (str): First date (YYYY-MM-DD) the rule applies from
+            description (str, optional): Description of each occurrence
+            frequency (str, optional): 'monthly' or 'weekly'
+            day_str (str, optional): Day of the month for monthly rules. Empty for the start day
+            end_str (str, optional): Last date (YYYY-MM-DD) of the rule. Empty for no end
+        
+        Returns:
+            Tuple[bool, str]: Success flag and message with the rule id, or error message
+        """
+        try:
+            start, end = self._parse_window(start_str, end_str)
+            if start is None:
+                raise ValueError("Start date is required")
+            rule = RecurringExpense(
+                category=ExpenseCategory(category_str),
+                amount=float(amount_str),
+                start=start,
+                description=description,
+                frequency=frequency,
+                day=int(day_str) if day_str else None,
+                end=end
+            )
+        except ValueError as e:
+            return False, str(e)
+        self.expense_service.add_recurring_expense(rule)
+        return True, f"Recurring expense added successfully (id {rule.id})"
+    
+    def remove_recurring_expense(self, rule_id: str):
+        """Remove a recurring expense rule by id"""
+        try:
+            self.expense_service.remove_recurring_expense(rule_id)
+            return True, "Recurring expense removed successfully"
+        except ValueError as e:
+            return False, str(e)
+    
+    def get_recurring_expenses(self):
+        """Return the recurring expense rules"""
+        return list(self.expense_service.recurring_expenses)
+    
+    def describe_recurring_expenses(self):
+        """Describe the recurring expense rules, one per line"""
+        rules = self.expense_service.recurring_expenses
+        if not rules:
+            return "No recurring expenses.\n"
+        output = "Recurring Expenses:\n"
+        for rule in rules:
+            schedule = f"monthly on day {rule.day}" if rule.frequency == 'monthly' else "weekly"
+            until = f" until {rule.end.isoformat()}" if rule.end else ""
+            output += (
+                f"{rule.id}  {rule.category.value}: ${rule.amount:.2f} {schedule} "
+                f"from {rule.start.isoformat()}{until}"
+                f"{' - ' + rule.description if rule.description else ''}\n"
+            )
+        return output
+    
+    def subscribe_alerts(self, callback):
+        """Call callback(alert) whenever an expense change crosses a budget alert threshold"""
+        return self.expense_service.alerts.subscribe(callback)
+    
+    def get_budget_status(self):
+        """Describe budget status for the current budget period"""
+        period = self.expense_service.current_period()
+        budget_status = self.expense_service.check_budget_limits()
+        output = f"Budget Limit Status ({period}):\n" if period else "Budget Limit Status:\n"
+        for category, exceeded in budget_status.items():
+            output += f"{category.value}: {'Exceeded' if exceeded else 'OK'}\n"
+        return output
+    
+    def get_budget_history(self, count: int = 24):
+        """Describe budget adherence over the last count periods"""
+        history = self.expense_service.get_budget_history(count)
+        output = "Budget History:\n"
+        for period, status in history:
+            exceeded = [category.value for category, over in status.items() if over]
+            output += f"{period}: {'Exceeded ' + ', '.join(exceeded) if exceeded else 'OK'}\n"
+        return output
+    
+    def generate_expense_chart(self, category_totals: dict = None):
+        """
+        Generate expense category pie chart and return its path
+        
+        Background jobs pass totals read on the event loop thread
+        (get_expense_totals()) so they don't touch the service.
+        """
+        if category_totals is None:
+            category_totals = self.expense_service.get_expenses_by_category()
+        return ExpenseAnalyzer.generate_category_pie_chart(category_totals)
+    
+    def generate_monthly_chart(self, start_str: str = '', end_str: str = ''):
+        """Generate the monthly stacked bar chart and return its path"""
+        start, end = self._parse_window(start_str, end_str)
+        months, series = self.expense_service.get_analytics(start, end).category_by_month()
+        return ExpenseAnalyzer.generate_monthly_stacked_bar_chart(months, series)
+    
+    def generate_trend_chart(self, start_str: str = '', end_str: str = '', window: int = 30):
+        """Generate the rolling average trend chart and return its path"""
+        start, end = self._parse_window(start_str, end_str)
+        averages = self.expense_service.get_analytics(start, end).rolling_average(window)
+        return ExpenseAnalyzer.generate_trend_chart(averages, window=window)
+    
+    def get_analytics_summary(self, start_str: str = '', end_str: str = '', top: int = 5):
+        """Describe monthly totals, amount percentiles per category and the largest expenses"""
+        start, end = self._parse_window(start_str, end_str)
+        analytics = self.expense_service.get_analytics(start, end)
+        
+        output = "Monthly Totals:\n"
+        for month, total in analytics.totals_by_month().items():
+            output += f"{month}: ${total:.2f}\n"
+        
+        output += "\nAmount Percentiles (median / 90th / 99th):\n"
+        for category, values in analytics.percentiles((50, 90, 99)).items():
+            output += f"{category.value}: ${values[50]:.2f} / ${values[90]:.2f} / ${values[99]:.2f}\n"
+        
+        output += f"\nTop {top} Expenses:\n"
+        for expense in analytics.top_expenses(top):
+            output += (
+                f"{expense.date.isoformat()} {expense.category.value}: "
+                f"${expense.amount:.2f} {expense.description}\n"
+            )
+        return output
     
     def reset_expenses(self):
         """Reset all expenses"""
@@ -64,21 +343,35 @@ class BudgetViewModel:
         self.expense_service.reset_budget_limits()
         return "All budget limits have been reset to zero."
     
-    def generate_comprehensive_report(self):
+    def generate_comprehensive_report(self, start_str: str = '', end_str: str = '', 
+                                      progress=None, cancel_event=None, directory: str = 'reports'):
         """
         Generate comprehensive report with CSV exports and chart
         
+        Args:
+            start_str (str, optional): First date (YYYY-MM-DD) to include. Empty for no bound
+            end_str (str, optional): Last date (YYYY-MM-DD) to include. Empty for no bound
+            progress (Callable[[str], None], optional): Called as each report file is written
+            cancel_event (threading.Event, optional): Abort the report once set
+            directory (str, optional): Output directory for the report files. Defaults to 'reports'
+        
         Returns:
-            Dict[str, str]: Paths to generated report files
+            str: Message listing the generated report files
         """
-        # Get current expenses and budget
-        expenses = self.expense_service.expenses
+        start, end = self._parse_window(start_str, end_str)
+        
+        # Get current expenses, including recurring occurrences, and budget
+        expenses = self.expense_service.export_source(start, end)
         budget = self.expense_service.budget
         
         # Generate report
         report_files = DataExporter.generate_comprehensive_report(
             expenses, 
-            budget
+            budget,
+            self.expense_service.get_expenses_by_category_between(start, end),
+            progress=progress,
+            cancel_event=cancel_event,
+            directory=directory
         )
         
         # Prepare report message
@@ -87,4 +380,28 @@ class BudgetViewModel:
         report_message += f"Budget CSV: {report_files['budget_csv']}\n"
         report_message += f"Expense Chart: {report_files['chart_path']}"
         
-        return report_message
\ No newline at end of file
+        return report_message
+    
+    def export_expense_dataset(self, fmt: str = 'auto', start_str: str = '', end_str: str = '',
+                               row_group_size: int = 10000, cancel_event=None,
+                               directory: str = 'reports'):
+        """Export expenses as a month-partitioned Parquet, Feather or NDJSON dataset under directory"""
+        start, end = self._parse_window(start_str, end_str)
+        path = DataExporter.export_expenses_columnar(
+            self.expense_service.export_source(start, end),
+            fmt=fmt,
+            row_group_size=row_group_size,
+            cancel_event=cancel_event,
+            directory=directory
+        )
+        return f"Exported expenses dataset to {path}"
+    
+    def get_performance_stats(self):
+        """Return recorded call counts, latencies, rows and bytes per operation"""
+        return instrumentation.get_stats()
+    
+    def dump_performance_stats(self, path: str = 'reports/perf_stats.json'):
+        """Write recorded performance statistics to a JSON file"""
+        if not instrumentation.is_enabled():
+            return "Instrumentation is disabled; start with --instrument to record statistics."
+        return f"Performance statistics written to {instrumentation.dump_json(path)}"
\ No newline at end of file
@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+# Window events posted by BackgroundJobRunner
+JOB_PROGRESS_EVENT = '-JOB-PROGRESS-'
+JOB_DONE_EVENT = '-JOB-DONE-'
+
+
+class BackgroundJob:
+    """Handle passed to a running job for progress reports and cancellation checks"""
+
+    def __init__(self, name: str, window):
+        self.name = name
+        self.window = window
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def report(self, message: str):
+        """Post a progress message back to the window"""
+        self.window.write_event_value(JOB_PROGRESS_EVENT, (self.name, message))
+
+
+class BackgroundJobRunner:
+    """
+    Runs slow work (reports, charts) on a worker pool so the event loop stays responsive.
+
+    Progress and completion are delivered to the window as JOB_PROGRESS_EVENT
+    and JOB_DONE_EVENT events whose value is (job name, message) and
+    (job name, result, error) respectively. The service isn't thread-safe,
+    so jobs should read only values taken on the event loop thread (such as
+    category totals) or a BudgetViewModel.snapshot(), never the live view model.
+    """
+
+    def __init__(self, window, max_workers: int = 2):
+        self.window = window
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='budget-job')
+        self.jobs: Dict[str, BackgroundJob] = {}
+
+    def submit(self, name: str, func: Callable[[BackgroundJob], object]) -> BackgroundJob:
+        """Start func(job) in the background; a job with the same name must not be running"""
+        if self.is_running(name):
+            raise ValueError(f'{name} is already running')
+        job = BackgroundJob(name, self.window)
+        job.future = self.executor.submit(self._run, job, func)
+        self.jobs[name] = job
+        return job
+
+    def _run(self, job: BackgroundJob, func: Callable[[BackgroundJob], object]):
+        try:
+            result = func(job)
+        except Exception as e:
+            self.window.write_event_value(JOB_DONE_EVENT, (job.name, None, e))
+        else:
+            self.window.write_event_value(JOB_DONE_EVENT, (job.name, result, None))
+
+    def is_running(self, name: str) -> bool:
+        job = self.jobs.get(name)
+        return job is not None and not job.future.done()
+
+    def finished(self, name: str):
+        """Forget a job once its completion event has been handled"""
+        self.jobs.pop(name, None)
+
+    def cancel_all(self) -> int:
+        """Ask every pending or running job to stop; returns how many were signalled"""
+        count = 0
+        for job in self.jobs.values():
+            if not job.future.done():
+                job.cancel_event.set()
+                job.future.cancel()
+                count += 1
+        return count
+
+    def shutdown(self):
+        """Cancel outstanding jobs and stop the worker pool"""
+        self.cancel_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
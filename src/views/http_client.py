@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+
+class HTTPClient:
+    """
+    Minimal HTTP/1.1 keep-alive JSON client for BudgetHTTPServer.
+
+    Used by the tests and the HTTP load benchmark. The connection is opened
+    on the first request and reused until close().
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, payload=None):
+        """Send a request with an optional JSON body and return (status, decoded JSON body)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b''
+        self.writer.write(
+            f'{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body
+        )
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        """Close the connection; the next request opens a new one"""
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.writer = None
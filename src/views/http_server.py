@@ -0,0 +1,353 @@
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from ..models.expense import ExpenseCategory
+from ..services.user_service_cache import UserServiceCache
+from ..viewmodels.budget_viewmodel import BudgetViewModel
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1 << 20
+
+REASONS = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+
+class HTTPError(Exception):
+    """Raised by handlers to answer with an error status and message"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class BudgetHTTPServer:
+    """
+    Headless asyncio HTTP/JSON front end serving many users.
+
+    Each route maps to a BudgetViewModel operation on the user's own
+    ExpenseService, held warm in a UserServiceCache. The event loop only
+    parses requests and writes responses: service calls, which may load or
+    flush the user's files, run on the io executor, and reports and
+    dataset exports, which render charts or write many files, on a
+    separate, smaller chart executor so they can't starve ordinary
+    requests. Idle users are evicted (and flushed)
+    periodically.
+
+    Routes, with user data under /users/<user id>:
+        GET    /health
+        POST   /users/<id>/expenses           {"date", "category", "amount", "description"}
+        GET    /users/<id>/expenses           ?page&page_size&sort&desc&category&from&to&min&max
+        PUT    /users/<id>/expenses/<expense> {"date", "category", "amount", "description"}
+        DELETE /users/<id>/expenses/<expense>
+        GET    /users/<id>/summary            ?from&to
+        GET    /users/<id>/budget
+        PUT    /users/<id>/budget             {"limits": {category: amount}, "period"}
+        GET    /users/<id>/budget/history     ?count
+        GET    /users/<id>/recurring
+        POST   /users/<id>/recurring          {"category", "amount", "start", "description",
+                                               "frequency", "day", "end"}
+        DELETE /users/<id>/recurring/<rule>
+        POST   /users/<id>/reports            {"from", "to"}
+        POST   /users/<id>/datasets           {"format", "from", "to"}
+    """
+
+    def __init__(self, cache: UserServiceCache, host: str = '127.0.0.1', port: int = 8080,
+                 io_workers: int = 16, chart_workers: int = 2,
+                 reports_dir: str = 'reports/users', evict_interval: float = 30.0):
+        self.cache = cache
+        self.host = host
+        self.port = port
+        self.reports_dir = reports_dir
+        self.evict_interval = evict_interval
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='budget-io')
+        self.chart_executor = ThreadPoolExecutor(max_workers=chart_workers, thread_name_prefix='budget-chart')
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._evictor: Optional[asyncio.Task] = None
+        self._routes: List[Tuple[str, re.Pattern, Callable[..., Awaitable]]] = [
+            ('GET', re.compile(r'/health'), self._health),
+            ('POST', re.compile(r'/users/([^/]+)/expenses'), self._add_expense),
+            ('GET', re.compile(r'/users/([^/]+)/expenses'), self._list_expenses),
+            ('PUT', re.compile(r'/users/([^/]+)/expenses/([^/]+)'), self._update_expense),
+            ('DELETE', re.compile(r'/users/([^/]+)/expenses/([^/]+)'), self._delete_expense),
+            ('GET', re.compile(r'/users/([^/]+)/summary'), self._summary),
+            ('GET', re.compile(r'/users/([^/]+)/budget'), self._get_budget),
+            ('PUT', re.compile(r'/users/([^/]+)/budget'), self._set_budget),
+            ('GET', re.compile(r'/users/([^/]+)/budget/history'), self._budget_history),
+            ('GET', re.compile(r'/users/([^/]+)/recurring'), self._list_recurring),
+            ('POST', re.compile(r'/users/([^/]+)/recurring'), self._add_recurring),
+            ('DELETE', re.compile(r'/users/([^/]+)/recurring/([^/]+)'), self._remove_recurring),
+            ('POST', re.compile(r'/users/([^/]+)/reports'), self._report),
+            ('POST', re.compile(r'/users/([^/]+)/datasets'), self._dataset),
+        ]
+
+    async def start(self) -> int:
+        """Start listening and return the bound port (useful with port=0)"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._evictor = asyncio.get_running_loop().create_task(self._evict_idle_users())
+        return self.port
+
+    async def serve_forever(self):
+        """Start (if needed) and serve until cancelled, then shut down cleanly"""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stop accepting requests, then flush and close every cached service"""
+        if self._evictor is not None:
+            self._evictor.cancel()
+            self._evictor = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.io_executor, self.cache.close_all)
+        self.io_executor.shutdown(wait=True)
+        self.chart_executor.shutdown(wait=True)
+
+    async def _evict_idle_users(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.evict_interval)
+            await loop.run_in_executor(self.io_executor, self.cache.evict_idle)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection, keeping it open between HTTP/1.1 requests"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Malformed request line'}, False)
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (
+                    version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                )
+                length = headers.get('content-length') or '0'
+                if not length.isdigit():
+                    await self._respond(writer, 400, {'error': 'Invalid Content-Length'}, False)
+                    break
+                length = int(length)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': 'Request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self._dispatch(method, target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool):
+        data = json.dumps(payload).encode('utf-8')
+        head = (
+            f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(data)}\r\n'
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict]:
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        path_matched = False
+        try:
+            for route_method, pattern, handler in self._routes:
+                match = pattern.fullmatch(url.path)
+                if match is None:
+                    continue
+                path_matched = True
+                if route_method == method:
+                    data = json.loads(body) if body else {}
+                    if not isinstance(data, dict):
+                        raise HTTPError(400, 'Request body must be a JSON object')
+                    return await handler(*match.groups(), query=query, data=data)
+            if path_matched:
+                raise HTTPError(405, f'{method} is not allowed on {url.path}')
+            raise HTTPError(404, f'No route for {url.path}')
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        except (ValueError, KeyError) as e:
+            # Bad JSON, missing fields, unknown categories, invalid user ids
+            return 400, {'error': str(e) if isinstance(e, ValueError) else f'Missing field {e}'}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+
+    async def _call(self, user_id: str, operation: Callable[[BudgetViewModel], object],
+                    executor: ThreadPoolExecutor = None):
+        """Run operation(view_model) for a user on an executor thread"""
+        def run():
+            with self.cache.session(user_id) as service:
+                return operation(BudgetViewModel(service))
+        return await asyncio.get_running_loop().run_in_executor(executor or self.io_executor, run)
+
+    @staticmethod
+    def _result(success: bool, message: str, status: int = 200) -> Tuple[int, Dict]:
+        if not success:
+            raise HTTPError(400, message)
+        return status, {'message': message}
+
+    async def _health(self, query: Dict, data: Dict):
+        return 200, {'status': 'ok', 'cache': self.cache.stats()}
+
+    async def _add_expense(self, user_id: str, query: Dict, data: Dict):
+        success, message = await self._call(user_id, lambda view_model: view_model.add_expense(
+            str(data['date']), str(data['category']), str(data['amount']), str(data.get('description', ''))
+        ))
+        return self._result(success, message, 201)
+
+    async def _update_expense(self, user_id: str, expense_id: str, query: Dict, data: Dict):
+        success, message = await self._call(user_id, lambda view_model: view_model.update_expense(
+            expense_id, str(data['date']), str(data['category']), str(data['amount']),
+            str(data.get('description', ''))
+        ))
+        if not success and message.startswith('No expense with id'):
+            raise HTTPError(404, message)
+        return self._result(success, message)
+
+    async def _delete_expense(self, user_id: str, expense_id: str, query: Dict, data: Dict):
+        success, message = await self._call(
+            user_id, lambda view_model: view_model.delete_expense(expense_id)
+        )
+        if not success:
+            raise HTTPError(404, message)
+        return self._result(success, message)
+
+    async def _list_expenses(self, user_id: str, query: Dict, data: Dict):
+        page = int(query.get('page', 1)) - 1
+        page_size = min(int(query.get('page_size', 50)), 1000)
+        if page < 0 or page_size < 1:
+            raise HTTPError(400, 'page and page_size must be positive')
+        rows, pages, message = await self._call(user_id, partial(
+            BudgetViewModel.get_expense_page, page=page, page_size=page_size,
+            sort=query.get('sort', 'date'), descending=query.get('desc', '') in ('1', 'true'),
+            category_str=query.get('category', ''), start_str=query.get('from', ''),
+            end_str=query.get('to', ''), min_str=query.get('min', ''), max_str=query.get('max', '')
+        ))
+        fields = ('date', 'category', 'amount', 'description', 'id')
+        return 200, {
+            'expenses': [dict(zip(fields, row)) for row in rows],
+            'pages': pages,
+            'message': message,
+        }
+
+    async def _summary(self, user_id: str, query: Dict, data: Dict):
+        start_str, end_str = query.get('from', ''), query.get('to', '')
+
+        def summarize(view_model: BudgetViewModel):
+            totals = view_model.get_expense_totals(start_str, end_str)
+            return totals, view_model.get_expenses_summary(start_str, end_str)
+
+        totals, message = await self._call(user_id, summarize)
+        return 200, {
+            'totals': {category.value: total for category, total in totals.items()},
+            'total': sum(totals.values()),
+            'message': message,
+        }
+
+    async def _get_budget(self, user_id: str, query: Dict, data: Dict):
+        def describe(view_model: BudgetViewModel):
+            service = view_model.expense_service
+            return {
+                'period': service.budget.period,
+                'limits': {
+                    category.value: service.budget.get_limit(category) for category in ExpenseCategory
+                },
+                'exceeded': {
+                    category.value: exceeded
+                    for category, exceeded in service.check_budget_limits().items()
+                },
+                'message': view_model.get_budget_status(),
+            }
+        return 200, await self._call(user_id, describe)
+
+    async def _set_budget(self, user_id: str, query: Dict, data: Dict):
+        limits = data.get('limits', {})
+        if not isinstance(limits, dict):
+            raise HTTPError(400, "'limits' must map categories to amounts")
+        for category in limits:
+            ExpenseCategory(category)
+        limit_strs = {category: str(limit) for category, limit in limits.items()}
+        success, message = await self._call(
+            user_id, lambda view_model: view_model.set_budget_limits(limit_strs, data.get('period'))
+        )
+        return self._result(success, message)
+
+    async def _budget_history(self, user_id: str, query: Dict, data: Dict):
+        count = int(query.get('count', 24))
+        message = await self._call(user_id, lambda view_model: view_model.get_budget_history(count))
+        return 200, {'message': message}
+
+    async def _list_recurring(self, user_id: str, query: Dict, data: Dict):
+        rules = await self._call(user_id, BudgetViewModel.get_recurring_expenses)
+        return 200, {'recurring': [rule.to_dict() for rule in rules]}
+
+    async def _add_recurring(self, user_id: str, query: Dict, data: Dict):
+        success, message = await self._call(user_id, lambda view_model: view_model.add_recurring_expense(
+            str(data['category']), str(data['amount']), str(data['start']),
+            str(data.get('description', '')), str(data.get('frequency', 'monthly')),
+            str(data.get('day') or ''), str(data.get('end') or '')
+        ))
+        return self._result(success, message, 201)
+
+    async def _remove_recurring(self, user_id: str, rule_id: str, query: Dict, data: Dict):
+        success, message = await self._call(
+            user_id, lambda view_model: view_model.remove_recurring_expense(rule_id)
+        )
+        if not success:
+            raise HTTPError(404, message)
+        return self._result(success, message)
+
+    async def _report(self, user_id: str, query: Dict, data: Dict):
+        # Each user's files go to their own directory, so concurrent reports don't clash
+        directory = os.path.join(self.reports_dir, user_id)
+        message = await self._call(
+            user_id,
+            lambda view_model: view_model.generate_comprehensive_report(
+                str(data.get('from', '')), str(data.get('to', '')), directory=directory
+            ),
+            self.chart_executor
+        )
+        return 201, {'message': message}
+
+    async def _dataset(self, user_id: str, query: Dict, data: Dict):
+        # Like reports, exports are slow and go to the user's own directory
+        directory = os.path.join(self.reports_dir, user_id)
+        message = await self._call(
+            user_id,
+            lambda view_model: view_model.export_expense_dataset(
+                str(data.get('format', 'auto')), str(data.get('from', '')), str(data.get('to', '')),
+                directory=directory
+            ),
+            self.chart_executor
+        )
+        return 201, {'message': message}
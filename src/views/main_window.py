@@ -2,6 +2,11 @@ import PySimpleGUI as sg
 from datetime import date
 from ..models.expense import ExpenseCategory
 from ..viewmodels.budget_viewmodel import BudgetViewModel
+from ..utils.data_export import ExportCancelled
+from .background_jobs import BackgroundJobRunner, JOB_PROGRESS_EVENT, JOB_DONE_EVENT
+
+# Window event posted for every budget alert, from whichever thread added the expense
+BUDGET_ALERT_EVENT = '-BUDGET-ALERT-'
 
 class MainWindow:
     def __init__(self, view_model: BudgetViewModel):
@@ -34,7 +39,27 @@ class MainWindow:
                 sg.Text('Description:'), 
                 sg.InputText(key='-DESCRIPTION-', size=(20,1))
             ],
-            [sg.Button('Add Expense'), sg.Button('View Expenses')],
+            [sg.Button('Add Expense'), sg.Button('View Expenses'), sg.Button('Browse Expenses')],
+            [
+                sg.Text('From:'), 
+                sg.InputText(key='-FROM-', size=(10,1)), 
+                sg.Text('To:'), 
+                sg.InputText(key='-TO-', size=(10,1)), 
+                sg.Button('Month to Date')
+            ],
+            [
+                sg.Text('Import File:'), 
+                sg.InputText(key='-IMPORT-FILE-', size=(20,1)), 
+                sg.FileBrowse(file_types=(('CSV Files', '*.csv'), ('JSON Files', '*.json'))), 
+                sg.Button('Import Expenses')
+            ],
+            [
+                sg.Text('Search:'), 
+                sg.InputText(key='-SEARCH-', size=(20,1)), 
+                sg.Combo([''] + categories, key='-SEARCH-CATEGORY-', size=(15,1), readonly=True), 
+                sg.Button('Search'), 
+                sg.Button('Export Results')
+            ],
             
             # Budget Limits Section
             [sg.Text('Set Budget Limits')],
@@ -45,7 +70,13 @@ class MainWindow:
                 ] 
                 for category in categories
             ],
-            [sg.Button('Set Budget Limits')],
+            [
+                sg.Text('Budget Period:'), 
+                sg.Combo(['all', 'monthly', 'weekly'], key='-BUDGET-PERIOD-', 
+                         default_value=self.view_model.expense_service.budget.period, 
+                         readonly=True, size=(10,1))
+            ],
+            [sg.Button('Set Budget Limits'), sg.Button('Budget History'), sg.Button('Recurring Expenses')],
             
             # Reset Buttons
             [
@@ -56,7 +87,13 @@ class MainWindow:
             # Export and Analysis Section
             [
                 sg.Button('Generate Pie Chart'),
-                sg.Button('Generate Report', button_color=('white', 'green'))
+                sg.Button('Monthly Chart'),
+                sg.Button('Trend Chart'),
+                sg.Button('Analytics'),
+                sg.Button('Generate Report', button_color=('white', 'green')),
+                sg.Button('Export Dataset'),
+                sg.Button('Cancel Jobs'),
+                sg.Button('Dump Stats')
             ],
             
             # Status Area
@@ -65,9 +102,183 @@ class MainWindow:
         
         return layout
     
+    @staticmethod
+    def _show_search_results(rows, message):
+        """Show search results in a table window"""
+        layout = [
+            [sg.Text(message)],
+            [sg.Table(
+                values=rows, 
+                headings=['Date', 'Category', 'Amount', 'Description', 'Id'], 
+                col_widths=[10, 14, 9, 30, 32], 
+                auto_size_columns=False, 
+                justification='left', 
+                num_rows=min(max(len(rows), 5), 25)
+            )],
+            [sg.Button('Close')]
+        ]
+        window = sg.Window('Search Results', layout, modal=True)
+        window.read()
+        window.close()
+    
+    def _show_expense_table(self, start_str: str = '', end_str: str = '', page_size: int = 25):
+        """Browse expenses one page at a time; click the Date, Category or Amount heading to sort"""
+        categories = [category.value for category in ExpenseCategory]
+        sortable = {0: 'date', 1: 'category', 2: 'amount'}
+        layout = [
+            [
+                sg.Text('Category:'), 
+                sg.Combo([''] + categories, key='-TABLE-CATEGORY-', size=(15,1), readonly=True), 
+                sg.Text('From:'), 
+                sg.InputText(start_str, key='-TABLE-FROM-', size=(10,1)), 
+                sg.Text('To:'), 
+                sg.InputText(end_str, key='-TABLE-TO-', size=(10,1)), 
+                sg.Text('Amount:'), 
+                sg.InputText(key='-TABLE-MIN-', size=(8,1)), 
+                sg.Text('-'), 
+                sg.InputText(key='-TABLE-MAX-', size=(8,1)), 
+                sg.Button('Apply')
+            ],
+            [sg.Table(
+                values=[], 
+                headings=['Date', 'Category', 'Amount', 'Description', 'Id'], 
+                col_widths=[10, 14, 9, 30, 32], 
+                auto_size_columns=False, 
+                justification='left', 
+                num_rows=page_size, 
+                key='-TABLE-', 
+                enable_click_events=True
+            )],
+            [
+                sg.Button('Previous'), 
+                sg.Text('', key='-TABLE-STATUS-', size=(40,1)), 
+                sg.Button('Next'), 
+                sg.Button('Close')
+            ]
+        ]
+        window = sg.Window('Expenses', layout, modal=True, finalize=True)
+        page, pages, sort, descending = 0, 1, 'date', False
+        filters = ['', start_str, end_str, '', '']
+        
+        while True:
+            # Only the visible page is ever fetched from the service
+            try:
+                rows, pages, message = self.view_model.get_expense_page(
+                    page, page_size, sort, descending, *filters
+                )
+                window['-TABLE-'].update(values=rows)
+            except ValueError as e:
+                message = f'Error: {e}'
+            window['-TABLE-STATUS-'].update(message)
+            
+            event, values = window.read()
+            if event in (sg.WINDOW_CLOSED, 'Close'):
+                break
+            if event == 'Previous':
+                page = max(page - 1, 0)
+            elif event == 'Next':
+                page = min(page + 1, pages - 1)
+            elif event == 'Apply':
+                filters = [
+                    values['-TABLE-CATEGORY-'], 
+                    values['-TABLE-FROM-'], 
+                    values['-TABLE-TO-'], 
+                    values['-TABLE-MIN-'], 
+                    values['-TABLE-MAX-']
+                ]
+                page = 0
+            elif isinstance(event, tuple) and event[:2] == ('-TABLE-', '+CLICKED+'):
+                row, column = event[2]
+                # Row -1 is the heading; clicking the current sort column flips the direction
+                if row == -1 and column in sortable:
+                    descending = sortable[column] == sort and not descending
+                    sort = sortable[column]
+                    page = 0
+        window.close()
+    
+    def _show_recurring_expenses(self):
+        """List, add and remove recurring expenses such as rent or subscriptions"""
+        categories = [category.value for category in ExpenseCategory]
+        layout = [
+            [sg.Table(
+                values=[], 
+                headings=['Category', 'Amount', 'Schedule', 'From', 'To', 'Description', 'Id'], 
+                col_widths=[14, 9, 12, 10, 10, 20, 32], 
+                auto_size_columns=False, 
+                justification='left', 
+                num_rows=8, 
+                key='-RECURRING-', 
+                select_mode=sg.TABLE_SELECT_MODE_BROWSE
+            )],
+            [
+                sg.Combo(categories, key='-RECURRING-CATEGORY-', size=(15,1), readonly=True), 
+                sg.Text('Amount:'), 
+                sg.InputText(key='-RECURRING-AMOUNT-', size=(8,1)), 
+                sg.Combo(['monthly', 'weekly'], default_value='monthly', 
+                         key='-RECURRING-FREQUENCY-', size=(8,1), readonly=True), 
+                sg.Text('Day:'), 
+                sg.InputText(key='-RECURRING-DAY-', size=(3,1))
+            ],
+            [
+                sg.Text('From:'), 
+                sg.InputText(date.today().strftime('%Y-%m-%d'), key='-RECURRING-FROM-', size=(10,1)), 
+                sg.Text('To:'), 
+                sg.InputText(key='-RECURRING-TO-', size=(10,1)), 
+                sg.Text('Description:'), 
+                sg.InputText(key='-RECURRING-DESCRIPTION-', size=(20,1))
+            ],
+            [
+                sg.Button('Add'), 
+                sg.Button('Remove Selected'), 
+                sg.Text('', key='-RECURRING-STATUS-', size=(50,1)), 
+                sg.Button('Close')
+            ]
+        ]
+        window = sg.Window('Recurring Expenses', layout, modal=True, finalize=True)
+        
+        while True:
+            rules = self.view_model.get_recurring_expenses()
+            window['-RECURRING-'].update(values=[
+                [
+                    rule.category.value, 
+                    f'{rule.amount:.2f}', 
+                    f'monthly, day {rule.day}' if rule.frequency == 'monthly' else 'weekly', 
+                    rule.start.isoformat(), 
+                    rule.end.isoformat() if rule.end else '', 
+                    rule.description, 
+                    rule.id
+                ]
+                for rule in rules
+            ])
+            
+            event, values = window.read()
+            if event in (sg.WINDOW_CLOSED, 'Close'):
+                break
+            if event == 'Add':
+                success, message = self.view_model.add_recurring_expense(
+                    values['-RECURRING-CATEGORY-'], 
+                    values['-RECURRING-AMOUNT-'], 
+                    values['-RECURRING-FROM-'], 
+                    values['-RECURRING-DESCRIPTION-'], 
+                    values['-RECURRING-FREQUENCY-'], 
+                    values['-RECURRING-DAY-'], 
+                    values['-RECURRING-TO-']
+                )
+                window['-RECURRING-STATUS-'].update(message)
+            elif event == 'Remove Selected' and values['-RECURRING-']:
+                success, message = self.view_model.remove_recurring_expense(
+                    rules[values['-RECURRING-'][0]].id
+                )
+                window['-RECURRING-STATUS-'].update(message)
+        window.close()
+    
     def run(self):
         """Run the main application window"""
-        window = sg.Window('Budget Tracker', self.layout)
+        window = sg.Window('Budget Tracker', self.layout, finalize=True)
+        jobs = BackgroundJobRunner(window)
+        self.view_model.subscribe_alerts(
+            lambda alert: window.write_event_value(BUDGET_ALERT_EVENT, alert.message)
+        )
         
         while True:
             event, values = window.read()
@@ -76,7 +287,28 @@ class MainWindow:
                 break
             
             try:
-                if event == 'Add Expense':
+                if event == JOB_PROGRESS_EVENT:
+                    name, message = values[event]
+                    window['-OUTPUT-'].update(f'{name}: {message}\n', append=True)
+                
+                elif event == BUDGET_ALERT_EVENT:
+                    window['-OUTPUT-'].update(f'Budget alert: {values[event]}\n', append=True)
+                
+                elif event == JOB_DONE_EVENT:
+                    name, result, error = values[event]
+                    jobs.finished(name)
+                    if isinstance(error, ExportCancelled):
+                        window['-OUTPUT-'].update(f'{name} cancelled')
+                    elif error is not None:
+                        window['-OUTPUT-'].update(f'Error: {error}')
+                    else:
+                        window['-OUTPUT-'].update(result)
+                
+                elif event == 'Cancel Jobs':
+                    cancelled = jobs.cancel_all()
+                    window['-OUTPUT-'].update(f'Cancelling {cancelled} running job(s)...')
+                
+                elif event == 'Add Expense':
                     success, message = self.view_model.add_expense(
                         values['-DATE-'],
                         values['-CATEGORY-'],
@@ -85,38 +317,127 @@ class MainWindow:
                     )
                     window['-OUTPUT-'].update(message)
                 
+                elif event == 'Month to Date':
+                    today = date.today()
+                    window['-FROM-'].update(today.replace(day=1).strftime('%Y-%m-%d'))
+                    window['-TO-'].update(today.strftime('%Y-%m-%d'))
+                
+                elif event == 'Import Expenses':
+                    success, message = self.view_model.import_expenses(values['-IMPORT-FILE-'])
+                    window['-OUTPUT-'].update(message)
+                
                 elif event == 'View Expenses':
-                    summary = self.view_model.get_expenses_summary()
+                    summary = self.view_model.get_expenses_summary(
+                        values['-FROM-'], 
+                        values['-TO-']
+                    )
                     window['-OUTPUT-'].update(summary)
                 
+                elif event == 'Browse Expenses':
+                    self._show_expense_table(values['-FROM-'], values['-TO-'])
+                
+                elif event == 'Search':
+                    rows, message = self.view_model.search_expenses(
+                        values['-SEARCH-'], 
+                        values['-SEARCH-CATEGORY-'], 
+                        values['-FROM-'], 
+                        values['-TO-']
+                    )
+                    window['-OUTPUT-'].update(message)
+                    self._show_search_results(rows, message)
+                
+                elif event == 'Export Results':
+                    message = self.view_model.export_search_results(
+                        values['-SEARCH-'], 
+                        values['-SEARCH-CATEGORY-'], 
+                        values['-FROM-'], 
+                        values['-TO-']
+                    )
+                    window['-OUTPUT-'].update(message)
+                
                 elif event == 'Set Budget Limits':
-                    categories = list(ExpenseCategory)
-                    for category in categories:
-                        limit_key = f'-BUDGET-{category.value}-'
-                        limit = values.get(limit_key, '0')
-                        try:
-                            self.view_model.expense_service.set_budget_limit(
-                                category, 
-                                float(limit) if limit else 0
-                            )
-                        except ValueError:
-                            window['-OUTPUT-'].update(f'Invalid limit for {category.value}')
+                    limits = {
+                        category.value: values.get(f'-BUDGET-{category.value}-', '')
+                        for category in ExpenseCategory
+                    }
+                    success, message = self.view_model.set_budget_limits(
+                        limits, 
+                        values['-BUDGET-PERIOD-'] or 'all'
+                    )
+                    window['-OUTPUT-'].update(message)
+                
+                elif event == 'Budget History':
+                    window['-OUTPUT-'].update(self.view_model.get_budget_history())
+                
+                elif event == 'Recurring Expenses':
+                    self._show_recurring_expenses()
+                    window['-OUTPUT-'].update(self.view_model.describe_recurring_expenses())
+                
+                elif event == 'Generate Pie Chart':
+                    # Jobs get the state they read taken here, while this thread keeps changing
+                    # the live data; the pie chart only needs the running category totals
+                    category_totals = self.view_model.get_expense_totals()
                     
-                    # Check budget limits
-                    budget_status = self.view_model.expense_service.check_budget_limits()
-                    output = "Budget Limit Status:\n"
-                    for category, exceeded in budget_status.items():
-                        output += f"{category.value}: {'Exceeded' if exceeded else 'OK'}\n"
+                    def render_chart(job):
+                        path = self.view_model.generate_expense_chart(category_totals)
+                        return f'Pie chart generated as {path}'
                     
-                    window['-OUTPUT-'].update(output)
+                    jobs.submit('Pie chart', render_chart)
+                    window['-OUTPUT-'].update('Generating pie chart...')
                 
-                elif event == 'Generate Pie Chart':
-                    self.view_model.generate_expense_chart()
-                    window['-OUTPUT-'].update('Pie chart generated as expense_categories_chart.png')
+                elif event in ('Monthly Chart', 'Trend Chart'):
+                    start_str, end_str = values['-FROM-'], values['-TO-']
+                    snapshot = self.view_model.snapshot()
+                    
+                    if event == 'Monthly Chart':
+                        def render_chart(job):
+                            path = snapshot.generate_monthly_chart(start_str, end_str)
+                            return f'Monthly chart generated as {path}'
+                    else:
+                        def render_chart(job):
+                            path = snapshot.generate_trend_chart(start_str, end_str)
+                            return f'Trend chart generated as {path}'
+                    
+                    jobs.submit(event, render_chart)
+                    window['-OUTPUT-'].update(f'Generating {event.lower()}...')
+                
+                elif event == 'Analytics':
+                    window['-OUTPUT-'].update(
+                        self.view_model.get_analytics_summary(values['-FROM-'], values['-TO-'])
+                    )
                 
                 elif event == 'Generate Report':
-                    report_message = self.view_model.generate_comprehensive_report()
-                    window['-OUTPUT-'].update(report_message)
+                    start_str, end_str = values['-FROM-'], values['-TO-']
+                    snapshot = self.view_model.snapshot()
+                    
+                    def build_report(job):
+                        return snapshot.generate_comprehensive_report(
+                            start_str, 
+                            end_str, 
+                            progress=job.report, 
+                            cancel_event=job.cancel_event
+                        )
+                    
+                    jobs.submit('Report', build_report)
+                    window['-OUTPUT-'].update('Generating report...\n')
+                
+                elif event == 'Export Dataset':
+                    start_str, end_str = values['-FROM-'], values['-TO-']
+                    snapshot = self.view_model.snapshot()
+                    
+                    def export_dataset(job):
+                        return snapshot.export_expense_dataset(
+                            'auto', 
+                            start_str, 
+                            end_str, 
+                            cancel_event=job.cancel_event
+                        )
+                    
+                    jobs.submit('Dataset export', export_dataset)
+                    window['-OUTPUT-'].update('Exporting dataset...\n')
+                
+                elif event == 'Dump Stats':
+                    window['-OUTPUT-'].update(self.view_model.dump_performance_stats())
                 
                 elif event == 'Reset Expenses':
                     message = self.view_model.reset_expenses()
@@ -129,4 +450,5 @@ class MainWindow:
             except Exception as e:
                 window['-OUTPUT-'].update(f'Error: {str(e)}')
         
+        jobs.shutdown()
         window.close()
\ No newline at end of file
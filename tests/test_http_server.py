@@ -0,0 +1,205 @@
+"""
+Tests for the multi-user HTTP service, driven by a local keep-alive client.
+
+Each test starts BudgetHTTPServer in-process on a free port, working in a
+temporary directory so user data, reports and the chart cache never touch
+the repository.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from main import close_service, open_service  # noqa: E402
+from src.services.user_service_cache import UserServiceCache  # noqa: E402
+from src.views.http_client import HTTPClient  # noqa: E402
+from src.views.http_server import BudgetHTTPServer  # noqa: E402
+
+
+def user_data_dir(user_id: str) -> str:
+    return os.path.join('data', 'users', user_id)
+
+
+class HTTPServerTestCase(unittest.IsolatedAsyncioTestCase):
+    max_users = 8
+
+    async def asyncSetUp(self):
+        self._previous_cwd = os.getcwd()
+        self._workdir = tempfile.TemporaryDirectory(prefix='budget-http-test-')
+        os.chdir(self._workdir.name)
+        self.cache = UserServiceCache(
+            lambda user_id: open_service('json', data_dir=user_data_dir(user_id)),
+            close_service,
+            max_users=self.max_users
+        )
+        self.server = BudgetHTTPServer(self.cache, '127.0.0.1', 0, io_workers=4)
+        self.client = HTTPClient('127.0.0.1', await self.server.start())
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        if self.server is not None:
+            await self.server.close()
+        os.chdir(self._previous_cwd)
+        self._workdir.cleanup()
+
+    async def expect(self, status: int, method: str, path: str, payload=None):
+        result = await self.client.request(method, path, payload)
+        self.assertEqual(result[0], status, result)
+        return result[1]
+
+    async def add(self, user_id: str, amount: str, day: str = '2025-05-01', category: str = 'Food'):
+        added = await self.expect(201, 'POST', f'/users/{user_id}/expenses', {
+            'date': day, 'category': category, 'amount': amount, 'description': 'Lunch'
+        })
+        return added['message'].rsplit(' ', 1)[-1].rstrip(')')
+
+
+class ExpenseRouteTest(HTTPServerTestCase):
+    async def test_health(self):
+        health = await self.expect(200, 'GET', '/health')
+        self.assertEqual(health['status'], 'ok')
+
+    async def test_add_update_list_delete(self):
+        expense_id = await self.add('alice', '12.50')
+        await self.add('alice', '3')
+        await self.expect(200, 'PUT', f'/users/alice/expenses/{expense_id}', {
+            'date': '2025-05-01', 'category': 'Food', 'amount': '14', 'description': 'Lunch'
+        })
+        listed = await self.expect(200, 'GET', '/users/alice/expenses?sort=amount&desc=1')
+        self.assertEqual([row['amount'] for row in listed['expenses']], ['14.00', '3.00'])
+        summary = await self.expect(200, 'GET', '/users/alice/summary')
+        self.assertEqual(summary['total'], 17.0)
+        await self.expect(200, 'DELETE', f'/users/alice/expenses/{expense_id}')
+        await self.expect(404, 'DELETE', f'/users/alice/expenses/{expense_id}')
+        summary = await self.expect(200, 'GET', '/users/alice/summary')
+        self.assertEqual(summary['total'], 3.0)
+
+    async def test_rejects_bad_requests(self):
+        await self.expect(400, 'POST', '/users/alice/expenses', {'date': 'nope'})
+        await self.expect(400, 'POST', '/users/alice/expenses', {
+            'date': '2025-05-01', 'category': 'Food', 'amount': 'inf'
+        })
+        await self.expect(400, 'POST', '/users/../expenses', {})
+        await self.expect(404, 'GET', '/nowhere')
+        await self.expect(405, 'DELETE', '/users/alice/budget')
+
+    async def test_users_are_isolated(self):
+        await self.add('alice', '10')
+        await self.add('bob', '7')
+        self.assertEqual((await self.expect(200, 'GET', '/users/alice/summary'))['total'], 10.0)
+        self.assertEqual((await self.expect(200, 'GET', '/users/bob/summary'))['total'], 7.0)
+
+
+class BudgetRouteTest(HTTPServerTestCase):
+    async def test_set_and_read_budget(self):
+        await self.expect(200, 'PUT', '/users/alice/budget', {
+            'limits': {'Food': 100}, 'period': 'monthly'
+        })
+        budget = await self.expect(200, 'GET', '/users/alice/budget')
+        self.assertEqual(budget['limits']['Food'], 100.0)
+        self.assertEqual(budget['period'], 'monthly')
+        history = await self.expect(200, 'GET', '/users/alice/budget/history?count=3')
+        self.assertIn('Budget History', history['message'])
+        await self.expect(400, 'PUT', '/users/alice/budget', {'limits': {'Food': -1}})
+
+
+class RecurringRouteTest(HTTPServerTestCase):
+    async def test_add_list_remove(self):
+        added = await self.expect(201, 'POST', '/users/alice/recurring', {
+            'category': 'Utilities', 'amount': 50, 'start': '2025-01-15', 'end': '2025-03-31'
+        })
+        rule_id = added['message'].rsplit(' ', 1)[-1].rstrip(')')
+        listed = await self.expect(200, 'GET', '/users/alice/recurring')
+        self.assertEqual([rule['id'] for rule in listed['recurring']], [rule_id])
+        self.assertEqual(listed['recurring'][0]['day'], 15)
+
+        # Occurrences on Jan 15, Feb 15 and Mar 15 count towards totals without being stored
+        summary = await self.expect(200, 'GET', '/users/alice/summary?from=2025-01-01&to=2025-12-31')
+        self.assertEqual(summary['totals']['Utilities'], 150.0)
+        listed = await self.expect(200, 'GET', '/users/alice/expenses')
+        self.assertEqual(listed['expenses'], [])
+
+        await self.expect(200, 'DELETE', f'/users/alice/recurring/{rule_id}')
+        await self.expect(404, 'DELETE', f'/users/alice/recurring/{rule_id}')
+        summary = await self.expect(200, 'GET', '/users/alice/summary')
+        self.assertEqual(summary['total'], 0.0)
+
+    async def test_rejects_invalid_rules(self):
+        await self.expect(400, 'POST', '/users/alice/recurring', {
+            'category': 'Utilities', 'amount': 50, 'start': '2025-01-15', 'day': 40
+        })
+        await self.expect(400, 'POST', '/users/alice/recurring', {'category': 'Utilities'})
+
+
+class ExportRouteTest(HTTPServerTestCase):
+    async def test_report_written_to_user_directory(self):
+        await self.add('alice', '12.50')
+        report = await self.expect(201, 'POST', '/users/alice/reports', {})
+        self.assertIn('Report Generated', report['message'])
+        directory = os.path.join(self.server.reports_dir, 'alice')
+        for name in ('expenses_report.csv', 'budget_report.csv', 'expense_categories_chart.png'):
+            self.assertTrue(os.path.exists(os.path.join(directory, name)), name)
+        with open(os.path.join(directory, 'expenses_report.csv')) as f:
+            self.assertIn('2025-05-01,Food,12.50,Lunch', f.read())
+
+    async def test_dataset_written_to_user_directory(self):
+        await self.add('alice', '12.50', '2025-05-01')
+        await self.add('alice', '4', '2025-06-02')
+        await self.expect(201, 'POST', '/users/alice/datasets', {'format': 'ndjson'})
+        dataset = os.path.join(self.server.reports_dir, 'alice', 'expenses_dataset')
+        self.assertEqual(sorted(os.listdir(dataset)), ['month=2025-05', 'month=2025-06'])
+        await self.expect(400, 'POST', '/users/alice/datasets', {'format': 'xlsx'})
+
+
+class EvictionTest(HTTPServerTestCase):
+    # One warm user at a time, so every switch between users evicts and flushes
+    max_users = 1
+
+    async def test_writes_survive_eviction_and_reload(self):
+        users = ['alice', 'bob', 'carol']
+        for round_number in range(3):
+            for user_id in users:
+                await self.add(user_id, f'{round_number + 1}')
+        self.assertGreater(self.cache.stats()['evictions'], 0)
+        for user_id in users:
+            summary = await self.expect(200, 'GET', f'/users/{user_id}/summary')
+            self.assertEqual(summary['total'], 6.0, user_id)
+
+    async def test_concurrent_writes_survive_eviction(self):
+        users = ['alice', 'bob', 'carol', 'dave']
+        clients = [HTTPClient('127.0.0.1', self.server.port) for _ in range(8)]
+
+        async def run(client: HTTPClient, index: int):
+            for step in range(10):
+                user_id = users[(index + step) % len(users)]
+                status, result = await client.request('POST', f'/users/{user_id}/expenses', {
+                    'date': '2025-05-01', 'category': 'Food', 'amount': '1', 'description': 'x'
+                })
+                self.assertEqual(status, 201, result)
+            await client.close()
+
+        await asyncio.gather(*(run(client, index) for index, client in enumerate(clients)))
+        totals = {}
+        for user_id in users:
+            totals[user_id] = (await self.expect(200, 'GET', f'/users/{user_id}/summary'))['total']
+        self.assertEqual(sum(totals.values()), 80.0)
+        self.assertEqual(set(totals.values()), {20.0})
+
+        # Everything was flushed to disk: a fresh service sees the same totals
+        await self.client.close()
+        await self.server.close()
+        self.server = None
+        for user_id in users:
+            service = open_service('json', data_dir=user_data_dir(user_id))
+            try:
+                self.assertEqual(service.get_total_expenses(), 20.0, user_id)
+            finally:
+                close_service(service)
+
+
+if __name__ == '__main__':
+    unittest.main()